@@ -1,3 +1,19 @@
 from django.contrib import admin
 
+from .models import BlobAsset
+
 # Register your models here.
+
+
+@admin.register(BlobAsset)
+class BlobAssetAdmin(admin.ModelAdmin):
+    # Solo lectura: las filas las escriben las subidas y las vistas proxy
+    list_display = ('url', 'tamano', 'tipo_contenido', 'verificado')
+    search_fields = ('url', 'sha256')
+    readonly_fields = ('url', 'tamano', 'tipo_contenido', 'etag', 'ultima_modificacion', 'sha256', 'verificado')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from apps.documentos.services.blob_emulator import DEFAULT_PORT, Faults, connection_string, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        'Levanta un emulador local de Azure Blob Storage (en memoria) con latencia, '
+        'límite de ancho de banda y errores inyectables, para pruebas y benchmarks. '
+        'Usar junto con DJANGO_SETTINGS_MODULE=config.settings_test.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interfaz de escucha (por defecto: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Puerto (por defecto: {DEFAULT_PORT})')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Latencia fija añadida a cada petición (ms)')
+        parser.add_argument('--jitter-ms', type=float, default=0, help='Latencia aleatoria extra, entre 0 y este valor (ms)')
+        parser.add_argument('--bandwidth-kbps', type=float, default=0,
+                            help='Límite de ancho de banda por petición en KiB/s (0 = sin límite)')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Probabilidad (0-1) de responder con un error inyectado')
+        parser.add_argument('--error-status', type=int, default=503, choices=(500, 503),
+                            help='Código HTTP de los errores inyectados (por defecto: 503 ServerBusy)')
+        parser.add_argument('--verbose', action='store_true', help='Registrar cada petición')
+
+    def handle(self, *args, **options):
+        faults = Faults(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            bandwidth_kbps=options['bandwidth_kbps'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+        )
+        server = make_server(options['host'], options['port'], faults, verbose=options['verbose'])
+        endpoint = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(self.style.SUCCESS(f'🧪 Emulador de blobs escuchando en {endpoint}'))
+        self.stdout.write(f'   Fallos: {faults}')
+        self.stdout.write(f'   AZURE_STORAGE_CONNECTION_STRING="{connection_string(endpoint)}"')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlobAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(db_column='url', max_length=500, unique=True)),
+                ('tamano', models.PositiveBigIntegerField(db_column='tamano')),
+                ('tipo_contenido', models.CharField(blank=True, db_column='tipo_contenido', default='', max_length=100)),
+                ('etag', models.CharField(db_column='etag', max_length=100)),
+                ('ultima_modificacion', models.DateTimeField(blank=True, db_column='ultima_modificacion', null=True)),
+                ('sha256', models.CharField(blank=True, db_column='sha256', default='', max_length=64)),
+                ('verificado', models.DateTimeField(db_column='verificado')),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+                'db_table': 'BLOB_ASSETS',
+            },
+        ),
+    ]
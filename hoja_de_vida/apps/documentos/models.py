@@ -1,3 +1,29 @@
 from django.db import models
 
 # Create your models here.
+
+
+class BlobAsset(models.Model):
+    """Metadatos conocidos de un blob de Azure, indexados por su URL.
+
+    Se registran al subir el archivo y se refrescan de forma perezosa cuando
+    `verificado` es más antiguo que BLOB_ASSET_REFRESH_SECONDS. Con ellos las
+    vistas proxy responden HEAD, 304 y Content-Length sin consultar a Azure
+    (ver apps/documentos/services/blob_assets.py).
+    """
+    url = models.URLField(max_length=500, unique=True, db_column='url')
+    tamano = models.PositiveBigIntegerField(db_column='tamano')
+    tipo_contenido = models.CharField(max_length=100, blank=True, default='', db_column='tipo_contenido')
+    etag = models.CharField(max_length=100, db_column='etag')
+    ultima_modificacion = models.DateTimeField(null=True, blank=True, db_column='ultima_modificacion')
+    # SHA-256 del contenido; vacío si el blob no se subió desde la aplicación
+    sha256 = models.CharField(max_length=64, blank=True, default='', db_column='sha256')
+    verificado = models.DateTimeField(db_column='verificado')
+
+    class Meta:
+        db_table = 'BLOB_ASSETS'
+        verbose_name = 'Blob'
+        verbose_name_plural = 'Blobs'
+
+    def __str__(self):
+        return self.url
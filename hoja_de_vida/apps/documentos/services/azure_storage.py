@@ -1,25 +1,63 @@
+import hashlib
 import os
-import uuid
+from collections import namedtuple
 from django.conf import settings
-from azure.storage.blob import BlobServiceClient
-from azure.core.exceptions import ResourceExistsError
 
+from apps.documentos.services import blob_assets, image_variants
+from apps.documentos.services.block_upload import upload_content_addressed, upload_stream
+from apps.documentos.services.storage import get_storage
 
-def _get_blob_service_client():
-    conn_str = os.environ.get('AZURE_STORAGE_CONNECTION_STRING') or os.environ.get('AZURE_CONNECTION_STRING')
-    if not conn_str:
-        raise RuntimeError('AZURE_STORAGE_CONNECTION_STRING is not set. Set AZURE_STORAGE_CONNECTION_STRING in the environment.')
-    return BlobServiceClient.from_connection_string(conn_str)
+
+# url: the original upload; variantes: {"print": url, "web": url}, empty if they could not be built
+UploadedImage = namedtuple('UploadedImage', 'url variantes')
+
+
+def _ensure_container(container: str):
+    """Create the container if missing, keeping it private. Raises RuntimeError."""
+    try:
+        get_storage().ensure_container(container)
+    except Exception as exc:
+        raise RuntimeError(f'Error ensuring storage container exists: {exc}')
+
+
+def _upload_variants(container: str, original_url: str, file_obj, kind: str):
+    """Upload the print/web versions of an image next to it as `<name>_<variant><ext>`.
+
+    The image is decoded again from `file_obj` (rewound), so the original bytes
+    are never held in memory as a whole. Returns {variant: url}. Best-effort:
+    the original is already uploaded, so a failure here returns {} and the CV
+    keeps using the original.
+    """
+    try:
+        file_obj.seek(0)
+        variants = image_variants.build_variants(file_obj, kind)
+    except (OSError, RuntimeError):
+        return {}
+    storage = get_storage()
+    base, _ext = os.path.splitext(os.path.basename(storage.split_url(original_url)[1]))
+    urls = {}
+    for variant, (payload, content_type, ext) in variants.items():
+        url = storage.url(container, f'{base}_{variant}{ext}')
+        # Re-uploading the same original yields the same versions: keep the known ones
+        asset = blob_assets.get_fresh(url)
+        if asset is None or asset.sha256 != hashlib.sha256(payload).hexdigest():
+            try:
+                upload_stream(url, [payload], content_type)
+            except Exception:
+                continue
+        urls[variant] = url
+    return urls
 
 
 def upload_profile_image(file_obj, filename=None):
-    """Upload a PNG image to Azure Blob Storage and return the blob URL (container kept private).
+    """Upload a PNG image to blob storage and return an UploadedImage (container kept private).
 
     Behavior:
       - Uses the container specified in Django settings: `AZURE_STORAGE_CONTAINER` (required).
       - Creates the container if it does not exist and enforces private access when possible.
       - Validates that uploaded file is PNG (by extension or content_type when available).
-      - Returns the internal blob URL (not a public SAS); the container is private by default.
+      - Also uploads the print and web versions (see services/image_variants.py).
+      - Returns the internal blob URLs (not a public SAS); the container is private by default.
 
     Raises RuntimeError on configuration or upload failures.
     """
@@ -28,23 +66,8 @@ def upload_profile_image(file_obj, filename=None):
     if not container:
         raise RuntimeError('AZURE_STORAGE_CONTAINER setting not found. Please set AZURE_STORAGE_CONTAINER in Django settings.')
 
-    blob_service_client = _get_blob_service_client()
-    container_client = blob_service_client.get_container_client(container)
-
     # Ensure container exists (create if missing). Keep it private (public_access=None).
-    try:
-        container_client.create_container()
-    except ResourceExistsError:
-        pass
-    except Exception as exc:
-        raise RuntimeError(f'Error ensuring Azure container exists: {exc}')
-
-    # Attempt to set container ACL to private to ensure no public access (best-effort).
-    try:
-        container_client.set_container_access_policy(public_access=None)
-    except Exception:
-        # not fatal — continue even if we cannot change ACL due to permissions
-        pass
+    _ensure_container(container)
 
     # Validate PNG: prefer content_type, fallback to extension
     name = filename or getattr(file_obj, 'name', '') or ''
@@ -55,51 +78,28 @@ def upload_profile_image(file_obj, filename=None):
     if not (ext == '.png' or content_type == 'image/png'):
         raise RuntimeError('Only PNG images are allowed (file must be .png and/or content_type image/png).')
 
-    blob_name = f"{uuid.uuid4().hex}.png"
-    blob_client = container_client.get_blob_client(blob_name)
-
-    # Read data robustly from UploadedFile or file-like
+    # Named after the SHA-256 of the content: an identical photo is not uploaded again.
+    # Streamed to the storage backend with the content type set explicitly
     try:
-        if hasattr(file_obj, 'chunks'):
-            data = b''.join(chunk for chunk in file_obj.chunks())
-        else:
-            data = file_obj.read()
+        url = upload_content_addressed(container, file_obj, '.png', 'image/png')
     except Exception as exc:
-        raise RuntimeError(f'Error reading uploaded image: {exc}')
+        raise RuntimeError(f'Failed to upload image blob: {exc}')
 
-    # Upload and set content type explicitly
-    try:
-        blob_client.upload_blob(data, overwrite=True, content_type='image/png')
-    except Exception as exc:
-        raise RuntimeError(f'Failed to upload image blob to Azure: {exc}')
-
-    # Return internal blob URL (container is private; this URL is not a public SAS)
-    return blob_client.url
+    # Return internal blob URLs (container is private; these URLs are not public SAS)
+    return UploadedImage(url, _upload_variants(container, url, file_obj, 'foto'))
 
 
 def upload_template_image(file_obj, filename=None):
-    """Upload a template/background image to Azure and return the blob URL.
+    """Upload a template/background image to blob storage and return an UploadedImage.
 
-    Accepts common image types (png, jpg, jpeg, gif, webp). Returns the blob URL.
+    Accepts common image types (png, jpg, jpeg, gif, webp). Also uploads the
+    A4 print and web versions of the background.
     """
     container = getattr(settings, 'AZURE_STORAGE_CONTAINER', None)
     if not container:
         raise RuntimeError('AZURE_STORAGE_CONTAINER setting not found. Please set AZURE_STORAGE_CONTAINER in Django settings.')
 
-    blob_service_client = _get_blob_service_client()
-    container_client = blob_service_client.get_container_client(container)
-
-    try:
-        container_client.create_container()
-    except ResourceExistsError:
-        pass
-    except Exception as exc:
-        raise RuntimeError(f'Error ensuring Azure container exists: {exc}')
-
-    try:
-        container_client.set_container_access_policy(public_access=None)
-    except Exception:
-        pass
+    _ensure_container(container)
 
     name = filename or getattr(file_obj, 'name', '') or ''
     _, ext = os.path.splitext(name)
@@ -113,20 +113,9 @@ def upload_template_image(file_obj, filename=None):
     mime = allowed.get(ext) or content_type or 'application/octet-stream'
     ext_suffix = ext if ext in allowed else '.png'
 
-    blob_name = f"{uuid.uuid4().hex}{ext_suffix}"
-    blob_client = container_client.get_blob_client(blob_name)
-
-    try:
-        if hasattr(file_obj, 'chunks'):
-            data = b''.join(chunk for chunk in file_obj.chunks())
-        else:
-            data = file_obj.read()
-    except Exception as exc:
-        raise RuntimeError(f'Error reading uploaded image: {exc}')
-
     try:
-        blob_client.upload_blob(data, overwrite=True, content_type=mime)
+        url = upload_content_addressed(container, file_obj, ext_suffix, mime)
     except Exception as exc:
-        raise RuntimeError(f'Failed to upload image blob to Azure: {exc}')
+        raise RuntimeError(f'Failed to upload image blob: {exc}')
 
-    return blob_client.url
\ No newline at end of file
+    return UploadedImage(url, _upload_variants(container, url, file_obj, 'fondo'))
@@ -0,0 +1,94 @@
+"""Read/write helpers for BlobAsset, the local record of blob metadata.
+
+Rows are written when the application uploads a blob and whenever blob
+properties are fetched from the storage backend. A row is trusted for
+BLOB_ASSET_REFRESH_SECONDS after `verificado`; older rows are refreshed lazily
+by the next caller that needs them.
+
+All functions use the database: call them from the request thread, not from
+worker threads of a ThreadPoolExecutor.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.documentos.models import BlobAsset
+
+
+def _fresh_since():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'BLOB_ASSET_REFRESH_SECONDS', 3600))
+
+
+def get(blob_url: str):
+    """Return the BlobAsset of a blob URL (fresh or not), or None."""
+    return BlobAsset.objects.filter(url=blob_url).first()
+
+
+def get_fresh(blob_url: str):
+    """Return the BlobAsset of a blob URL if it was verified recently, else None."""
+    return BlobAsset.objects.filter(url=blob_url, verificado__gte=_fresh_since()).first()
+
+
+def get_fresh_many(blob_urls):
+    """Return {blob_url: BlobAsset} for the recently verified rows among `blob_urls`."""
+    rows = BlobAsset.objects.filter(url__in=list(blob_urls), verificado__gte=_fresh_since())
+    return {row.url: row for row in rows}
+
+
+def _save_record(blob_url, etag, size, content_type, last_modified, sha256):
+    asset = get(blob_url)
+    if asset is None:
+        asset = BlobAsset(url=blob_url)
+    elif asset.etag != etag and sha256 is None:
+        asset.sha256 = ''
+    asset.etag = etag or ''
+    asset.tamano = size
+    asset.tipo_contenido = content_type or ''
+    asset.ultima_modificacion = last_modified
+    if sha256 is not None:
+        asset.sha256 = sha256
+    asset.verificado = timezone.now()
+    asset.save()
+    return asset
+
+
+def record(blob_url: str, etag, size: int, content_type='', last_modified=None, sha256=None):
+    """Create or refresh the BlobAsset of a blob and return it.
+
+    A known sha256 is kept while the ETag does not change, since property
+    lookups cannot provide it.
+    """
+    try:
+        with transaction.atomic():
+            return _save_record(blob_url, etag, size, content_type, last_modified, sha256)
+    except IntegrityError:
+        # Another request inserted the row after get(); update that row instead
+        return _save_record(blob_url, etag, size, content_type, last_modified, sha256)
+
+
+def record_properties(blob_url: str, properties, sha256=None):
+    """Record the storage.BlobProperties of a blob (from a stat or an upload)."""
+    return record(
+        blob_url,
+        etag=properties.etag,
+        size=properties.size,
+        content_type=properties.content_type,
+        last_modified=properties.last_modified,
+        sha256=sha256,
+    )
+
+
+def record_upload(blob_url: str, sha256: str, properties):
+    """Record a blob just uploaded by the application.
+
+    - sha256: hex digest of the uploaded content.
+    - properties: the storage.BlobProperties returned by the upload.
+
+    Never raises: the upload already succeeded and the row can be rebuilt lazily.
+    """
+    try:
+        return record_properties(blob_url, properties, sha256=sha256)
+    except Exception:
+        return None
@@ -0,0 +1,279 @@
+"""Bounded on-disk LRU cache of downloaded blobs, keyed by blob URL.
+
+Each entry is a single file: one JSON header line (url, filename, etag,
+last_modified)
+followed by the blob bytes. Files are written to a temporary name and renamed,
+so readers never see partial entries. Timestamps are set explicitly:
+  - mtime: last time the copy was validated against Azure (freshness).
+  - atime: last time the copy was read (LRU eviction order).
+
+Settings:
+  - BLOB_CACHE_DIR: cache directory.
+  - BLOB_CACHE_MAX_BYTES: total size cap (0 disables the cache).
+  - BLOB_CACHE_FRESH_SECONDS: how long a copy is served without revalidating.
+
+fetch() reads a whole blob through the cache; the proxy views and the PDF
+renderer use it instead of calling the storage backend directly.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from apps.documentos.services.storage import BlobNotModified, get_storage
+
+
+CachedBlob = namedtuple('CachedBlob', ['data', 'filename', 'etag', 'last_modified', 'size', 'fresh'])
+
+_evict_lock = threading.Lock()
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _enabled():
+    return getattr(settings, 'BLOB_CACHE_MAX_BYTES', 0) > 0
+
+
+def _cache_dir():
+    return str(getattr(settings, 'BLOB_CACHE_DIR'))
+
+
+def _entry_path(blob_url: str):
+    digest = hashlib.sha256(blob_url.encode('utf-8')).hexdigest()
+    return os.path.join(_cache_dir(), f'{digest}.blob')
+
+
+def get(blob_url: str, with_data: bool = True):
+    """Return the cached copy of a blob as CachedBlob, or None on a miss.
+
+    With with_data=False only the header is read and `data` is None.
+    last_modified is a Unix timestamp (or None for entries stored without it).
+    """
+    if not _enabled():
+        return None
+    path = _entry_path(blob_url)
+    try:
+        with open(path, 'rb') as fh:
+            header = json.loads(fh.readline().decode('utf-8'))
+            body_offset = fh.tell()
+            data = fh.read() if with_data else None
+        st = os.stat(path)
+        # Record the access for LRU without touching the validation time
+        os.utime(path, (time.time(), st.st_mtime))
+    except (OSError, ValueError):
+        return None
+    if header.get('url') != blob_url:
+        return None
+
+    fresh_for = getattr(settings, 'BLOB_CACHE_FRESH_SECONDS', 60)
+    fresh = (time.time() - st.st_mtime) < fresh_for
+    return CachedBlob(
+        data, header.get('filename') or '', header.get('etag'), header.get('last_modified'),
+        st.st_size - body_offset, fresh,
+    )
+
+
+def mark_validated(blob_url: str):
+    """Record that the cached copy was confirmed current by Azure (e.g. a 304)."""
+    if not _enabled():
+        return
+    now = time.time()
+    try:
+        os.utime(_entry_path(blob_url), (now, now))
+    except OSError:
+        pass
+
+
+def open_body(blob_url: str, chunk_size: int = CHUNK_SIZE, offset: int = 0, length=None):
+    """Open a cached blob for streaming.
+
+    Returns (chunks, size), where chunks is an iterator over the body (or over
+    `length` bytes starting at `offset`) that closes the file when exhausted,
+    and size is the full body size. Returns None on a miss.
+    """
+    if not _enabled():
+        return None
+    path = _entry_path(blob_url)
+    try:
+        fh = open(path, 'rb')
+    except OSError:
+        return None
+    try:
+        header = json.loads(fh.readline().decode('utf-8'))
+        st = os.fstat(fh.fileno())
+        os.utime(path, (time.time(), st.st_mtime))
+    except (OSError, ValueError):
+        fh.close()
+        return None
+    if header.get('url') != blob_url:
+        fh.close()
+        return None
+    size = st.st_size - fh.tell()
+    if offset:
+        fh.seek(offset, os.SEEK_CUR)
+    remaining = size - offset if length is None else min(length, size - offset)
+    return _iter_file(fh, chunk_size, remaining), size
+
+
+def _iter_file(fh, chunk_size, remaining):
+    with fh:
+        while remaining > 0:
+            chunk = fh.read(min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _header(blob_url, filename, etag, last_modified):
+    return json.dumps({
+        'url': blob_url, 'filename': filename, 'etag': etag, 'last_modified': last_modified,
+    }).encode('utf-8') + b'\n'
+
+
+def _open_temp():
+    directory = _cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    return os.fdopen(fd, 'wb'), tmp_path
+
+
+def _discard(fh, tmp_path):
+    try:
+        fh.close()
+        os.unlink(tmp_path)
+    except OSError:
+        pass
+
+
+def put(blob_url: str, data: bytes, filename: str, etag=None, last_modified=None):
+    """Store a blob atomically and evict least recently used entries over the cap."""
+    if not _enabled():
+        return
+    max_bytes = settings.BLOB_CACHE_MAX_BYTES
+    if len(data) > max_bytes:
+        return
+
+    try:
+        fh, tmp_path = _open_temp()
+        try:
+            with fh:
+                fh.write(_header(blob_url, filename, etag, last_modified))
+                fh.write(data)
+            os.replace(tmp_path, _entry_path(blob_url))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        # The cache is an optimization; a full or read-only disk must not break downloads
+        return
+    _evict(max_bytes)
+
+
+def fetch(blob_url: str):
+    """Return (bytes, filename) of a blob, read through the cache.
+
+    A fresh copy is served directly, a stale one is revalidated with its ETag
+    (304 = no body transferred), and if the backend fails the cached copy is
+    served instead of raising. Blobs of the local storage backend are read
+    directly.
+    """
+    storage = get_storage()
+    filename = os.path.basename(storage.split_url(blob_url)[1])
+    if not storage.cacheable:
+        data, _properties = storage.download(blob_url)
+        return data, filename
+
+    cached = get(blob_url)
+    if cached and cached.fresh:
+        return cached.data, cached.filename
+
+    try:
+        data, properties = storage.download(blob_url, if_none_match=cached.etag if cached else None)
+    except BlobNotModified:
+        mark_validated(blob_url)
+        return cached.data, cached.filename
+    except Exception:
+        if cached:
+            # The backend is unreachable or failing: a stale copy beats an error page
+            return cached.data, cached.filename
+        raise
+
+    last_modified = properties.last_modified.timestamp() if properties.last_modified else None
+    put(blob_url, data, filename, properties.etag, last_modified)
+    return data, filename
+
+
+def tee(blob_url: str, chunks, filename: str, etag=None, last_modified=None, size=None):
+    """Yield `chunks` unchanged while storing them as the cache entry for `blob_url`.
+
+    The entry only appears once the last chunk has been consumed, so a client
+    that disconnects mid-stream leaves nothing behind.
+    """
+    max_bytes = getattr(settings, 'BLOB_CACHE_MAX_BYTES', 0)
+    if not _enabled() or (size is not None and size > max_bytes):
+        yield from chunks
+        return
+
+    try:
+        fh, tmp_path = _open_temp()
+        fh.write(_header(blob_url, filename, etag, last_modified))
+    except OSError:
+        yield from chunks
+        return
+
+    committed = False
+    try:
+        for chunk in chunks:
+            if fh is not None:
+                try:
+                    fh.write(chunk)
+                except OSError:
+                    _discard(fh, tmp_path)
+                    fh = None
+            yield chunk
+        if fh is not None:
+            try:
+                fh.close()
+                os.replace(tmp_path, _entry_path(blob_url))
+                committed = True
+            except OSError:
+                pass
+    finally:
+        if fh is not None and not committed:
+            _discard(fh, tmp_path)
+    if committed:
+        _evict(max_bytes)
+
+
+def _evict(max_bytes: int):
+    with _evict_lock:
+        entries = []
+        total = 0
+        try:
+            with os.scandir(_cache_dir()) as it:
+                for entry in it:
+                    if not entry.name.endswith('.blob'):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_atime, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            return
+        if total <= max_bytes:
+            return
+
+        entries.sort()
+        for _atime, size, path in entries:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= max_bytes:
+                break
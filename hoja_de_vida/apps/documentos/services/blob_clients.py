@@ -0,0 +1,93 @@
+import os
+import random
+import threading
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import BlobServiceClient, ExponentialRetry
+from django.conf import settings
+
+
+# connection string -> BlobServiceClient, shared by every thread of the process
+_clients = {}
+_clients_pid = None
+_lock = threading.Lock()
+
+
+def get_connection_string():
+    """Return the Azure connection string.
+
+    Uses the AZURE_STORAGE_CONNECTION_STRING setting (read from the environment
+    by config/settings.py, overridden by config/settings_test.py) and falls
+    back to the legacy AZURE_CONNECTION_STRING variable. Raises RuntimeError
+    when neither is set.
+    """
+    conn_str = getattr(settings, 'AZURE_STORAGE_CONNECTION_STRING', None) or os.environ.get('AZURE_CONNECTION_STRING')
+    if not conn_str:
+        raise RuntimeError('AZURE_STORAGE_CONNECTION_STRING is not set. Set AZURE_STORAGE_CONNECTION_STRING in the environment.')
+    return conn_str
+
+
+def _build_transport():
+    pool_size = getattr(settings, 'AZURE_BLOB_POOL_SIZE', 20)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # Keep-alive is the requests default; the session lives as long as the process
+    return RequestsTransport(
+        session=session,
+        session_owner=False,
+        connection_timeout=getattr(settings, 'BLOB_CONNECT_TIMEOUT', 3),
+        read_timeout=getattr(settings, 'BLOB_READ_TIMEOUT', 10),
+    )
+
+
+class _JitteredRetry(ExponentialRetry):
+    """Exponential backoff with full jitter: the n-th retry waits uniform(0, initial_backoff * 2**n)."""
+
+    def get_backoff_time(self, settings):
+        return random.uniform(0, self.initial_backoff * 2 ** settings['count'])
+
+
+def _build_retry_policy():
+    # The SDK default waits 15s, 18s and 24s between attempts, holding the
+    # worker the whole time; retry a few times quickly instead, with jitter
+    # so that workers hit by the same outage do not retry in lockstep
+    return _JitteredRetry(
+        initial_backoff=getattr(settings, 'BLOB_RETRY_BACKOFF_SECONDS', 0.5),
+        retry_total=getattr(settings, 'BLOB_RETRY_TOTAL', 2),
+    )
+
+
+def get_blob_service_client(conn_str=None):
+    """Return the process-wide BlobServiceClient for a connection string.
+
+    The client is created once (per process) with a pooled keep-alive HTTP
+    transport, connect/read timeouts, a short jittered retry policy and
+    BLOB_DOWNLOAD_CHUNK_SIZE download ranges, and is safe to share between
+    threads.
+    """
+    global _clients_pid
+    conn_str = conn_str or get_connection_string()
+
+    client = _clients.get(conn_str)
+    if client is not None and _clients_pid == os.getpid():
+        return client
+
+    with _lock:
+        # Never reuse sockets inherited from a parent process after fork()
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(conn_str)
+        if client is None:
+            # Downloads are read in ranges of this size, so chunks() yields the
+            # first one without buffering the blob (the SDK default is 32 MB)
+            chunk_size = getattr(settings, 'BLOB_DOWNLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+            client = BlobServiceClient.from_connection_string(
+                conn_str, transport=_build_transport(), retry_policy=_build_retry_policy(),
+                max_single_get_size=chunk_size, max_chunk_get_size=chunk_size,
+            )
+            _clients[conn_str] = client
+    return client
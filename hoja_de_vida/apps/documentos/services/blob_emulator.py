@@ -0,0 +1,299 @@
+"""Local stand-in for the subset of the Azure Blob REST API the application uses.
+
+Meant for tests and benchmarks: it lets the caching and concurrency features
+be measured against slow, throttled or failing storage without touching Azure.
+Implemented operations (path-style URLs, http://<host>:<port>/<account>/...):
+
+  - container: create (PUT ?restype=container), set ACL (PUT ...&comp=acl),
+    properties / exists (GET or HEAD ?restype=container)
+  - blob: put (PUT with x-ms-blob-type), stage block (PUT ?comp=block),
+    commit block list (PUT ?comp=blocklist), get (GET, with x-ms-range / Range,
+    If-None-Match, If-Match), properties (HEAD), delete (DELETE)
+
+Requests are not authenticated; SAS query strings are accepted and their
+rscd / rsct response overrides honoured. Blobs live in memory.
+
+Fault injection (Faults), applied to every request:
+  - latency_ms + a random 0..jitter_ms before answering
+  - bandwidth_kbps: cap on request and response bodies (KiB/s, 0 = unlimited)
+  - error_rate: probability of answering error_status (503 ServerBusy by
+    default), which the Azure SDK retries like a real throttling response
+
+This module only uses the standard library so settings modules can import it.
+Run it with `python manage.py blob_emulator`, or in-process with
+start_in_background() (the tests of apps/documentos and apps/trayectoria do).
+"""
+import itertools
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+# Well-known development account (same as Azurite), so SAS signing works too
+ACCOUNT_NAME = 'devstoreaccount1'
+ACCOUNT_KEY = 'Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRz6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw=='
+
+DEFAULT_PORT = 10000
+
+Faults = namedtuple('Faults', ['latency_ms', 'jitter_ms', 'bandwidth_kbps', 'error_rate', 'error_status'])
+NO_FAULTS = Faults(0, 0, 0, 0.0, 503)
+
+# data: bytes; last_modified: Unix timestamp
+StoredBlob = namedtuple('StoredBlob', ['data', 'content_type', 'etag', 'last_modified'])
+
+_ERROR_CODES = {500: 'InternalError', 503: 'ServerBusy'}
+_RANGE_RE = re.compile(r'^bytes=(\d+)-(\d*)$')
+_THROTTLE_CHUNK = 16 * 1024
+
+
+def connection_string(endpoint: str = f'http://127.0.0.1:{DEFAULT_PORT}') -> str:
+    """Connection string for an emulator listening at `endpoint` (scheme://host:port)."""
+    return (
+        f'DefaultEndpointsProtocol=http;AccountName={ACCOUNT_NAME};AccountKey={ACCOUNT_KEY};'
+        f'BlobEndpoint={endpoint.rstrip("/")}/{ACCOUNT_NAME};'
+    )
+
+
+class BlobStore:
+    """Thread-safe in-memory containers, blobs and uncommitted blocks."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.containers = {}
+        self.blocks = {}
+        self._etags = itertools.count(1)
+
+    def new_etag(self):
+        return f'"0x{time.time_ns():X}{next(self._etags):04X}"'
+
+
+class BlobEmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'BlobEmulator/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # --- plumbing -------------------------------------------------------
+
+    def _throttle(self, size: int):
+        bandwidth = self.server.faults.bandwidth_kbps
+        if bandwidth and size:
+            time.sleep(size / (bandwidth * 1024))
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.rfile.read(min(_THROTTLE_CHUNK, length - len(data)))
+            if not chunk:
+                break
+            self._throttle(len(chunk))
+            data += chunk
+        return bytes(data)
+
+    def _send(self, status: int, headers=None, body: bytes = b''):
+        self.send_response(status)
+        self.send_header('x-ms-request-id', str(uuid.uuid4()))
+        self.send_header('x-ms-version', self.headers.get('x-ms-version', '2021-08-06'))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if 'Content-Length' not in (headers or {}):
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command == 'HEAD' or status == 304:
+            return
+        for start in range(0, len(body), _THROTTLE_CHUNK):
+            chunk = body[start:start + _THROTTLE_CHUNK]
+            self._throttle(len(chunk))
+            self.wfile.write(chunk)
+
+    def _error(self, status: int, code: str, message: str = '', headers=None):
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            f'<Error><Code>{code}</Code><Message>{message or code}</Message></Error>'
+        ).encode('utf-8')
+        self._send(status, {'x-ms-error-code': code, 'Content-Type': 'application/xml', **(headers or {})}, body)
+
+    def _inject_faults(self) -> bool:
+        """Apply latency and maybe answer with an injected error. True = request answered."""
+        faults = self.server.faults
+        delay = faults.latency_ms + (random.uniform(0, faults.jitter_ms) if faults.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+        if faults.error_rate and random.random() < faults.error_rate:
+            self._read_body()
+            status = faults.error_status
+            self._error(status, _ERROR_CODES.get(status, 'InternalError'), 'Injected failure')
+            return True
+        return False
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        parts = unquote(parsed.path).lstrip('/').split('/', 2)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        account = parts[0] if parts else ''
+        container = parts[1] if len(parts) > 1 else ''
+        blob = parts[2] if len(parts) > 2 else ''
+        return account, container, blob, query
+
+    def _handle(self):
+        if self._inject_faults():
+            return
+        account, container, blob, query = self._route()
+        if account != ACCOUNT_NAME or not container:
+            self._read_body()
+            return self._error(400, 'InvalidUri', 'Expected /<account>/<container>[/<blob>]')
+        if blob:
+            handler = getattr(self, f'_blob_{self.command.lower()}', None)
+        else:
+            handler = getattr(self, f'_container_{self.command.lower()}', None)
+        if handler is None:
+            self._read_body()
+            return self._error(405, 'UnsupportedHttpVerb')
+        return handler(container, blob, query) if blob else handler(container, query)
+
+    do_GET = do_HEAD = do_PUT = do_DELETE = _handle
+
+    @staticmethod
+    def _validators(etag, last_modified):
+        return {'ETag': etag, 'Last-Modified': formatdate(last_modified, usegmt=True)}
+
+    # --- containers -----------------------------------------------------
+
+    def _container_put(self, container, query):
+        self._read_body()
+        store = self.server.store
+        with store.lock:
+            if query.get('comp') == 'acl':
+                if container not in store.containers:
+                    return self._error(404, 'ContainerNotFound')
+                return self._send(200, self._validators(store.new_etag(), time.time()))
+            if container in store.containers:
+                return self._error(409, 'ContainerAlreadyExists')
+            store.containers[container] = {}
+        self._send(201, self._validators(store.new_etag(), time.time()))
+
+    def _container_get(self, container, query):
+        if container not in self.server.store.containers:
+            return self._error(404, 'ContainerNotFound')
+        self._send(200, self._validators(self.server.store.new_etag(), time.time()))
+
+    _container_head = _container_get
+
+    # --- blobs ----------------------------------------------------------
+
+    def _blob_put(self, container, blob, query):
+        data = self._read_body()
+        store = self.server.store
+        key = (container, blob)
+        with store.lock:
+            if container not in store.containers:
+                return self._error(404, 'ContainerNotFound')
+            comp = query.get('comp')
+            if comp == 'block':
+                store.blocks.setdefault(key, {})[query.get('blockid', '')] = data
+                return self._send(201)
+            if comp == 'blocklist':
+                staged = store.blocks.get(key, {})
+                existing = store.containers[container].get(blob)
+                try:
+                    ids = [element.text or '' for element in ET.fromstring(data)]
+                except ET.ParseError:
+                    return self._error(400, 'InvalidXmlDocument')
+                if any(block_id not in staged for block_id in ids):
+                    return self._error(400, 'InvalidBlockList')
+                data = b''.join(staged[block_id] for block_id in ids)
+                store.blocks.pop(key, None)
+                content_type = self.headers.get('x-ms-blob-content-type') or (
+                    existing.content_type if existing else 'application/octet-stream')
+            elif self.headers.get('x-ms-blob-type'):
+                content_type = (self.headers.get('x-ms-blob-content-type') or self.headers.get('Content-Type')
+                                or 'application/octet-stream')
+            else:
+                return self._error(400, 'MissingRequiredHeader', 'x-ms-blob-type')
+            stored = StoredBlob(data, content_type, store.new_etag(), time.time())
+            store.containers[container][blob] = stored
+        self._send(201, self._validators(stored.etag, stored.last_modified))
+
+    def _blob_delete(self, container, blob, query):
+        self._read_body()
+        store = self.server.store
+        with store.lock:
+            if store.containers.get(container, {}).pop(blob, None) is None:
+                return self._error(404, 'BlobNotFound')
+        self._send(202)
+
+    def _blob_get(self, container, blob, query):
+        store = self.server.store
+        with store.lock:
+            if container not in store.containers:
+                return self._error(404, 'ContainerNotFound')
+            stored = store.containers[container].get(blob)
+        if stored is None:
+            return self._error(404, 'BlobNotFound')
+
+        headers = {
+            **self._validators(stored.etag, stored.last_modified),
+            'Content-Type': query.get('rsct') or stored.content_type,
+            'Accept-Ranges': 'bytes',
+            'x-ms-blob-type': 'BlockBlob',
+            'x-ms-creation-time': formatdate(stored.last_modified, usegmt=True),
+        }
+        if query.get('rscd'):
+            headers['Content-Disposition'] = query['rscd']
+        if_match = self.headers.get('If-Match')
+        if if_match and if_match not in ('*', stored.etag):
+            return self._error(412, 'ConditionNotMet')
+        if self.headers.get('If-None-Match') in ('*', stored.etag):
+            # Azure answers a read whose condition failed with this error code
+            return self._send(304, {'ETag': stored.etag, 'Content-Length': '0', 'x-ms-error-code': 'ConditionNotMet'})
+
+        size = len(stored.data)
+        range_header = self.headers.get('x-ms-range') or self.headers.get('Range')
+        match = _RANGE_RE.match(range_header or '')
+        if self.command == 'GET' and match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            if start >= size:
+                return self._error(416, 'InvalidRange', headers={'Content-Range': f'bytes */{size}'})
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return self._send(206, headers, stored.data[start:end + 1])
+        if self.command == 'HEAD':
+            headers['Content-Length'] = str(size)
+        self._send(200, headers, stored.data)
+
+    _blob_head = _blob_get
+
+
+def make_server(host: str = '127.0.0.1', port: int = DEFAULT_PORT, faults: Faults = NO_FAULTS,
+                verbose: bool = False):
+    """Return a ThreadingHTTPServer running the emulator (call serve_forever() on it)."""
+    server = ThreadingHTTPServer((host, port), BlobEmulatorHandler)
+    server.daemon_threads = True
+    server.store = BlobStore()
+    server.faults = faults
+    server.verbose = verbose
+    return server
+
+
+def start_in_background(host: str = '127.0.0.1', port: int = 0, faults: Faults = NO_FAULTS):
+    """Start the emulator in a daemon thread and return its server.
+
+    Port 0 picks a free port. `server.endpoint` is the scheme://host:port to
+    pass to connection_string(); stop it with server.shutdown() and
+    server.server_close(). `server.faults` and `server.store` may be replaced
+    while it runs.
+    """
+    server = make_server(host, port, faults)
+    server.endpoint = f'http://{host}:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, name='blob-emulator', daemon=True).start()
+    return server
@@ -0,0 +1,127 @@
+"""Failing fast when blob storage is slow or down, or asked for blobs that do not exist.
+
+Calls to Azure already have connect/read timeouts and a few short jittered
+retries (see blob_clients.py). On top of that, services/storage.py runs the
+reads of AzureStorage through:
+
+  - a circuit breaker: after BLOB_BREAKER_FAILURES consecutive outages
+    (timeouts, connection errors, 5xx or 429 answers) Azure is not called for
+    BLOB_BREAKER_COOLDOWN_SECONDS. Reads raise BlobUnavailable at once and the
+    proxy views serve their cached copy of the blob or answer 503, instead of
+    every request holding a worker until its own timeout. After the cooldown
+    a single trial read is let through: success closes the circuit, another
+    failure opens it again.
+  - a negative cache: a blob found missing is remembered for
+    BLOB_MISSING_TTL_SECONDS in the 'blobs' cache, so requests for a broken
+    link do not reach Azure every time. Uploading the blob forgets it.
+
+The 'blobs' cache is file-based, like the PDF cache, so every gunicorn worker
+of a host sees the same entries and an upload clears them for all of them.
+Other hosts, or a per-process cache backend, keep answering 404 for a blob
+uploaded elsewhere until the entry expires: keep BLOB_MISSING_TTL_SECONDS
+short.
+
+The breaker is per process: each worker detects an outage on its own, at the
+cost of BLOB_BREAKER_FAILURES slow calls.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+MISSING_CACHE_ALIAS = 'blobs'
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open), thread-safe.
+
+    - max_failures: consecutive failures that open the circuit (0 = never opens).
+    - cooldown: seconds the circuit stays open before a trial call.
+    """
+
+    def __init__(self, max_failures: int, cooldown: float):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None
+
+    def allow(self) -> bool:
+        """Return True if a call may go through now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                return False
+            # Half-open: one trial at a time; a trial that hangs is replaced
+            # by another one after a further cooldown
+            if self._trial_at is not None and now - self._trial_at < self.cooldown:
+                return False
+            self._trial_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.max_failures and (self._trial_at is not None or self._failures >= self.max_failures):
+                self._opened_at = time.monotonic()
+                self._trial_at = None
+
+    def retry_after(self) -> int:
+        """Seconds until the next trial call (0 when the circuit is closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(math.ceil(self.cooldown - (time.monotonic() - self._opened_at)), 0)
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker() -> CircuitBreaker:
+    """Return the process-wide breaker of the blob storage backend."""
+    global _breaker
+    max_failures = getattr(settings, 'BLOB_BREAKER_FAILURES', 5)
+    cooldown = getattr(settings, 'BLOB_BREAKER_COOLDOWN_SECONDS', 30)
+    breaker = _breaker
+    if breaker is not None and (breaker.max_failures, breaker.cooldown) == (max_failures, cooldown):
+        return breaker
+    with _breaker_lock:
+        if _breaker is None or (_breaker.max_failures, _breaker.cooldown) != (max_failures, cooldown):
+            _breaker = CircuitBreaker(max_failures, cooldown)
+        return _breaker
+
+
+def _missing_cache():
+    return caches[MISSING_CACHE_ALIAS]
+
+
+def _missing_key(blob_url: str) -> str:
+    return 'blob:ausente:' + hashlib.sha256(blob_url.encode('utf-8')).hexdigest()
+
+
+def is_known_missing(blob_url: str) -> bool:
+    return bool(_missing_cache().get(_missing_key(blob_url)))
+
+
+def remember_missing(blob_url: str):
+    ttl = getattr(settings, 'BLOB_MISSING_TTL_SECONDS', 60)
+    if ttl > 0:
+        _missing_cache().set(_missing_key(blob_url), True, ttl)
+
+
+def forget_missing(blob_url: str):
+    _missing_cache().delete(_missing_key(blob_url))
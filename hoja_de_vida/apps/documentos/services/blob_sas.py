@@ -0,0 +1,55 @@
+"""Short-lived, read-only SAS URLs to let clients download blobs from Azure directly.
+
+With BLOB_DELIVERY_MODE = "sas" the proxy views answer with a 302 to a signed
+URL instead of relaying the bytes through a gunicorn worker. Signing needs the
+Azure storage backend and the account key of the connection string (Azure or a
+local emulator); without them the views keep proxying.
+
+Expiry times are aligned to windows of BLOB_SAS_TTL_SECONDS, so every request
+within a window gets the same URL and browsers can reuse their cached copy.
+"""
+import time
+from datetime import datetime, timezone
+
+from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+from django.conf import settings
+
+from apps.documentos.services.blob_clients import get_blob_service_client
+from apps.documentos.services.storage import get_storage
+
+
+def sas_enabled():
+    return getattr(settings, 'BLOB_DELIVERY_MODE', 'proxy') == 'sas' and get_storage().name == 'azure'
+
+
+def generate_read_url(container: str, blob_path: str, content_disposition=None, content_type=None):
+    """Return (signed_url, reusable_seconds) for reading one blob.
+
+    - content_disposition / content_type: response headers Azure will send
+      for this URL (rscd / rsct), so downloads keep their file name.
+    - reusable_seconds: how long the same URL keeps being issued, usable as
+      the max-age of the redirect.
+
+    Returns None when the connection string has no account key to sign with.
+    """
+    client = get_blob_service_client()
+    account_key = getattr(client.credential, 'account_key', None)
+    if not account_key:
+        return None
+
+    ttl = max(getattr(settings, 'BLOB_SAS_TTL_SECONDS', 300), 1)
+    now = int(time.time())
+    window_end = (now // ttl + 1) * ttl
+    token = generate_blob_sas(
+        account_name=client.account_name,
+        container_name=container,
+        blob_name=blob_path,
+        account_key=account_key,
+        permission=BlobSasPermissions(read=True),
+        # The URL stays valid for a full TTL after the last time it is handed out
+        expiry=datetime.fromtimestamp(window_end + ttl, tz=timezone.utc),
+        content_disposition=content_disposition,
+        content_type=content_type,
+    )
+    blob_client = client.get_blob_client(container=container, blob=blob_path)
+    return f'{blob_client.url}?{token}', window_end - now
@@ -0,0 +1,84 @@
+"""Streaming uploads of Django uploaded files to the blob storage backend.
+
+Uploads are relayed chunk by chunk to get_storage().upload() instead of being
+joined into one bytes object first; the Azure backend stages them as blocks
+uploaded in parallel with a bounded memory ceiling (see services/storage.py).
+The SHA-256 recorded in BlobAsset is computed on the way.
+
+upload_content_addressed names the blob after the SHA-256 of its content:
+saving the same file again (from any record) reuses the existing blob instead
+of uploading another copy, and a blob URL always denotes the same bytes.
+"""
+import hashlib
+
+from django.conf import settings
+
+from apps.documentos.services import blob_assets
+from apps.documentos.services.storage import BlobNotFound, get_storage
+
+
+def iter_file_chunks(file_obj, chunk_size=None):
+    """Yield the content of a Django UploadedFile or any binary file-like object."""
+    if hasattr(file_obj, 'chunks'):
+        yield from file_obj.chunks()
+        return
+    chunk_size = chunk_size or getattr(settings, 'BLOB_UPLOAD_BLOCK_SIZE', 4 * 1024 * 1024)
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def upload_stream(blob_url: str, chunks, content_type: str):
+    """Upload an iterable of bytes chunks to `blob_url` and record its BlobAsset.
+
+    Returns the BlobProperties of the new blob. Exceptions from the source or
+    from the storage backend propagate.
+    """
+    digest = hashlib.sha256()
+
+    def _hashed():
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    properties = get_storage().upload(blob_url, _hashed(), content_type)
+    blob_assets.record_upload(blob_url, digest.hexdigest(), properties)
+    return properties
+
+
+def file_sha256(file_obj) -> str:
+    """Hash an uploaded file chunk by chunk and rewind it."""
+    digest = hashlib.sha256()
+    for chunk in iter_file_chunks(file_obj):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def _already_uploaded(blob_url: str, sha256: str) -> bool:
+    asset = blob_assets.get_fresh(blob_url)
+    if asset is not None and asset.sha256 == sha256:
+        return True
+    try:
+        properties = get_storage().stat(blob_url)
+    except BlobNotFound:
+        return False
+    # The name is the hash, so the existing blob has exactly this content
+    blob_assets.record_upload(blob_url, sha256, properties)
+    return True
+
+
+def upload_content_addressed(container: str, file_obj, ext: str, content_type: str) -> str:
+    """Upload `file_obj` as `<sha256><ext>` unless that blob already exists; return its URL.
+
+    - ext: extension including the dot (e.g. '.pdf').
+
+    Exceptions from reading the file or from the storage backend propagate.
+    """
+    sha256 = file_sha256(file_obj)
+    blob_url = get_storage().url(container, f'{sha256}{ext}')
+    if not _already_uploaded(blob_url, sha256):
+        upload_stream(blob_url, iter_file_chunks(file_obj), content_type)
+    return blob_url
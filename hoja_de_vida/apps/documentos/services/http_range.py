@@ -0,0 +1,108 @@
+"""Single byte-range support for HTTP responses (Range / If-Range / 206 / 416).
+
+Only one `bytes=` range per request is honoured. Multi-range or malformed
+headers are ignored and the whole body is served, which HTTP allows.
+"""
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+
+class RangeNotSatisfiable(ValueError):
+    """The requested range lies outside the representation."""
+
+
+def parse_range(header: str, size: int):
+    """Return the inclusive (start, end) byte range of a Range header value.
+
+    Returns None when the header must be ignored and raises RangeNotSatisfiable
+    when the range does not overlap a body of `size` bytes.
+    """
+    unit, _, spec = (header or '').partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    first, last = first.strip(), last.strip()
+    if not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(if_range: str, etag, last_modified):
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        # Weak validators never match If-Range
+        return False
+    if if_range.startswith('"'):
+        return bool(etag) and if_range == quote_etag(etag)
+    modified_since = parse_http_date_safe(if_range)
+    return bool(last_modified) and modified_since is not None and modified_since == int(last_modified)
+
+
+def requested_range(request, size: int, etag=None, last_modified=None):
+    """Return the (start, end) range to serve for `request`, or None for the full body.
+
+    - etag / last_modified: validators of the current representation, checked
+      against If-Range so a client resuming an outdated copy gets the full body.
+
+    Raises RangeNotSatisfiable (answer with not_satisfiable_response).
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and not _if_range_matches(if_range, etag, last_modified):
+        return None
+    return parse_range(header, size)
+
+
+def make_partial(response, start: int, end: int, size: int):
+    """Turn a response carrying bytes start..end into a 206 Partial Content."""
+    response.status_code = 206
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def not_satisfiable_response(size: int):
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def bytes_response(request, data: bytes, content_type: str, etag=None, last_modified=None):
+    """Return an HttpResponse for in-memory `data`, honouring a Range request."""
+    size = len(data)
+    try:
+        byte_range = requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        return not_satisfiable_response(size)
+
+    if byte_range is None:
+        response = HttpResponse(data, content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+    else:
+        start, end = byte_range
+        response = make_partial(HttpResponse(data[start:end + 1], content_type=content_type), start, end, size)
+    if etag:
+        response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
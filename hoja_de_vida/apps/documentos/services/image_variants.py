@@ -0,0 +1,93 @@
+"""Print and web versions of the profile photo and template backgrounds.
+
+The originals are uploaded at whatever resolution the user had, but the CV
+only ever shows them in fixed boxes. At upload time each image also gets:
+
+  - print: sized for its largest box on the A4 page at print DPI, used by the
+    PDF renderer (smaller HTML fetches, faster WeasyPrint decoding, lighter PDFs).
+  - web: a small version for the HTML pages.
+
+Both are never upscaled. Images with transparency stay PNG; opaque ones are
+re-encoded as JPEG. The URLs are kept in DatosPersonales.imagenes_derivadas as
+{"<field>": {"print": url, "web": url}}.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+
+MM_PER_INCH = 25.4
+
+# kind -> variant -> (box width mm, box height mm, DPI) or (max width px, max height px, None)
+SIZES = {
+    # Largest photo box in the PDF templates: 50 x 50 mm (cv_modern_clean)
+    'foto': {
+        'print': (50, 50, 300),
+        'web': (400, 400, None),
+    },
+    # Full A4 page; backgrounds are decorative, 150 DPI is plenty
+    'fondo': {
+        'print': (210, 297, 150),
+        'web': (640, 905, None),
+    },
+}
+
+VARIANTS = ('print', 'web')
+
+# Pillow format -> (content type, extension, save options)
+ENCODINGS = {
+    'PNG': ('image/png', '.png', {'optimize': True}),
+    'JPEG': ('image/jpeg', '.jpg', {'quality': 88, 'optimize': True, 'progressive': True}),
+}
+
+
+def _box_pixels(width, height, dpi):
+    if dpi is None:
+        return width, height
+    return round(width / MM_PER_INCH * dpi), round(height / MM_PER_INCH * dpi)
+
+
+def _has_alpha(image) -> bool:
+    return 'A' in image.getbands() or 'transparency' in image.info
+
+
+def build_variants(source, kind: str):
+    """Return {variant: (bytes, content_type, extension)} for an uploaded image.
+
+    - source: the image as bytes or a binary file-like object.
+    - kind: 'foto' or 'fondo' (see SIZES).
+
+    Raises RuntimeError when the data is not an image Pillow can read.
+    """
+    try:
+        image = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except Exception as exc:
+        raise RuntimeError(f'Cannot read image for print/web versions: {exc}')
+    pil_format = 'PNG' if _has_alpha(image) else 'JPEG'
+    image = image.convert('RGBA' if pil_format == 'PNG' else 'RGB')
+
+    variants = {}
+    for variant, (width, height, dpi) in SIZES[kind].items():
+        resized = image.copy()
+        # thumbnail() keeps the aspect ratio and never upscales
+        resized.thumbnail(_box_pixels(width, height, dpi), Image.LANCZOS)
+        content_type, ext, options = ENCODINGS[pil_format]
+        buffer = BytesIO()
+        resized.save(buffer, pil_format, **options)
+        variants[variant] = (buffer.getvalue(), content_type, ext)
+    return variants
+
+
+def variant_blob_url(perfil, field: str, variant=None):
+    """Blob URL to serve for `field` of a profile in the given variant.
+
+    Falls back to the original upload when the variant is unknown or was never
+    generated (images uploaded before versions existed).
+    """
+    original = getattr(perfil, field, None)
+    if variant not in VARIANTS:
+        return original
+    variantes = (getattr(perfil, 'imagenes_derivadas', None) or {}).get(field) or {}
+    return variantes.get(variant) or original
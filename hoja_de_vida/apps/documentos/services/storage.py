@@ -0,0 +1,430 @@
+"""Blob storage backends: one interface over Azure Blob Storage and the local disk.
+
+BLOB_STORAGE_BACKEND selects the backend returned by get_storage():
+  - "azure" (default): blobs in Azure Blob Storage (or a compatible emulator).
+  - "local": files under BLOB_LOCAL_ROOT/<container>/<name>. Their URLs start
+    with BLOB_LOCAL_BASE_URL and only identify the blob (they are stored in
+    the database like Azure URLs and never served directly); the proxy views
+    relay them with FileResponse, so the WSGI server can use sendfile.
+
+Blobs are always addressed by URL (`<base>/<container>/<name>`). Every backend
+implements upload, download, stream, stat and delete, and reports errors with
+the exceptions below instead of SDK-specific ones. Reads from Azure go through
+the circuit breaker and missing-blob cache of services/blob_resilience.py.
+"""
+import base64
+import mimetypes
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceExistsError,
+    ResourceNotFoundError,
+    ServiceRequestError,
+    ServiceResponseError,
+)
+from azure.storage.blob import BlobBlock, ContentSettings
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+from apps.documentos.services import blob_resilience
+from apps.documentos.services.blob_clients import get_blob_service_client
+
+
+# Metadata of a blob: etag (quoted, as Azure returns it), last_modified as an
+# aware datetime (or None), size in bytes and content type
+BlobProperties = namedtuple('BlobProperties', ['etag', 'last_modified', 'size', 'content_type'])
+
+# An open read: iterator of byte chunks, number of bytes it yields and the
+# properties of the whole blob
+BlobDownload = namedtuple('BlobDownload', ['chunks', 'size', 'properties'])
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobNotFound(Exception):
+    """The blob does not exist."""
+
+
+class BlobNotModified(Exception):
+    """Conditional read: the blob still has the ETag given in if_none_match."""
+
+
+class BlobChanged(Exception):
+    """Conditional read: the blob no longer has the ETag given in if_match."""
+
+
+class BlobUnavailable(Exception):
+    """The backend is failing and the circuit breaker is open; nothing was requested."""
+
+
+def is_outage(exc) -> bool:
+    """True for errors that mean the backend is down or overloaded, not that the request was wrong."""
+    if isinstance(exc, (BlobUnavailable, ServiceRequestError, ServiceResponseError)):
+        return True
+    status = getattr(exc, 'status_code', None) if isinstance(exc, HttpResponseError) else None
+    return status is not None and (status >= 500 or status == 429)
+
+
+def _block_size():
+    return max(getattr(settings, 'BLOB_UPLOAD_BLOCK_SIZE', 4 * 1024 * 1024), 64 * 1024)
+
+
+def _blocks(chunks, block_size):
+    """Regroup arbitrary chunks into blocks of exactly `block_size` (last one shorter)."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _block_id(index: int) -> str:
+    # Every id of a blob must have the same length
+    return base64.b64encode(f'{index:08d}'.encode('ascii')).decode('ascii')
+
+
+class AzureStorage:
+    """Azure Blob Storage, through the shared pooled BlobServiceClient."""
+
+    name = 'azure'
+    # Reads cross the network: worth keeping copies in the local blob cache
+    cacheable = True
+
+    def split_url(self, blob_url: str):
+        """Return (container, blob_path) for a blob URL.
+
+        Understands both Azure URLs (https://<account>.blob.core.windows.net/<container>/...)
+        and the path-style URLs of local emulators (http://host:port/<account>/<container>/...).
+        """
+        parsed = urlparse(blob_url)
+        path = parsed.path.lstrip('/')
+        account, _sep, rest = path.partition('/')
+        if rest and not (parsed.hostname or '').startswith(f'{account}.') and account == self._account_name():
+            path = rest
+        if '/' not in path:
+            raise ValueError('Invalid blob URL')
+        return path.split('/', 1)
+
+    def _account_name(self):
+        try:
+            return get_blob_service_client().account_name
+        except RuntimeError:
+            # No connection string: only Azure-style URLs can be split
+            return None
+
+    def _blob_client(self, blob_url: str):
+        container, blob_path = self.split_url(blob_url)
+        return get_blob_service_client().get_blob_client(container=container, blob=blob_path)
+
+    def _guarded(self, blob_url: str, read):
+        """Run read() unless the blob is known to be missing or the circuit is open.
+
+        Raises BlobNotFound / BlobUnavailable without calling Azure in those
+        cases, and feeds the outcome of read() to the breaker.
+        """
+        if blob_resilience.is_known_missing(blob_url):
+            raise BlobNotFound(blob_url)
+        breaker = blob_resilience.get_breaker()
+        if not breaker.allow():
+            raise BlobUnavailable(blob_url)
+        try:
+            result = read()
+        except BlobNotFound:
+            breaker.record_success()
+            blob_resilience.remember_missing(blob_url)
+            raise
+        except Exception as exc:
+            if is_outage(exc):
+                breaker.record_failure()
+            else:
+                # Azure answered (304, 412, 403...): it is up
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    def url(self, container: str, blob_name: str) -> str:
+        return get_blob_service_client().get_blob_client(container=container, blob=blob_name).url
+
+    def ensure_container(self, container: str):
+        """Create the container if missing and keep it private (best-effort)."""
+        container_client = get_blob_service_client().get_container_client(container)
+        try:
+            container_client.create_container()
+        except ResourceExistsError:
+            pass
+        try:
+            container_client.set_container_access_policy(public_access=None)
+        except Exception:
+            # not fatal — continue even if we cannot change ACL due to permissions
+            pass
+
+    def upload(self, blob_url: str, chunks, content_type: str):
+        """Upload an iterable of byte chunks (overwriting) and return its BlobProperties.
+
+        Chunks are regrouped into blocks of BLOB_UPLOAD_BLOCK_SIZE staged by up to
+        BLOB_UPLOAD_CONCURRENCY threads and then committed; at most concurrency + 1
+        blocks are in memory. Content that fits in one block goes up in a single
+        request. Blocks staged by a failed upload are never committed.
+        """
+        blob_client = self._blob_client(blob_url)
+        blob_resilience.forget_missing(blob_url)
+        block_size = _block_size()
+        concurrency = max(getattr(settings, 'BLOB_UPLOAD_CONCURRENCY', 4), 1)
+
+        blocks = _blocks(chunks, block_size)
+        first = next(blocks, b'')
+        second = next(blocks, None)
+        if second is None:
+            result = blob_client.upload_blob(first, overwrite=True, content_type=content_type)
+            return BlobProperties(result.get('etag'), result.get('last_modified'), len(first), content_type)
+
+        # Bounds the blocks waiting in the executor; together with the one being
+        # filled this is the memory ceiling of the upload
+        slots = threading.BoundedSemaphore(concurrency)
+        futures = []
+        size = 0
+
+        def _stage(block_id, data):
+            try:
+                blob_client.stage_block(block_id, data, length=len(data))
+            finally:
+                slots.release()
+
+        def _remaining():
+            yield first
+            yield second
+            yield from blocks
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                for index, data in enumerate(_remaining()):
+                    size += len(data)
+                    slots.acquire()
+                    futures.append(executor.submit(_stage, _block_id(index), data))
+                    # Stop reading as soon as a block failed
+                    failed = next((f for f in futures if f.done() and f.exception()), None)
+                    if failed is not None:
+                        failed.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            for future in futures:
+                future.result()
+
+        result = blob_client.commit_block_list(
+            [BlobBlock(block_id=_block_id(index)) for index in range(len(futures))],
+            content_settings=ContentSettings(content_type=content_type),
+        )
+        return BlobProperties(result.get('etag'), result.get('last_modified'), size, content_type)
+
+    def stat(self, blob_url: str):
+        return self._guarded(blob_url, lambda: self._stat(blob_url))
+
+    def _stat(self, blob_url: str):
+        try:
+            properties = self._blob_client(blob_url).get_blob_properties()
+        except ResourceNotFoundError:
+            raise BlobNotFound(blob_url)
+        return self._properties(properties)
+
+    def _properties(self, properties):
+        content_settings = getattr(properties, 'content_settings', None)
+        size = properties.size
+        # A ranged download reports the size of the range; the whole size is in Content-Range
+        content_range = getattr(properties, 'content_range', None)
+        if content_range and content_range.rpartition('/')[2].isdigit():
+            size = int(content_range.rpartition('/')[2])
+        return BlobProperties(
+            properties.etag,
+            properties.last_modified,
+            size,
+            getattr(content_settings, 'content_type', '') or '',
+        )
+
+    def stream(self, blob_url: str, offset=0, length=None, if_none_match=None, if_match=None):
+        """Open a read of the blob (or of `length` bytes from `offset`) and return a BlobDownload.
+
+        - if_none_match: ETag of a copy the caller has; raises BlobNotModified if current.
+        - if_match: ETag the blob must still have; raises BlobChanged otherwise.
+
+        Raises BlobUnavailable while the circuit breaker is open.
+        """
+        return self._guarded(blob_url, lambda: self._open(blob_url, offset, length, if_none_match, if_match))
+
+    def _open(self, blob_url: str, offset, length, if_none_match, if_match):
+        kwargs = {}
+        if offset or length is not None:
+            kwargs.update(offset=offset, length=length)
+        if if_none_match:
+            kwargs.update(etag=if_none_match, match_condition=MatchConditions.IfModified)
+        elif if_match:
+            kwargs.update(etag=if_match, match_condition=MatchConditions.IfNotModified)
+        try:
+            downloader = self._blob_client(blob_url).download_blob(**kwargs)
+        except HttpResponseError as exc:
+            # Mapped by status: the SDK reports a 304 as a plain HttpResponseError
+            # (or ResourceModifiedError, from its ConditionNotMet error code)
+            status = getattr(exc, 'status_code', None)
+            if status == 304:
+                raise BlobNotModified(blob_url)
+            if status == 412:
+                raise BlobChanged(blob_url)
+            if status == 404:
+                raise BlobNotFound(blob_url)
+            raise
+        return BlobDownload(downloader.chunks(), downloader.size, self._properties(downloader.properties))
+
+    def download(self, blob_url: str, if_none_match=None):
+        """Return (bytes, BlobProperties) of the whole blob; same conditions as stream()."""
+        download = self.stream(blob_url, if_none_match=if_none_match)
+        return b''.join(download.chunks), download.properties
+
+    def delete(self, blob_url: str):
+        try:
+            self._blob_client(blob_url).delete_blob()
+        except ResourceNotFoundError:
+            raise BlobNotFound(blob_url)
+
+    def open_local(self, blob_url: str):
+        """Return (file object, BlobProperties) for blobs on local disk; never for Azure."""
+        return None
+
+
+class LocalStorage:
+    """Files on local disk under BLOB_LOCAL_ROOT/<container>/<name>."""
+
+    name = 'local'
+    # Already on local disk: copying into the blob cache would only waste space
+    cacheable = False
+
+    def _base_url(self):
+        return getattr(settings, 'BLOB_LOCAL_BASE_URL', 'http://blobs.local').rstrip('/')
+
+    def _root(self):
+        return str(getattr(settings, 'BLOB_LOCAL_ROOT'))
+
+    def split_url(self, blob_url: str):
+        """Return (container, blob_path) for a local blob URL."""
+        base = self._base_url() + '/'
+        if not blob_url.startswith(base):
+            raise ValueError('Invalid blob URL')
+        path = blob_url[len(base):]
+        if '/' not in path:
+            raise ValueError('Invalid blob URL')
+        return path.split('/', 1)
+
+    def _path(self, blob_url: str):
+        container, blob_path = self.split_url(blob_url)
+        try:
+            return safe_join(self._root(), container, blob_path)
+        except SuspiciousFileOperation:
+            raise ValueError('Invalid blob URL')
+
+    def url(self, container: str, blob_name: str) -> str:
+        return f'{self._base_url()}/{container}/{blob_name}'
+
+    def ensure_container(self, container: str):
+        os.makedirs(safe_join(self._root(), container), exist_ok=True)
+
+    def _properties(self, path, st):
+        content_type, _ = mimetypes.guess_type(path)
+        return BlobProperties(
+            # Same recipe as Django's static file ETags: changes with any rewrite
+            f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+            datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            st.st_size,
+            content_type or '',
+        )
+
+    def upload(self, blob_url: str, chunks, content_type: str):
+        """Write the chunks to a temporary file and rename it over the blob."""
+        path = self._path(blob_url)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return self._properties(path, os.stat(path))
+
+    def stat(self, blob_url: str):
+        path = self._path(blob_url)
+        try:
+            return self._properties(path, os.stat(path))
+        except FileNotFoundError:
+            raise BlobNotFound(blob_url)
+
+    def open_local(self, blob_url: str):
+        """Return (open binary file, BlobProperties of that very file)."""
+        path = self._path(blob_url)
+        try:
+            fh = open(path, 'rb')
+        except FileNotFoundError:
+            raise BlobNotFound(blob_url)
+        return fh, self._properties(path, os.fstat(fh.fileno()))
+
+    def stream(self, blob_url: str, offset=0, length=None, if_none_match=None, if_match=None):
+        fh, properties = self.open_local(blob_url)
+        if (if_none_match and if_none_match == properties.etag) or (if_match and if_match != properties.etag):
+            fh.close()
+            raise (BlobNotModified if if_none_match else BlobChanged)(blob_url)
+        fh.seek(offset)
+        remaining = properties.size - offset if length is None else min(length, properties.size - offset)
+
+        def _chunks(remaining=remaining):
+            with fh:
+                while remaining > 0:
+                    chunk = fh.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+
+        return BlobDownload(_chunks(), max(remaining, 0), properties)
+
+    def download(self, blob_url: str, if_none_match=None):
+        download = self.stream(blob_url, if_none_match=if_none_match)
+        return b''.join(download.chunks), download.properties
+
+    def delete(self, blob_url: str):
+        try:
+            os.remove(self._path(blob_url))
+        except FileNotFoundError:
+            raise BlobNotFound(blob_url)
+
+
+_BACKENDS = {
+    'azure': AzureStorage,
+    'local': LocalStorage,
+}
+
+
+def get_storage():
+    """Return the backend selected by BLOB_STORAGE_BACKEND."""
+    name = getattr(settings, 'BLOB_STORAGE_BACKEND', 'azure')
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise RuntimeError(f'Unknown BLOB_STORAGE_BACKEND "{name}". Use one of: {", ".join(_BACKENDS)}.')
@@ -1,3 +1,475 @@
-from django.test import TestCase
+import hashlib
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.http import http_date
+
+from apps.documentos.models import BlobAsset
+from apps.documentos.services import block_upload, blob_assets, blob_clients, blob_emulator, blob_resilience, http_range, storage
+
+
+BLOB_URL = 'https://cuenta.blob.core.windows.net/certificados/' + 'a' * 64 + '.pdf'
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_satisfiable_ranges(self):
+        cases = {
+            'bytes=0-9': (0, 9),
+            'bytes=10-': (10, 99),
+            'bytes=-10': (90, 99),
+            'bytes=-500': (0, 99),
+            'bytes=90-500': (90, 99),
+            'BYTES = 5 - 5': (5, 5),
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(http_range.parse_range(header, 100), expected)
+
+    def test_ignored_headers(self):
+        for header in ('', 'items=0-9', 'bytes=0-9,20-29', 'bytes=5', 'bytes=-', 'bytes=a-9', 'bytes=9-0'):
+            with self.subTest(header=header):
+                self.assertIsNone(http_range.parse_range(header, 100))
+
+    def test_unsatisfiable_ranges(self):
+        for header, size in (('bytes=100-', 100), ('bytes=-0', 100), ('bytes=-5', 0), ('bytes=0-', 0)):
+            with self.subTest(header=header, size=size):
+                with self.assertRaises(http_range.RangeNotSatisfiable):
+                    http_range.parse_range(header, size)
+
+
+class BytesResponseTests(SimpleTestCase):
+    DATA = bytes(range(100))
+    LAST_MODIFIED = 1767225600  # 2026-01-01
+
+    def respond(self, **headers):
+        request = RequestFactory().get('/', **headers)
+        return http_range.bytes_response(request, self.DATA, 'application/pdf', etag='abc', last_modified=self.LAST_MODIFIED)
+
+    def test_full_body(self):
+        response = self.respond()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.DATA)
+        self.assertEqual((response['Accept-Ranges'], response['ETag']), ('bytes', '"abc"'))
+
+    def test_partial_content(self):
+        response = self.respond(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.DATA[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_not_satisfiable(self):
+        response = self.respond(HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range(self):
+        matching = (
+            '"abc"',
+            http_date(self.LAST_MODIFIED),
+        )
+        for if_range in matching:
+            with self.subTest(if_range=if_range):
+                self.assertEqual(self.respond(HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE=if_range).status_code, 206)
+        # Outdated or weak validators: the client gets the whole new body
+        for if_range in ('"old"', 'W/"abc"', http_date(self.LAST_MODIFIED - 60)):
+            with self.subTest(if_range=if_range):
+                self.assertEqual(self.respond(HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE=if_range).status_code, 200)
+
+
+class StorageBackendTests:
+    """Behaviour every storage backend must have; mixed into a SimpleTestCase per backend.
+
+    Subclasses set self.storage in setUp.
+    """
+    CONTAINER = 'certificados'
+    DATA = bytes(range(256)) * 1024  # 256 KiB
+
+    def upload(self, name='cv.pdf', data=DATA, chunk_size=10000):
+        self.storage.ensure_container(self.CONTAINER)
+        blob_url = self.storage.url(self.CONTAINER, name)
+        chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+        return blob_url, self.storage.upload(blob_url, chunks, 'application/pdf')
+
+    def test_upload_round_trip(self):
+        blob_url, properties = self.upload()
+        self.assertEqual(properties.size, len(self.DATA))
+        self.assertTrue(properties.etag)
+        self.assertEqual(self.storage.split_url(blob_url), [self.CONTAINER, 'cv.pdf'])
+
+        data, downloaded = self.storage.download(blob_url)
+        self.assertEqual(data, self.DATA)
+        self.assertEqual(downloaded.etag, properties.etag)
+        self.assertEqual(downloaded.content_type, 'application/pdf')
+        self.assertEqual(self.storage.stat(blob_url), downloaded)
+
+    def test_overwrite_changes_the_etag(self):
+        blob_url, first = self.upload()
+        _, second = self.upload(data=b'%PDF-1.4 nuevo')
+        self.assertNotEqual(first.etag, second.etag)
+        self.assertEqual(self.storage.download(blob_url)[0], b'%PDF-1.4 nuevo')
+
+    def test_ranged_stream(self):
+        blob_url, _ = self.upload()
+        download = self.storage.stream(blob_url, offset=1000, length=70000)
+        self.assertEqual(download.size, 70000)
+        self.assertEqual(b''.join(download.chunks), self.DATA[1000:71000])
+        self.assertEqual(download.properties.size, len(self.DATA))
+
+    def test_conditional_reads(self):
+        blob_url, properties = self.upload()
+        with self.assertRaises(storage.BlobNotModified):
+            self.storage.stream(blob_url, if_none_match=properties.etag)
+        with self.assertRaises(storage.BlobChanged):
+            self.storage.stream(blob_url, if_match='"0xOTRA"')
+        self.assertEqual(self.storage.download(blob_url, if_none_match='"0xOTRA"')[0], self.DATA)
+
+    def test_missing_blobs(self):
+        self.storage.ensure_container(self.CONTAINER)
+        blob_url = self.storage.url(self.CONTAINER, 'no-existe.pdf')
+        for operation in (self.storage.stat, self.storage.download, self.storage.delete):
+            with self.subTest(operation=operation.__name__), self.assertRaises(storage.BlobNotFound):
+                operation(blob_url)
+
+    def test_delete(self):
+        blob_url, _ = self.upload()
+        self.storage.delete(blob_url)
+        with self.assertRaises(storage.BlobNotFound):
+            self.storage.stat(blob_url)
+
+
+def use_local_storage(test_case):
+    """Point the storage backend of `test_case` to a temporary directory."""
+    root = tempfile.TemporaryDirectory()
+    test_case.addCleanup(root.cleanup)
+    settings = override_settings(
+        BLOB_STORAGE_BACKEND='local',
+        BLOB_LOCAL_ROOT=root.name,
+        BLOB_LOCAL_BASE_URL='http://blobs.local',
+    )
+    settings.enable()
+    test_case.addCleanup(settings.disable)
+    return storage.get_storage()
+
+
+class LocalStorageTests(StorageBackendTests, SimpleTestCase):
+    def setUp(self):
+        self.storage = use_local_storage(self)
+
+    def test_backend_selection(self):
+        self.assertIsInstance(self.storage, storage.LocalStorage)
+        self.assertFalse(self.storage.cacheable)
+        with self.settings(BLOB_STORAGE_BACKEND='s3'), self.assertRaisesMessage(RuntimeError, 'Unknown BLOB_STORAGE_BACKEND'):
+            storage.get_storage()
+
+    def test_urls_outside_the_root_are_rejected(self):
+        for blob_url in ('http://otro.host/certificados/cv.pdf', 'http://blobs.local/cv.pdf',
+                         'http://blobs.local/certificados/../../etc/passwd'):
+            with self.subTest(blob_url=blob_url), self.assertRaises(ValueError):
+                self.storage.stat(blob_url)
+
+    def test_open_local_returns_the_file(self):
+        blob_url, properties = self.upload()
+        fh, opened = self.storage.open_local(blob_url)
+        with fh:
+            self.assertEqual(fh.read(), self.DATA)
+        self.assertEqual(opened, properties)
+
+
+class BlobEmulatorMixin:
+    """Run the test case against an in-process blob emulator, with the settings of config/settings_test.py.
+
+    The emulator starts once per class on a free port; every test gets an
+    empty store, no injected faults, a closed circuit breaker and fresh
+    caches. Set `faults` on self.emulator to make it slow or failing.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.emulator = blob_emulator.start_in_background()
+        cls.addClassCleanup(cls.emulator.server_close)
+        cls.addClassCleanup(cls.emulator.shutdown)
+
+    def setUp(self):
+        super().setUp()
+        self.emulator.store = blob_emulator.BlobStore()
+        self.emulator.faults = blob_emulator.NO_FAULTS
+        blob_cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_cache_dir.cleanup)
+        settings = override_settings(
+            AZURE_STORAGE_CONNECTION_STRING=blob_emulator.connection_string(self.emulator.endpoint),
+            BLOB_STORAGE_BACKEND='azure',
+            BLOB_DELIVERY_MODE='proxy',
+            BLOB_CACHE_DIR=blob_cache_dir.name,
+            BLOB_UPLOAD_BLOCK_SIZE=64 * 1024,
+            BLOB_RETRY_TOTAL=0,
+            BLOB_READ_TIMEOUT=2,
+            BLOB_BREAKER_FAILURES=3,
+            BLOB_BREAKER_COOLDOWN_SECONDS=30,
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'emulador'},
+                'pdf': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'emulador-pdf'},
+                'blobs': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'emulador-blobs'},
+            },
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        breaker = mock.patch.object(blob_resilience, '_breaker', None)
+        breaker.start()
+        self.addCleanup(breaker.stop)
+
+    def fail_requests(self, status=503):
+        """Make the emulator answer every request with `status`."""
+        self.emulator.faults = blob_emulator.NO_FAULTS._replace(error_rate=1.0, error_status=status)
+
+
+class AzureStorageEmulatorTests(BlobEmulatorMixin, StorageBackendTests, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = storage.get_storage()
+
+    def test_path_style_urls(self):
+        blob_url = self.storage.url('certificados', 'a/b.pdf')
+        self.assertEqual(blob_url, f'{self.emulator.endpoint}/{blob_emulator.ACCOUNT_NAME}/certificados/a/b.pdf')
+        self.assertEqual(self.storage.split_url(blob_url), ['certificados', 'a/b.pdf'])
+        self.assertEqual(
+            self.storage.split_url('https://cuenta.blob.core.windows.net/certificados/a/b.pdf'),
+            ['certificados', 'a/b.pdf'],
+        )
+
+    def test_large_uploads_are_staged_in_blocks(self):
+        blob_url, _ = self.upload()
+        self.assertEqual(self.storage.download(blob_url)[0], self.DATA)
+        self.assertEqual(self.emulator.store.blocks, {})
+
+    def test_downloads_stream_in_ranges(self):
+        blob_url, _ = self.upload()
+        served = []
+        send = blob_emulator.BlobEmulatorHandler._send
+
+        def counting_send(handler, status, headers=None, body=b''):
+            if handler.command == 'GET':
+                served.append(len(body))
+            return send(handler, status, headers, body)
+
+        # A fresh client, so that it is built with the smaller ranges
+        with mock.patch.dict(blob_clients._clients, clear=True), \
+                mock.patch.object(blob_emulator.BlobEmulatorHandler, '_send', counting_send), \
+                self.settings(BLOB_DOWNLOAD_CHUNK_SIZE=64 * 1024):
+            download = self.storage.stream(blob_url)
+            first = next(download.chunks)
+            # The first chunk arrives after a single 64 KiB range, not the whole blob
+            self.assertEqual(first, self.DATA[:64 * 1024])
+            self.assertEqual(served, [64 * 1024])
+            self.assertEqual(download.size, len(self.DATA))
+            self.assertEqual(first + b''.join(download.chunks), self.DATA)
+        self.assertEqual(served, [64 * 1024] * 4)
+
+    def test_missing_blobs_are_remembered(self):
+        self.storage.ensure_container(self.CONTAINER)
+        blob_url = self.storage.url(self.CONTAINER, 'no-existe.pdf')
+        with self.assertRaises(storage.BlobNotFound):
+            self.storage.stat(blob_url)
+        # Even with Azure failing, the known-missing blob is answered locally
+        self.fail_requests()
+        with self.assertRaises(storage.BlobNotFound):
+            self.storage.stat(blob_url)
+        self.emulator.faults = blob_emulator.NO_FAULTS
+        _, properties = self.upload('no-existe.pdf')
+        self.assertEqual(self.storage.stat(blob_url), properties._replace(content_type='application/pdf'))
+
+    def test_outages_open_the_circuit(self):
+        blob_url, _ = self.upload()
+        self.fail_requests()
+        for _ in range(3):
+            with self.assertRaises(Exception) as raised:
+                self.storage.stat(blob_url)
+            self.assertTrue(storage.is_outage(raised.exception))
+        # Open: no request reaches the emulator, even once it has recovered
+        self.emulator.faults = blob_emulator.NO_FAULTS
+        with self.assertRaises(storage.BlobUnavailable):
+            self.storage.stat(blob_url)
+        self.assertGreater(blob_resilience.get_breaker().retry_after(), 0)
+
+
+class BlobAssetRecordTests(TestCase):
+    def test_record_creates_then_refreshes_the_row(self):
+        blob_assets.record(BLOB_URL, '"0x1"', 10, 'application/pdf', sha256='f' * 64)
+        asset = blob_assets.record(BLOB_URL, '"0x1"', 10, 'application/pdf')
+        self.assertEqual(BlobAsset.objects.count(), 1)
+        self.assertEqual(asset.sha256, 'f' * 64)
+
+        # A new ETag means new content: the known hash no longer applies
+        asset = blob_assets.record(BLOB_URL, '"0x2"', 12, 'application/pdf')
+        self.assertEqual((asset.etag, asset.tamano, asset.sha256), ('"0x2"', 12, ''))
+
+    def test_record_updates_a_row_inserted_concurrently(self):
+        # Another request inserts the row between our lookup and our insert
+        BlobAsset.objects.create(url=BLOB_URL, etag='"0x1"', tamano=10, verificado='2026-01-01T00:00Z')
+        real_get = blob_assets.get
+        with mock.patch.object(blob_assets, 'get', side_effect=[None, real_get(BLOB_URL)]):
+            asset = blob_assets.record(BLOB_URL, '"0x2"', 12, 'application/pdf')
+
+        self.assertEqual(BlobAsset.objects.count(), 1)
+        self.assertEqual(BlobAsset.objects.get().pk, asset.pk)
+        self.assertEqual((asset.etag, asset.tamano), ('"0x2"', 12))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch.object(blob_resilience.time, 'monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.breaker = blob_resilience.CircuitBreaker(max_failures=3, cooldown=30)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+        self.assertTrue(self.breaker.allow())
+        self.fail(1)
+        self.assertFalse(self.breaker.allow())
+        self.now += 10
+        self.assertEqual(self.breaker.retry_after(), 20)
+
+    def test_half_open_lets_one_trial_through(self):
+        self.fail(3)
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        # A failed trial opens the circuit again at once
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 0)
+
+    def test_a_hung_trial_is_replaced_after_another_cooldown(self):
+        self.fail(3)
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_zero_failures_never_opens(self):
+        breaker = blob_resilience.CircuitBreaker(max_failures=0, cooldown=30)
+        for _ in range(100):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+    def test_get_breaker_follows_the_settings(self):
+        with mock.patch.object(blob_resilience, '_breaker', None):
+            with self.settings(BLOB_BREAKER_FAILURES=3, BLOB_BREAKER_COOLDOWN_SECONDS=30):
+                breaker = blob_resilience.get_breaker()
+                self.assertIs(blob_resilience.get_breaker(), breaker)
+            with self.settings(BLOB_BREAKER_FAILURES=5, BLOB_BREAKER_COOLDOWN_SECONDS=30):
+                self.assertEqual(blob_resilience.get_breaker().max_failures, 5)
+
+
+class JitteredRetryTests(SimpleTestCase):
+    def test_backoff_is_drawn_below_the_exponential_bound(self):
+        policy = blob_clients._JitteredRetry(initial_backoff=0.5, retry_total=2)
+        for count in range(4):
+            with mock.patch.object(blob_clients.random, 'uniform', return_value=0.1) as uniform:
+                self.assertEqual(policy.get_backoff_time({'count': count}), 0.1)
+            uniform.assert_called_once_with(0, 0.5 * 2 ** count)
+
+    def test_outage_classification(self):
+        def http_error(status):
+            error = HttpResponseError('error')
+            error.status_code = status
+            return error
+
+        self.assertTrue(storage.is_outage(storage.BlobUnavailable('x')))
+        self.assertTrue(storage.is_outage(ServiceRequestError('timeout')))
+        self.assertTrue(storage.is_outage(http_error(503)))
+        self.assertTrue(storage.is_outage(http_error(429)))
+        self.assertFalse(storage.is_outage(http_error(403)))
+        self.assertFalse(storage.is_outage(storage.BlobNotFound('x')))
+
+
+class MissingBlobCacheTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.location = directorio.name
+        caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'blobs': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.location},
+        }
+        settings = override_settings(CACHES=caches, BLOB_MISSING_TTL_SECONDS=60)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_an_upload_forgets_the_blob_in_every_worker(self):
+        # Another gunicorn worker of the host: its own cache object, same directory
+        otro_worker = FileBasedCache(self.location, {})
+        key = blob_resilience._missing_key(BLOB_URL)
+
+        blob_resilience.remember_missing(BLOB_URL)
+        self.assertTrue(blob_resilience.is_known_missing(BLOB_URL))
+        self.assertTrue(otro_worker.get(key))
+
+        blob_resilience.forget_missing(BLOB_URL)
+        self.assertFalse(blob_resilience.is_known_missing(BLOB_URL))
+        self.assertIsNone(otro_worker.get(key))
+
+    def test_ttl_zero_disables_the_negative_cache(self):
+        with self.settings(BLOB_MISSING_TTL_SECONDS=0):
+            blob_resilience.remember_missing(BLOB_URL)
+        self.assertFalse(blob_resilience.is_known_missing(BLOB_URL))
+
+
+class ContentAddressedUploadTests(TestCase):
+    PDF = b'%PDF-1.4 certificado' * 1000
+
+    def setUp(self):
+        self.storage = use_local_storage(self)
+        self.storage.ensure_container('certificados')
+        upload_stream = mock.patch.object(block_upload, 'upload_stream', wraps=block_upload.upload_stream)
+        self.upload_stream = upload_stream.start()
+        self.addCleanup(upload_stream.stop)
+
+    def upload(self, data=PDF):
+        archivo = SimpleUploadedFile('certificado.pdf', data, content_type='application/pdf')
+        return block_upload.upload_content_addressed('certificados', archivo, '.pdf', 'application/pdf')
+
+    def test_blob_is_named_after_its_content(self):
+        sha256 = hashlib.sha256(self.PDF).hexdigest()
+        blob_url = self.upload()
+        self.assertEqual(blob_url, f'http://blobs.local/certificados/{sha256}.pdf')
+        self.assertEqual(self.storage.download(blob_url)[0], self.PDF)
+        self.assertEqual(blob_assets.get(blob_url).sha256, sha256)
+
+    def test_same_content_is_uploaded_once(self):
+        self.assertEqual(self.upload(), self.upload())
+        self.assertEqual(self.upload_stream.call_count, 1)
+        self.assertNotEqual(self.upload(b'%PDF-1.4 otro'), self.upload())
+        self.assertEqual(self.upload_stream.call_count, 2)
+
+    def test_existing_blob_without_a_record_is_reused(self):
+        blob_url = self.upload()
+        BlobAsset.objects.all().delete()
+        self.assertEqual(self.upload(), blob_url)
+        self.assertEqual(self.upload_stream.call_count, 1)
+        self.assertEqual(blob_assets.get(blob_url).sha256, hashlib.sha256(self.PDF).hexdigest())
+
+    def test_plain_file_objects_are_rewound_after_hashing(self):
+        blob_url = block_upload.upload_content_addressed('certificados', BytesIO(self.PDF), '.pdf', 'application/pdf')
+        self.assertEqual(self.storage.download(blob_url)[0], self.PDF)
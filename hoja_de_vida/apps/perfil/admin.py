@@ -1,9 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import DatosPersonales, VisibilidadCV
 
 from apps.documentos.services.azure_storage import upload_profile_image, upload_template_image
+from apps.perfil.services.prerender import encolar_prerender
 
 
 class DatosPersonalesAdminForm(forms.ModelForm):
@@ -49,6 +50,7 @@ class DatosPersonalesAdminForm(forms.ModelForm):
 class DatosPersonalesAdmin(admin.ModelAdmin):
     form = DatosPersonalesAdminForm
     list_display = ('apellidos', 'nombres', 'numerocedula', 'perfilactivo')
+    actions = ['prerenderizar_pdfs']
 
     fieldsets = (
         ('Información Personal', {
@@ -77,8 +79,9 @@ class DatosPersonalesAdmin(admin.ModelAdmin):
         f = form.cleaned_data.get('foto_perfil_file') if hasattr(form, 'cleaned_data') else None
         if f:
             try:
-                url = upload_profile_image(f)
-                obj.foto_perfil_url = url
+                subida = upload_profile_image(f)
+                obj.foto_perfil_url = subida.url
+                obj.imagenes_derivadas = {**(obj.imagenes_derivadas or {}), 'foto_perfil_url': subida.variantes}
             except Exception as exc:
                 # Raise ValidationError so admin shows the problem
                 raise ValidationError(f'Error subiendo la imagen a Azure: {exc}')
@@ -87,21 +90,29 @@ class DatosPersonalesAdmin(admin.ModelAdmin):
         f_prof = form.cleaned_data.get('fondo_professional_file') if hasattr(form, 'cleaned_data') else None
         if f_prof:
             try:
-                url = upload_template_image(f_prof)
-                obj.fondo_professional_url = url
+                subida = upload_template_image(f_prof)
+                obj.fondo_professional_url = subida.url
+                obj.imagenes_derivadas = {**(obj.imagenes_derivadas or {}), 'fondo_professional_url': subida.variantes}
             except Exception as exc:
                 raise ValidationError(f'Error subiendo fondo Professional a Azure: {exc}')
 
         f_mod = form.cleaned_data.get('fondo_modern_file') if hasattr(form, 'cleaned_data') else None
         if f_mod:
             try:
-                url = upload_template_image(f_mod)
-                obj.fondo_modern_url = url
+                subida = upload_template_image(f_mod)
+                obj.fondo_modern_url = subida.url
+                obj.imagenes_derivadas = {**(obj.imagenes_derivadas or {}), 'fondo_modern_url': subida.variantes}
             except Exception as exc:
                 raise ValidationError(f'Error subiendo fondo Modern a Azure: {exc}')
 
         super().save_model(request, obj, form, change)
 
+    @admin.action(description='Pre-renderizar PDFs del CV')
+    def prerenderizar_pdfs(self, request, queryset):
+        for perfil in queryset:
+            encolar_prerender(perfil.pk)
+        messages.success(request, f'Pre-renderizado encolado para {queryset.count()} perfil(es). Lo procesa `manage.py prerender_cv_worker`.')
+
 
 @admin.register(VisibilidadCV)
 class VisibilidadCVAdmin(admin.ModelAdmin):
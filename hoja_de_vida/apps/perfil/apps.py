@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PerfilConfig(AppConfig):
     name = 'apps.perfil'
+
+    def ready(self):
+        # Register cache invalidation signals
+        from apps.perfil import signals  # noqa: F401
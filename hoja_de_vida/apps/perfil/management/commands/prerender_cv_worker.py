@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.perfil.services.prerender import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa la cola de pre-renderizado de PDFs del CV (TareaPrerenderCV). '
+        'Debe compartir PDF_CACHE_DIR con los workers web para que los PDFs queden disponibles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar las tareas pendientes una sola vez y terminar',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Segundos de espera entre revisiones de la cola (por defecto: 5)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🖨️ Worker de pre-renderizado iniciado'))
+        while True:
+            procesadas = procesar_pendientes()
+            if procesadas:
+                self.stdout.write(self.style.SUCCESS(f'✅ Tareas procesadas: {procesadas}'))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
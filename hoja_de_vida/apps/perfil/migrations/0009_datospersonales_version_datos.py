@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0008_initialize_visibilidad_cv'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datospersonales',
+            name='version_datos',
+            field=models.PositiveIntegerField(db_column='version_datos', default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0009_datospersonales_version_datos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaPrerenderCV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completada', 'Completada'), ('fallida', 'Fallida')], db_column='estado', db_index=True, default='pendiente', max_length=20)),
+                ('creada', models.DateTimeField(auto_now_add=True, db_column='creada')),
+                ('actualizada', models.DateTimeField(auto_now=True, db_column='actualizada')),
+                ('error', models.TextField(blank=True, db_column='error', default='')),
+                ('perfil', models.ForeignKey(db_column='idperfil', on_delete=django.db.models.deletion.CASCADE, related_name='tareas_prerender', to='perfil.datospersonales')),
+            ],
+            options={
+                'db_table': 'TAREAS_PRERENDER_CV',
+                'ordering': ['creada'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0010_tareaprerendercv'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datospersonales',
+            name='imagenes_derivadas',
+            field=models.JSONField(blank=True, db_column='imagenes_derivadas', default=dict, help_text='URLs de las versiones reducidas (impresión/web) de la foto y los fondos'),
+        ),
+    ]
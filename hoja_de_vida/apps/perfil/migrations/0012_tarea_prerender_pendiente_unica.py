@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+def borrar_pendientes_duplicadas(apps, schema_editor):
+    """Deja una sola tarea pendiente por perfil (la más antigua) antes de crear la restricción."""
+    TareaPrerenderCV = apps.get_model('perfil', 'TareaPrerenderCV')
+    vistos = set()
+    for tarea in TareaPrerenderCV.objects.filter(estado='pendiente').order_by('creada', 'pk'):
+        if tarea.perfil_id in vistos:
+            tarea.delete()
+        else:
+            vistos.add(tarea.perfil_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfil', '0011_datospersonales_imagenes_derivadas'),
+    ]
+
+    operations = [
+        migrations.RunPython(borrar_pendientes_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tareaprerendercv',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'pendiente')), fields=('perfil',), name='tarea_prerender_pendiente_unica'),
+        ),
+    ]
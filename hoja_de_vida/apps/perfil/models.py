@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.core.exceptions import ValidationError
 from datetime import date
 
@@ -91,9 +92,43 @@ class DatosPersonales(models.Model):
         help_text='URL del fondo para la plantilla Modern (imagen en blob)'
     )
 
+    # Versiones de impresión y web de las imágenes anteriores, generadas al subirlas
+    # (ver apps/documentos/services/image_variants.py):
+    # {"foto_perfil_url": {"print": url, "web": url}, "fondo_modern_url": {...}, ...}
+    imagenes_derivadas = models.JSONField(
+        default=dict,
+        blank=True,
+        db_column='imagenes_derivadas',
+        help_text='URLs de las versiones reducidas (impresión/web) de la foto y los fondos'
+    )
+
+    # Versión de los datos del CV: se incrementa con cualquier cambio del perfil o
+    # de sus registros relacionados (ver apps/perfil/signals.py). Sirve como clave
+    # barata de frescura para cachés de páginas, PDFs y ETags.
+    version_datos = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        db_column='version_datos'
+    )
+
     class Meta:
         db_table = 'DATOSPERSONALES'
 
+    def save(self, *args, **kwargs):
+        """Incrementar version_datos en la base de datos al actualizar el perfil"""
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        # Se usa F() para no pisar incrementos hechos por señales mientras la
+        # instancia estaba en memoria (p. ej. en un formulario del admin)
+        self.version_datos = F('version_datos') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'version_datos'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version_datos'])
+
 
 class VisibilidadCV(models.Model):
     """Controles de visibilidad de secciones en el CV público"""
@@ -144,3 +179,50 @@ class VisibilidadCV(models.Model):
         # Datos Personales es obligatorio y nunca puede ocultarse
         self.mostrar_datos_personales = True
         super().save(*args, **kwargs)
+
+
+class TareaPrerenderCV(models.Model):
+    """Trabajo pendiente de pre-renderizado de los PDFs de un perfil.
+
+    La cola vive en la base de datos (sin broker externo) y la procesa el comando
+    `python manage.py prerender_cv_worker`.
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_COMPLETADA = 'completada'
+    ESTADO_FALLIDA = 'fallida'
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_COMPLETADA, 'Completada'),
+        (ESTADO_FALLIDA, 'Fallida'),
+    ]
+
+    perfil = models.ForeignKey(
+        DatosPersonales,
+        on_delete=models.CASCADE,
+        db_column='idperfil',
+        related_name='tareas_prerender'
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default=ESTADO_PENDIENTE,
+        db_column='estado',
+        db_index=True
+    )
+    creada = models.DateTimeField(auto_now_add=True, db_column='creada')
+    actualizada = models.DateTimeField(auto_now=True, db_column='actualizada')
+    error = models.TextField(blank=True, default='', db_column='error')
+
+    class Meta:
+        db_table = 'TAREAS_PRERENDER_CV'
+        ordering = ['creada']
+        constraints = [
+            # Una sola tarea pendiente por perfil (ver encolar_prerender)
+            models.UniqueConstraint(
+                fields=['perfil'],
+                condition=models.Q(estado='pendiente'),
+                name='tarea_prerender_pendiente_unica',
+            ),
+        ]
@@ -0,0 +1,160 @@
+"""Everything the CV views show about a profile, loaded in one pass.
+
+load_cv_snapshot() reads the profile with its VisibilidadCV (select_related)
+and every CV section (prefetch_related): a fixed 7 queries however many rows
+there are. The result is an immutable CVSnapshot of tuples, so templates can
+test, count and iterate the sections without going back to the database.
+
+Sections hold the rows visible in the front (activarparaqueseveaenfront),
+in the order the views always used. Whether a section is shown at all is up
+to each view (admin visibility, URL parameters...): see secciones().
+
+get_cv_snapshot() memoizes snapshots per (profile, version_datos) in the
+process. version_datos changes with any change of the profile, its
+visibility or its records (see apps/perfil/signals.py), so a memoized
+snapshot is never stale. The model instances inside are shared between
+requests and must not be modified.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.db.models import Prefetch
+
+from apps.perfil.models import DatosPersonales
+from apps.perfil.services.experience_groups import company_ordered, group_by_company
+from apps.trayectoria.models import (
+    ExperienciaLaboral,
+    CursoRealizado,
+    Reconocimiento,
+    ProductoAcademico,
+    ProductoLaboral,
+    VentaGarage,
+)
+
+
+# - visibilidad: VisibilidadCV of the profile, or None.
+# - empresas: EmpresaExperiencias (see experience_groups), companies in CV order.
+# - experiencias: the same experiences, flat, by primary key.
+# - certificados: Certificado of every record with an uploaded certificate,
+#   visible or not: courses, then experiences, then recognitions, each by
+#   primary key.
+CVSnapshot = namedtuple('CVSnapshot', [
+    'perfil_id',
+    'version',
+    'visibilidad',
+    'empresas',
+    'experiencias',
+    'cursos',
+    'reconocimientos',
+    'productos_academicos',
+    'productos_laborales',
+    'ventas_garage',
+    'certificados',
+])
+
+# tipo: 'curso', 'experiencia' or 'reconocimiento'; registro: the model instance
+Certificado = namedtuple('Certificado', ['tipo', 'registro'])
+
+SECCIONES = ('experiencias', 'cursos', 'reconocimientos', 'productos_academicos', 'productos_laborales')
+
+# Snapshots kept per process; one active profile needs one or two
+MAX_SNAPSHOTS = 8
+
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+
+
+def _visible(rows):
+    return tuple(row for row in rows if row.activarparaqueseveaenfront)
+
+
+def _con_certificado(tipo, rows):
+    return [Certificado(tipo, row) for row in sorted(rows, key=lambda row: row.pk) if row.rutacertificado]
+
+
+def load_cv_snapshot(perfil_id) -> CVSnapshot:
+    """Load the CVSnapshot of a profile from the database (7 queries).
+
+    Raises DatosPersonales.DoesNotExist when the profile does not exist.
+    """
+    perfil = (
+        DatosPersonales.objects
+        .select_related('visibilidad_cv')
+        .prefetch_related(
+            # Hidden experiences, courses and recognitions are loaded too: the
+            # full CV PDF attaches their certificates
+            Prefetch('experiencialaboral_set', queryset=company_ordered(ExperienciaLaboral.objects.all()),
+                     to_attr='cv_experiencias'),
+            Prefetch('cursorealizado_set', queryset=CursoRealizado.objects.order_by('-fechainicio'),
+                     to_attr='cv_cursos'),
+            Prefetch('reconocimiento_set', queryset=Reconocimiento.objects.order_by('-fechareconocimiento'),
+                     to_attr='cv_reconocimientos'),
+            Prefetch('productoacademico_set',
+                     queryset=ProductoAcademico.objects.filter(activarparaqueseveaenfront=True),
+                     to_attr='cv_productos_academicos'),
+            Prefetch('productolaboral_set',
+                     queryset=ProductoLaboral.objects.filter(activarparaqueseveaenfront=True).order_by('-fechaproducto'),
+                     to_attr='cv_productos_laborales'),
+            Prefetch('ventagarage_set',
+                     queryset=VentaGarage.objects.filter(activarparaqueseveaenfront=True).order_by('nombreproducto'),
+                     to_attr='cv_ventas_garage'),
+        )
+        .get(pk=perfil_id)
+    )
+    experiencias = _visible(perfil.cv_experiencias)
+    return CVSnapshot(
+        perfil_id=perfil.pk,
+        version=perfil.version_datos,
+        visibilidad=getattr(perfil, 'visibilidad_cv', None),
+        empresas=group_by_company(experiencias),
+        experiencias=tuple(sorted(experiencias, key=lambda experiencia: experiencia.pk)),
+        cursos=_visible(perfil.cv_cursos),
+        reconocimientos=_visible(perfil.cv_reconocimientos),
+        productos_academicos=tuple(perfil.cv_productos_academicos),
+        productos_laborales=tuple(perfil.cv_productos_laborales),
+        ventas_garage=tuple(perfil.cv_ventas_garage),
+        certificados=tuple(
+            _con_certificado('curso', perfil.cv_cursos)
+            + _con_certificado('experiencia', perfil.cv_experiencias)
+            + _con_certificado('reconocimiento', perfil.cv_reconocimientos)
+        ),
+    )
+
+
+def get_cv_snapshot(perfil) -> CVSnapshot:
+    """Return the CVSnapshot of `perfil` (a DatosPersonales), memoized per data version."""
+    key = (perfil.pk, perfil.version_datos)
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+            return snapshot
+
+    snapshot = load_cv_snapshot(perfil.pk)
+    with _lock:
+        # Keyed by the version actually read, which may be newer than perfil's
+        _snapshots[(snapshot.perfil_id, snapshot.version)] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def secciones(snapshot: CVSnapshot, **incluir) -> dict:
+    """Template context of the CV sections.
+
+    Keyword arguments named after SECCIONES say whether to show each section
+    (default: shown); hidden sections are empty. 'experiencias' holds the
+    company groups and 'experiencias_qs' the flat list of experiences.
+    """
+    unknown = set(incluir) - set(SECCIONES)
+    if unknown:
+        raise TypeError(f'Unknown CV sections: {", ".join(sorted(unknown))}')
+    mostrar = {seccion: incluir.get(seccion, True) for seccion in SECCIONES}
+    return {
+        'experiencias': snapshot.empresas if mostrar['experiencias'] else (),
+        'experiencias_qs': snapshot.experiencias if mostrar['experiencias'] else (),
+        'cursos': snapshot.cursos if mostrar['cursos'] else (),
+        'reconocimientos': snapshot.reconocimientos if mostrar['reconocimientos'] else (),
+        'productos_academicos': snapshot.productos_academicos if mostrar['productos_academicos'] else (),
+        'productos_laborales': snapshot.productos_laborales if mostrar['productos_laborales'] else (),
+    }
@@ -0,0 +1,27 @@
+from django.db.models import F
+
+from apps.perfil.models import DatosPersonales
+
+
+def get_data_version(perfil_id) -> int:
+    """Return the current data version of a profile with a single primary-key lookup.
+
+    Returns 0 when the profile does not exist.
+    """
+    version = (
+        DatosPersonales.objects
+        .filter(pk=perfil_id)
+        .values_list('version_datos', flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_data_version(perfil_id):
+    """Atomically increase the data version of a profile.
+
+    Called from signals whenever a related row changes. Bulk operations
+    (queryset.update(), bulk_create) do not send signals and must call this
+    explicitly.
+    """
+    DatosPersonales.objects.filter(pk=perfil_id).update(version_datos=F('version_datos') + 1)
@@ -0,0 +1,42 @@
+from collections import namedtuple
+from itertools import groupby
+
+from django.db.models import F, Max, Window
+
+
+# One company of the experience section: its name and its experiences
+EmpresaExperiencias = namedtuple('EmpresaExperiencias', ['empresa', 'experiencias'])
+
+
+def company_ordered(experiencias_qs):
+    """Order work experiences the way the CV groups them, in the same query.
+
+    Companies come by their most recent start date (desc) and each company's
+    experiences by start date (desc). The latest date of each company is
+    computed by the database as a window aggregate, so NULL dates sort exactly
+    as they did with the former values('nombrempresa').annotate(Max(...))
+    query; companies with the same latest date are kept apart by their name.
+
+    The window is also partitioned by activarparaqueseveaenfront, so a queryset
+    holding hidden experiences too still orders the visible ones by visible
+    dates only (see cv_snapshot).
+    """
+    return (
+        experiencias_qs
+        .annotate(empresa_reciente=Window(
+            Max('fechainiciogestion'),
+            partition_by=[F('nombrempresa'), F('activarparaqueseveaenfront')],
+        ))
+        .order_by('-empresa_reciente', 'nombrempresa', '-fechainiciogestion')
+    )
+
+
+def group_by_company(experiencias):
+    """Group experiences listed in company_ordered() order.
+
+    Returns a tuple of EmpresaExperiencias, whose experiencias are tuples too.
+    """
+    return tuple(
+        EmpresaExperiencias(empresa, tuple(rows))
+        for empresa, rows in groupby(experiencias, key=lambda experiencia: experiencia.nombrempresa)
+    )
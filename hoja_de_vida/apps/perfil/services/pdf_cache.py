@@ -0,0 +1,53 @@
+import hashlib
+import json
+from collections import namedtuple
+
+from django.core.cache import caches
+
+
+PDF_CACHE_ALIAS = 'pdf'
+
+# etag is the SHA-256 of the PDF bytes: re-rendering the same key can produce
+# different bytes (creation date), so the key itself is not a strong validator
+CachedPDF = namedtuple('CachedPDF', ['data', 'filename', 'etag'])
+
+
+def _get_cache():
+    return caches[PDF_CACHE_ALIAS]
+
+
+def build_cache_key(perfil, plantilla, secciones, certificados=()) -> str:
+    """Build the cache key of a generated CV PDF.
+
+    The key is content-addressed over (profile data version, template, selected
+    sections, selected certificates), so a bump of `perfil.version_datos` makes
+    all previous artifacts unreachable without having to delete them one by one.
+    """
+    payload = json.dumps({
+        'perfil': perfil.pk,
+        'version': perfil.version_datos,
+        'plantilla': plantilla,
+        'secciones': sorted(secciones),
+        'certificados': sorted(str(c) for c in certificados),
+    }, sort_keys=True)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return f'cv:pdf:{digest}'
+
+
+def _etag(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def get_pdf(cache_key):
+    """Return the CachedPDF stored under the key, or None on a miss."""
+    cached = _get_cache().get(cache_key)
+    if not cached:
+        return None
+    return CachedPDF(cached['data'], cached['filename'], cached.get('etag') or _etag(cached['data']))
+
+
+def store_pdf(cache_key, data: bytes, filename: str):
+    """Store a generated PDF artifact under the given key and return it as CachedPDF."""
+    artifact = CachedPDF(data, filename, _etag(data))
+    _get_cache().set(cache_key, artifact._asdict())
+    return artifact
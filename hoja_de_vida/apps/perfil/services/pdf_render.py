@@ -0,0 +1,115 @@
+"""HTML to PDF rendering with WeasyPrint in a pool of warm worker processes.
+
+Rendering a CV takes seconds of CPU. Doing it in the gunicorn request thread
+blocks that worker for the whole render, so views submit the HTML here and
+wait for the bytes while a dedicated process does the work. Each worker loads
+fonts and parses the registered stylesheets (see pdf_styles) once when it starts.
+
+Settings:
+  - PDF_RENDER_WORKERS: number of render processes (0 renders in-process).
+  - PDF_RENDER_QUEUE_SIZE: renders allowed to wait for a free worker.
+  - PDF_RENDER_TIMEOUT: seconds to wait for a queue slot and for the result.
+  - PDF_RENDER_RETRY_AFTER: seconds clients are asked to wait (Retry-After)
+    when the pool is busy.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from apps.perfil.services import pdf_styles
+from apps.perfil.services.url_fetcher import CVUrlFetcher
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class RenderBusy(RuntimeError):
+    """The pool is saturated (queue full or render timed out); the request can be retried later."""
+
+
+def _warm_up():
+    """Worker initializer: load fonts and parse the known stylesheets."""
+    import django
+    from weasyprint import HTML
+
+    # The url_fetcher reads static files and profile blobs through Django
+    django.setup()
+    pdf_styles.preload()
+    # A throwaway render forces fontconfig/Pango to load before the first request
+    HTML(string='<p>warm-up</p>').write_pdf()
+
+
+def _render(html: str, base_url, stylesheet_names) -> bytes:
+    from weasyprint import HTML
+
+    return HTML(string=html, base_url=base_url, url_fetcher=CVUrlFetcher(base_url)).write_pdf(
+        stylesheets=[pdf_styles.get_stylesheet(name) for name in stylesheet_names]
+    )
+
+
+def _get_executor():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.PDF_RENDER_WORKERS
+            queue_size = getattr(settings, 'PDF_RENDER_QUEUE_SIZE', workers * 4)
+            # spawn: forking a threaded gunicorn worker is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_up,
+            )
+            _slots = threading.BoundedSemaphore(workers + queue_size)
+        return _executor, _slots
+
+
+def _discard_executor(executor):
+    global _executor, _slots
+    with _lock:
+        if _executor is executor:
+            _executor = None
+            _slots = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_pdf(html: str, base_url=None, stylesheets=()) -> bytes:
+    """Render HTML to PDF bytes.
+
+    - html: the document to render.
+    - base_url: base for relative URLs inside the document. URLs on this
+      origin are resolved in-process by CVUrlFetcher, without HTTP requests.
+    - stylesheets: names registered in pdf_styles.STYLESHEETS, applied on top
+      of the document styles.
+
+    Raises RenderBusy (a RuntimeError) when the queue is full or the render
+    times out, and RuntimeError when the worker process dies.
+    """
+    stylesheet_names = list(stylesheets)
+    if not getattr(settings, 'PDF_RENDER_WORKERS', 0):
+        return _render(html, base_url, stylesheet_names)
+
+    timeout = getattr(settings, 'PDF_RENDER_TIMEOUT', 120)
+    executor, slots = _get_executor()
+    if not slots.acquire(timeout=timeout):
+        raise RenderBusy('PDF render queue is full, try again later')
+
+    try:
+        future = executor.submit(_render, html, base_url, stylesheet_names)
+    except (BrokenProcessPool, RuntimeError) as exc:
+        slots.release()
+        _discard_executor(executor)
+        raise RuntimeError(f'PDF render pool unavailable: {exc}')
+    future.add_done_callback(lambda _f: slots.release())
+
+    try:
+        return future.result(timeout=timeout)
+    except BrokenProcessPool as exc:
+        _discard_executor(executor)
+        raise RuntimeError(f'PDF render worker crashed: {exc}')
+    except TimeoutError:
+        raise RenderBusy(f'PDF render timed out after {timeout}s')
@@ -0,0 +1,71 @@
+"""Process-wide registry of pre-parsed WeasyPrint stylesheets for the PDF templates.
+
+Each stylesheet is read and parsed once per process. With DEBUG enabled the
+file modification time is checked on every lookup, so CSS edits show up in
+development without restarting the server.
+"""
+import os
+import threading
+
+from django.conf import settings
+
+
+PAGE_A4 = 'page_a4'
+CV_TEMPLATE_WEB = 'cv_template_web'
+
+_CSS_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'static', 'perfil', 'css', 'pdf'))
+
+# name -> inline CSS text or path of a CSS file
+STYLESHEETS = {
+    PAGE_A4: {'text': '@page { size: A4; margin: 15mm }'},
+    CV_TEMPLATE_WEB: {'path': os.path.join(_CSS_DIR, 'cv_template_web.css')},
+}
+
+# name -> (mtime, parsed CSS)
+_registry = {}
+_lock = threading.Lock()
+
+
+def _mtime(source):
+    path = source.get('path')
+    return os.stat(path).st_mtime if path else None
+
+
+def _parse(source):
+    from weasyprint import CSS
+
+    if 'text' in source:
+        return CSS(string=source['text'])
+    with open(source['path'], 'r', encoding='utf-8') as fh:
+        return CSS(string=fh.read())
+
+
+def get_stylesheet(name):
+    """Return the parsed WeasyPrint CSS object registered under `name`.
+
+    Raises KeyError for unknown names.
+    """
+    source = STYLESHEETS[name]
+    entry = _registry.get(name)
+    if entry is not None and not settings.DEBUG:
+        return entry[1]
+
+    mtime = _mtime(source)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+
+    with _lock:
+        entry = _registry.get(name)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, _parse(source))
+            _registry[name] = entry
+    return entry[1]
+
+
+def preload():
+    """Parse every registered stylesheet (used to warm up render workers)."""
+    for name in STYLESHEETS:
+        try:
+            get_stylesheet(name)
+        except OSError:
+            continue
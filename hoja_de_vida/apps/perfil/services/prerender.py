@@ -0,0 +1,136 @@
+"""Pre-rendering of the most requested CV PDFs into the PDF cache.
+
+Jobs are stored in TareaPrerenderCV and consumed by the
+`prerender_cv_worker` management command. Each job calls the regular download
+views with the common query strings, so the artifacts land in the PDF cache
+under exactly the same keys the user-facing requests will look up.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from apps.perfil.models import DatosPersonales, TareaPrerenderCV
+
+
+TODAS_LAS_SECCIONES = (
+    'datos_personales=on&experiencias_laborales=on&cursos=on'
+    '&reconocimientos=on&productos_academicos=on&productos_laborales=on'
+)
+
+# (view name, query string) of the combinations worth having ready
+COMBINACIONES = [
+    ('descargar_cv_pdf', 'plantilla=professional'),
+    ('descargar_cv_pdf', 'plantilla=modern'),
+    ('descargar_cv_completo_pdf', ''),
+    ('descargar_cv_personalizado', TODAS_LAS_SECCIONES),
+    ('descargar_cv_personalizado_plantilla', f'plantilla=professional&{TODAS_LAS_SECCIONES}'),
+    ('descargar_cv_personalizado_plantilla', f'plantilla=modern&{TODAS_LAS_SECCIONES}'),
+]
+
+
+def encolar_prerender(perfil_id):
+    """Queue a pre-render job for a profile unless one is already pending."""
+    # The profile may be gone when this runs after a cascade delete
+    if not DatosPersonales.objects.filter(pk=perfil_id).exists():
+        return
+    pendientes = TareaPrerenderCV.objects.filter(perfil_id=perfil_id, estado=TareaPrerenderCV.ESTADO_PENDIENTE)
+    if pendientes.exists():
+        return
+    try:
+        with transaction.atomic():
+            TareaPrerenderCV.objects.create(perfil_id=perfil_id, estado=TareaPrerenderCV.ESTADO_PENDIENTE)
+    except IntegrityError:
+        # A concurrent save queued it first (unique pending job per profile)
+        pass
+
+
+def _build_request(query: str) -> HttpRequest:
+    """Build a GET request equivalent to the one a browser would send."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(query)
+    host = getattr(settings, 'CV_PRERENDER_HOST', 'localhost:8000')
+    request.META['HTTP_HOST'] = host
+    request.META['SERVER_NAME'], _, port = host.partition(':')
+    request.META['SERVER_PORT'] = port or '80'
+    return request
+
+
+def prerender_perfil(perfil):
+    """Render every combination in COMBINACIONES for the active profile.
+
+    Returns the number of combinations rendered. Profiles that are not the
+    active one are skipped, because the download views only serve that one.
+    """
+    from apps.perfil import views
+
+    activo = DatosPersonales.objects.filter(perfilactivo=1).first()
+    if not activo or activo.pk != perfil.pk:
+        return 0
+
+    rendered = 0
+    for view_name, query in COMBINACIONES:
+        view = getattr(views, view_name)
+        response = view(_build_request(query))
+        if response.status_code != 200:
+            raise RuntimeError(f'{view_name}?{query} respondió {response.status_code}')
+        rendered += 1
+    return rendered
+
+
+def recuperar_abandonadas():
+    """Fail the jobs left 'procesando' by a worker that died, and queue them again.
+
+    A job counts as abandoned once it has been processing for longer than
+    CV_PRERENDER_STALE_SECONDS, which must exceed the time a worker needs to
+    render every combination. Returns the number of jobs recovered.
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'CV_PRERENDER_STALE_SECONDS', 1800))
+    recuperadas = 0
+    abandonadas = TareaPrerenderCV.objects.filter(
+        estado=TareaPrerenderCV.ESTADO_PROCESANDO,
+        actualizada__lt=limite,
+    )
+    for tarea in abandonadas:
+        # Guarded by estado and actualizada: the job may have just finished
+        failed = TareaPrerenderCV.objects.filter(
+            pk=tarea.pk,
+            estado=TareaPrerenderCV.ESTADO_PROCESANDO,
+            actualizada=tarea.actualizada,
+        ).update(
+            estado=TareaPrerenderCV.ESTADO_FALLIDA,
+            error='Abandonada: el worker no terminó el pre-renderizado',
+            actualizada=timezone.now(),
+        )
+        if failed:
+            encolar_prerender(tarea.perfil_id)
+            recuperadas += 1
+    return recuperadas
+
+
+def procesar_pendientes():
+    """Process every pending job once. Returns the number of jobs handled."""
+    recuperar_abandonadas()
+    procesadas = 0
+    for tarea in TareaPrerenderCV.objects.filter(estado=TareaPrerenderCV.ESTADO_PENDIENTE):
+        # Claim the job; another worker may have taken it already
+        claimed = TareaPrerenderCV.objects.filter(
+            pk=tarea.pk,
+            estado=TareaPrerenderCV.ESTADO_PENDIENTE,
+        ).update(estado=TareaPrerenderCV.ESTADO_PROCESANDO, actualizada=timezone.now())
+        if not claimed:
+            continue
+
+        try:
+            prerender_perfil(tarea.perfil)
+            tarea.estado = TareaPrerenderCV.ESTADO_COMPLETADA
+            tarea.error = ''
+        except Exception as exc:
+            tarea.estado = TareaPrerenderCV.ESTADO_FALLIDA
+            tarea.error = str(exc)
+        tarea.save(update_fields=['estado', 'error', 'actualizada'])
+        procesadas += 1
+    return procesadas
@@ -0,0 +1,121 @@
+"""WeasyPrint url_fetcher that resolves our own URLs inside the process.
+
+The PDF templates reference `/static/...`, `/foto-perfil/`, `/fondo-professional/`
+and `/fondo-modern/` (plain or fingerprinted) on the site itself. Fetching those over HTTP makes the
+server call itself while rendering, which adds round-trips and can deadlock a
+single gunicorn worker. This fetcher serves static files from STATIC_ROOT (or
+the staticfiles finders in development) and the profile images through the
+blob layer. Every other URL goes to WeasyPrint's default fetcher.
+"""
+import mimetypes
+import os
+from urllib.parse import parse_qs, unquote, urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.urls import Resolver404, resolve
+from django.utils._os import safe_join
+
+
+# Proxy URL name -> DatosPersonales field holding the blob URL
+PROFILE_BLOB_VIEWS = {
+    'ver_foto_perfil': 'foto_perfil_url',
+    'ver_foto_perfil_version': 'foto_perfil_url',
+    'fondo_professional': 'fondo_professional_url',
+    'fondo_professional_version': 'fondo_professional_url',
+    'fondo_modern': 'fondo_modern_url',
+    'fondo_modern_version': 'fondo_modern_url',
+}
+
+
+def _find_static(relative_path: str):
+    if settings.STATIC_ROOT:
+        try:
+            candidate = safe_join(str(settings.STATIC_ROOT), relative_path)
+        except SuspiciousFileOperation:
+            return None
+        if os.path.isfile(candidate):
+            return candidate
+    try:
+        return finders.find(relative_path)
+    except SuspiciousFileOperation:
+        return None
+
+
+def _static_result(relative_path: str, url: str):
+    path = _find_static(relative_path)
+    if not path:
+        raise ValueError(f'Static file not found: {relative_path}')
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    mime, _ = mimetypes.guess_type(path)
+    return {
+        'string': data,
+        'mime_type': mime or 'application/octet-stream',
+        'redirected_url': url,
+        'filename': os.path.basename(path),
+    }
+
+
+def _profile_blob_result(field: str, url: str):
+    from apps.documentos.services import blob_cache
+    from apps.documentos.services.image_variants import variant_blob_url
+    from apps.perfil.models import DatosPersonales
+
+    perfil = DatosPersonales.objects.filter(perfilactivo=1).first()
+    # `?variante=print` selects the print-sized version, as in the proxy views
+    variant = parse_qs(urlparse(url).query).get('variante', [None])[0]
+    blob_url = variant_blob_url(perfil, field, variant) if perfil else None
+    if not blob_url:
+        raise ValueError(f'No blob stored in {field}')
+    data, filename = blob_cache.fetch(blob_url)
+    mime, _ = mimetypes.guess_type(filename)
+    return {
+        'string': data,
+        'mime_type': mime or 'image/png',
+        'redirected_url': url,
+        'filename': filename,
+    }
+
+
+class CVUrlFetcher:
+    """Callable url_fetcher bound to the site base URL used for the render.
+
+    Only URLs on the same scheme and host as `base_url` are resolved locally;
+    a missing local resource raises instead of falling back to HTTP.
+    """
+
+    def __init__(self, base_url=None):
+        parsed = urlparse(base_url or '')
+        self.origin = (parsed.scheme, parsed.netloc)
+
+    def _resolve_local(self, url: str):
+        parsed = urlparse(url)
+        if (parsed.scheme, parsed.netloc) != self.origin:
+            return None
+
+        path = unquote(parsed.path)
+        static_url = settings.STATIC_URL or '/static/'
+        if not static_url.startswith('/'):
+            static_url = '/' + static_url
+        if path.startswith(static_url):
+            return _static_result(path[len(static_url):], url)
+
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return None
+        field = PROFILE_BLOB_VIEWS.get(match.url_name)
+        if field:
+            return _profile_blob_result(field, url)
+        return None
+
+    def __call__(self, url, *args, **kwargs):
+        from weasyprint import default_url_fetcher
+
+        if self.origin[1]:
+            result = self._resolve_local(url)
+            if result is not None:
+                return result
+        return default_url_fetcher(url, *args, **kwargs)
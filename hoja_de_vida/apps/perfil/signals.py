@@ -0,0 +1,59 @@
+"""Señales que incrementan DatosPersonales.version_datos cuando cambian los datos del CV
+y encolan el pre-renderizado de los PDFs.
+
+Los cambios del propio DatosPersonales los registra DatosPersonales.save().
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.perfil.models import DatosPersonales, VisibilidadCV
+from apps.perfil.services.data_version import bump_data_version
+from apps.perfil.services.prerender import encolar_prerender
+from apps.trayectoria.models import (
+    ExperienciaLaboral,
+    CursoRealizado,
+    Reconocimiento,
+    ProductoAcademico,
+    ProductoLaboral,
+    VentaGarage,
+)
+
+
+TRAYECTORIA_MODELS = (
+    ExperienciaLaboral,
+    CursoRealizado,
+    Reconocimiento,
+    ProductoAcademico,
+    ProductoLaboral,
+    VentaGarage,
+)
+
+
+def _encolar_prerender(perfil_id):
+    if getattr(settings, 'CV_PRERENDER_ON_SAVE', False):
+        transaction.on_commit(lambda: encolar_prerender(perfil_id))
+
+
+@receiver(post_save, sender=DatosPersonales)
+def datos_personales_saved(sender, instance, **kwargs):
+    _encolar_prerender(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=VisibilidadCV)
+def visibilidad_changed(sender, instance, **kwargs):
+    bump_data_version(instance.perfil_id)
+    _encolar_prerender(instance.perfil_id)
+
+
+def trayectoria_changed(sender, instance, **kwargs):
+    perfil_id = getattr(instance, 'idperfilconqueestaactivo_id', None)
+    if perfil_id:
+        bump_data_version(perfil_id)
+        _encolar_prerender(perfil_id)
+
+
+for _model in TRAYECTORIA_MODELS:
+    post_save.connect(trayectoria_changed, sender=_model, dispatch_uid=f'cv_version_save_{_model.__name__}')
+    post_delete.connect(trayectoria_changed, sender=_model, dispatch_uid=f'cv_version_delete_{_model.__name__}')
@@ -1,3 +1,670 @@
-from django.test import TestCase
+import hashlib
+import sys
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from apps.perfil import views
+from apps.perfil.models import DatosPersonales, TareaPrerenderCV, VisibilidadCV
+from apps.perfil.services import cv_snapshot, data_version, pdf_cache, pdf_render, prerender
+from apps.documentos.services import azure_storage, image_variants
+from apps.documentos.services.storage import get_storage
+from apps.documentos.tests import BlobEmulatorMixin, use_local_storage
+from apps.perfil.services.experience_groups import company_ordered, group_by_company
+from apps.perfil.services.url_fetcher import CVUrlFetcher
+from apps.trayectoria.models import CursoRealizado, ExperienciaLaboral, ProductoLaboral, Reconocimiento
+
+
+def crear_perfil(**extra):
+    datos = {
+        'descripcionperfil': 'Perfil de prueba',
+        'perfilactivo': 1,
+        'apellidos': 'Pérez',
+        'nombres': 'Ana',
+        'nacionalidad': 'Ecuatoriana',
+        'lugarnacimiento': 'Quito',
+        'fechanacimiento': date(1990, 5, 17),
+        'numerocedula': '1712345678',
+        'sexo': 'M',
+        'estadocivil': 'Soltera',
+        'licenciaconducir': 'B',
+        'telefonoconvencional': '022345678',
+        'telefonofijo': '022345679',
+        'direcciontrabajo': 'Av. Amazonas',
+        'direcciondomiciliaria': 'Calle 1',
+        'sitioweb': 'https://example.com',
+    }
+    datos.update(extra)
+    return DatosPersonales.objects.create(**datos)
+
+
+class PdfCacheKeyTests(TestCase):
+    def setUp(self):
+        self.perfil = DatosPersonales(idperfil=7, version_datos=3)
+
+    def test_key_ignores_the_order_of_sections_and_certificates(self):
+        self.assertEqual(
+            pdf_cache.build_cache_key(self.perfil, 'modern', ['cursos', 'reconocimientos'], certificados=[2, 1]),
+            pdf_cache.build_cache_key(self.perfil, 'modern', ['reconocimientos', 'cursos'], certificados=['1', '2']),
+        )
+
+    def test_key_changes_with_every_input(self):
+        base = pdf_cache.build_cache_key(self.perfil, 'modern', ['cursos'])
+        self.assertTrue(base.startswith('cv:pdf:'))
+        otros = [
+            pdf_cache.build_cache_key(DatosPersonales(idperfil=7, version_datos=4), 'modern', ['cursos']),
+            pdf_cache.build_cache_key(DatosPersonales(idperfil=8, version_datos=3), 'modern', ['cursos']),
+            pdf_cache.build_cache_key(self.perfil, 'professional', ['cursos']),
+            pdf_cache.build_cache_key(self.perfil, 'modern', ['cursos', 'reconocimientos']),
+            pdf_cache.build_cache_key(self.perfil, 'modern', ['cursos'], certificados=['todos']),
+        ]
+        self.assertEqual(len({base, *otros}), len(otros) + 1)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'pdf': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pdf-cache-key-tests'},
+    })
+    def test_store_and_get_round_trip(self):
+        key = pdf_cache.build_cache_key(self.perfil, 'modern', ['cursos'])
+        self.assertIsNone(pdf_cache.get_pdf(key))
+
+        stored = pdf_cache.store_pdf(key, b'%PDF-1.4 cv', 'cv_modern.pdf')
+        self.assertEqual(pdf_cache.get_pdf(key), stored)
+        self.assertEqual(stored.etag, hashlib.sha256(b'%PDF-1.4 cv').hexdigest())
+
+
+@override_settings(CV_PRERENDER_ON_SAVE=False)
+class DataVersionTests(TestCase):
+    def setUp(self):
+        self.perfil = crear_perfil()
+
+    def version(self):
+        return data_version.get_data_version(self.perfil.pk)
+
+    def test_new_profiles_start_at_version_one(self):
+        self.assertEqual(self.version(), 1)
+        self.assertEqual(data_version.get_data_version(self.perfil.pk + 1), 0)
+
+    def test_saving_the_profile_bumps_the_version(self):
+        self.perfil.nombres = 'Ana María'
+        self.perfil.save()
+        self.assertEqual(self.perfil.version_datos, 2)
+        self.perfil.save(update_fields=['nombres'])
+        self.assertEqual(self.version(), 3)
+
+    def test_saving_a_stale_instance_keeps_concurrent_bumps(self):
+        data_version.bump_data_version(self.perfil.pk)
+        self.perfil.save()  # the instance still holds version 1
+        self.assertEqual(self.perfil.version_datos, 3)
+
+    def test_related_rows_bump_the_version(self):
+        curso = CursoRealizado.objects.create(idperfilconqueestaactivo=self.perfil, nombrecurso='Django')
+        self.assertEqual(self.version(), 2)
+        curso.nombrecurso = 'Django avanzado'
+        curso.save()
+        self.assertEqual(self.version(), 3)
+        curso.delete()
+        self.assertEqual(self.version(), 4)
+
+        visibilidad = VisibilidadCV.objects.create(perfil=self.perfil)
+        self.assertEqual(self.version(), 5)
+        visibilidad.delete()
+        self.assertEqual(self.version(), 6)
+
+
+class FakeExecutor:
+    """Stands in for the ProcessPoolExecutor: submit() returns `future` or raises `error`."""
+
+    def __init__(self, future=None, error=None):
+        self.future = future
+        self.error = error
+        self.shut_down = False
+
+    def submit(self, *args):
+        if self.error:
+            raise self.error
+        return self.future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@override_settings(PDF_RENDER_WORKERS=1, PDF_RENDER_TIMEOUT=0.05)
+class RenderPoolTests(SimpleTestCase):
+    def use_pool(self, executor, slots=2):
+        self.slots = threading.BoundedSemaphore(slots)
+        for name, value in (('_executor', executor), ('_slots', self.slots)):
+            patcher = mock.patch.object(pdf_render, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_returns_the_rendered_bytes_and_frees_the_slot(self):
+        future = Future()
+        future.set_result(b'%PDF-1.4')
+        self.use_pool(FakeExecutor(future), slots=1)
+        self.assertEqual(pdf_render.render_pdf('<p>cv</p>'), b'%PDF-1.4')
+        self.assertTrue(self.slots.acquire(blocking=False))
+
+    def test_timeout(self):
+        self.use_pool(FakeExecutor(Future()))
+        with self.assertRaisesMessage(pdf_render.RenderBusy, 'timed out'):
+            pdf_render.render_pdf('<p>cv</p>')
+
+    def test_full_queue(self):
+        self.use_pool(FakeExecutor(Future()), slots=1)
+        self.slots.acquire()
+        with self.assertRaisesMessage(pdf_render.RenderBusy, 'queue is full'):
+            pdf_render.render_pdf('<p>cv</p>')
+
+    def test_crashed_worker_discards_the_pool(self):
+        future = Future()
+        future.set_exception(BrokenProcessPool('worker killed'))
+        executor = FakeExecutor(future)
+        self.use_pool(executor)
+        with self.assertRaisesMessage(RuntimeError, 'crashed'):
+            pdf_render.render_pdf('<p>cv</p>')
+        self.assertTrue(executor.shut_down)
+        self.assertIsNone(pdf_render._executor)
+
+    def test_broken_pool_on_submit_releases_the_slot(self):
+        executor = FakeExecutor(error=BrokenProcessPool('pool broken'))
+        self.use_pool(executor, slots=1)
+        with self.assertRaisesMessage(RuntimeError, 'unavailable'):
+            pdf_render.render_pdf('<p>cv</p>')
+        self.assertTrue(executor.shut_down)
+        self.assertTrue(self.slots.acquire(blocking=False))
+
+    @override_settings(PDF_RENDER_WORKERS=0)
+    def test_renders_in_process_without_workers(self):
+        with mock.patch.object(pdf_render, '_render', return_value=b'%PDF-1.4') as render:
+            self.assertEqual(pdf_render.render_pdf('<p>cv</p>', 'http://testserver/', ['page_a4']), b'%PDF-1.4')
+        render.assert_called_once_with('<p>cv</p>', 'http://testserver/', ['page_a4'])
+
+
+@override_settings(CV_PRERENDER_ON_SAVE=False)
+class PrerenderQueueTests(TestCase):
+    def setUp(self):
+        self.perfil = crear_perfil()
+
+    def pendientes(self):
+        return TareaPrerenderCV.objects.filter(perfil=self.perfil, estado=TareaPrerenderCV.ESTADO_PENDIENTE)
+
+    def test_encolar_keeps_a_single_pending_job(self):
+        prerender.encolar_prerender(self.perfil.pk)
+        prerender.encolar_prerender(self.perfil.pk)
+        self.assertEqual(self.pendientes().count(), 1)
+
+    def test_encolar_ignores_deleted_profiles(self):
+        perfil_id = self.perfil.pk
+        self.perfil.delete()
+        prerender.encolar_prerender(perfil_id)
+        self.assertFalse(TareaPrerenderCV.objects.exists())
+
+    def test_database_rejects_a_second_pending_job(self):
+        TareaPrerenderCV.objects.create(perfil=self.perfil)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TareaPrerenderCV.objects.create(perfil=self.perfil)
+        # Finished jobs do not count
+        TareaPrerenderCV.objects.create(perfil=self.perfil, estado=TareaPrerenderCV.ESTADO_COMPLETADA)
+        TareaPrerenderCV.objects.create(perfil=self.perfil, estado=TareaPrerenderCV.ESTADO_FALLIDA)
+
+    def test_encolar_survives_a_concurrent_insert(self):
+        # exists() saw no pending job, but another save inserted one meanwhile
+        TareaPrerenderCV.objects.create(perfil=self.perfil)
+        # The profile exists; the pending job is not seen yet
+        with mock.patch.object(QuerySet, 'exists', side_effect=[True, False]):
+            prerender.encolar_prerender(self.perfil.pk)
+        self.assertEqual(self.pendientes().count(), 1)
+
+    def test_abandoned_jobs_are_failed_and_queued_again(self):
+        tarea = TareaPrerenderCV.objects.create(perfil=self.perfil)
+        TareaPrerenderCV.objects.filter(pk=tarea.pk).update(
+            estado=TareaPrerenderCV.ESTADO_PROCESANDO,
+            actualizada=timezone.now() - timedelta(hours=1),
+        )
+        with self.settings(CV_PRERENDER_STALE_SECONDS=600):
+            self.assertEqual(prerender.recuperar_abandonadas(), 1)
+
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, TareaPrerenderCV.ESTADO_FALLIDA)
+        self.assertIn('Abandonada', tarea.error)
+        self.assertEqual(self.pendientes().count(), 1)
+
+    def test_jobs_still_processing_are_left_alone(self):
+        tarea = TareaPrerenderCV.objects.create(perfil=self.perfil)
+        TareaPrerenderCV.objects.filter(pk=tarea.pk).update(
+            estado=TareaPrerenderCV.ESTADO_PROCESANDO,
+            actualizada=timezone.now(),
+        )
+        with self.settings(CV_PRERENDER_STALE_SECONDS=600):
+            self.assertEqual(prerender.recuperar_abandonadas(), 0)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, TareaPrerenderCV.ESTADO_PROCESANDO)
+
+    def test_procesar_pendientes_records_failures(self):
+        prerender.encolar_prerender(self.perfil.pk)
+        with mock.patch.object(prerender, 'prerender_perfil', side_effect=RuntimeError('boom')):
+            self.assertEqual(prerender.procesar_pendientes(), 1)
+        tarea = TareaPrerenderCV.objects.get(perfil=self.perfil)
+        self.assertEqual(tarea.estado, TareaPrerenderCV.ESTADO_FALLIDA)
+        self.assertEqual(tarea.error, 'boom')
+
+
+@override_settings(
+    CV_PRERENDER_ON_SAVE=False,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'pdf': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pdf-tests'},
+    },
+)
+class CVPdfCacheTests(TestCase):
+    def setUp(self):
+        cv_snapshot._snapshots.clear()
+        self.perfil = crear_perfil()
+
+    def descargar(self, url_name, query=''):
+        with mock.patch.object(views, 'render_pdf', return_value=b'%PDF-1.4 prueba') as render:
+            response = self.client.get(reverse(url_name) + query)
+        self.assertEqual(response.status_code, 200)
+        return render.call_count
+
+    def test_creating_the_visibility_does_not_cache_under_a_stale_version(self):
+        # The first download creates the VisibilidadCV, which bumps version_datos
+        self.assertEqual(self.descargar('descargar_cv_pdf'), 1)
+        self.assertTrue(VisibilidadCV.objects.filter(perfil=self.perfil).exists())
+        self.assertEqual(self.descargar('descargar_cv_pdf'), 0)
+
+    def test_personalizado_plantilla_after_creating_the_visibility(self):
+        query = '?plantilla=modern&datos_personales=on&cursos=on'
+        self.assertEqual(self.descargar('descargar_cv_personalizado_plantilla', query), 1)
+        self.assertEqual(self.descargar('descargar_cv_personalizado_plantilla', query), 0)
+
+    def test_data_changes_invalidate_the_cached_pdf(self):
+        self.descargar('descargar_cv_pdf')
+        self.perfil.nombres = 'Ana María'
+        self.perfil.save()
+        self.assertEqual(self.descargar('descargar_cv_pdf'), 1)
+
+    def test_busy_render_pool_answers_503(self):
+        descargas = [
+            ('descargar_cv_pdf', '?plantilla=modern'),
+            ('descargar_cv_pdf', ''),
+            ('descargar_cv_completo_pdf', ''),
+            ('descargar_cv_personalizado', '?cursos=on'),
+            ('descargar_cv_personalizado_plantilla', '?plantilla=modern&cursos=on'),
+            ('descargar_cv_personalizado_plantilla', '?cursos=on'),
+        ]
+        for url_name, query in descargas:
+            with self.subTest(url_name=url_name, query=query), self.settings(PDF_RENDER_RETRY_AFTER=7):
+                busy = pdf_render.RenderBusy('PDF render queue is full, try again later')
+                with mock.patch.object(views, 'render_pdf', side_effect=busy):
+                    response = self.client.get(reverse(url_name) + query)
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '7')
+
+    def test_crashed_render_answers_500(self):
+        crash = RuntimeError('PDF render worker crashed: worker killed')
+        with mock.patch.object(views, 'render_pdf', side_effect=crash):
+            response = self.client.get(reverse('descargar_cv_completo_pdf'))
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(response.has_header('Retry-After'))
+
+
+@override_settings(
+    CV_PRERENDER_ON_SAVE=False,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'pdf': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'prerender-tests'},
+    },
+)
+class PrerenderCacheTests(TestCase):
+    PDF = b'%PDF-1.4 pre-renderizado'
+
+    def setUp(self):
+        cv_snapshot._snapshots.clear()
+        self.perfil = crear_perfil()
+
+    def assertServedFromCache(self, view_name, query):
+        with mock.patch.object(views, 'render_pdf') as render:
+            response = self.client.get(f'{reverse(view_name)}?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.PDF)
+        render.assert_not_called()
+
+    def test_prerendered_pdf_is_the_one_downloaded(self):
+        combinacion = ('descargar_cv_pdf', 'plantilla=modern')
+        with mock.patch.object(prerender, 'COMBINACIONES', [combinacion]), \
+                mock.patch.object(views, 'render_pdf', return_value=self.PDF):
+            self.assertEqual(prerender.prerender_perfil(self.perfil), 1)
+        self.assertServedFromCache(*combinacion)
+
+    def test_worker_command_fills_the_cache(self):
+        prerender.encolar_prerender(self.perfil.pk)
+        with mock.patch.object(views, 'render_pdf', return_value=self.PDF):
+            call_command('prerender_cv_worker', '--once', stdout=StringIO())
+        self.assertEqual(TareaPrerenderCV.objects.get(perfil=self.perfil).estado, TareaPrerenderCV.ESTADO_COMPLETADA)
+        for view_name, query in prerender.COMBINACIONES:
+            with self.subTest(view_name=view_name, query=query):
+                self.assertServedFromCache(view_name, query)
+
+
+@override_settings(CV_PRERENDER_ON_SAVE=False)
+class CVUrlFetcherTests(TestCase):
+    BASE_URL = 'http://testserver/'
+
+    def setUp(self):
+        self.fetcher = CVUrlFetcher(self.BASE_URL)
+        # WeasyPrint's own fetcher, for every URL not resolved in-process
+        self.default_fetcher = mock.Mock(return_value={'string': b'remoto'})
+        weasyprint = mock.patch.dict(sys.modules, {'weasyprint': mock.Mock(default_url_fetcher=self.default_fetcher)})
+        weasyprint.start()
+        self.addCleanup(weasyprint.stop)
+
+    def subir(self, storage, name, data):
+        blob_url = storage.url('imagenes', name)
+        storage.upload(blob_url, [data], 'image/jpeg')
+        return blob_url
+
+    def test_static_files_are_read_from_disk(self):
+        result = self.fetcher(self.BASE_URL + 'static/admin/css/base.css')
+        self.assertIn(b'font-family', result['string'])
+        self.assertEqual(result['mime_type'], 'text/css')
+        self.default_fetcher.assert_not_called()
+
+    def test_profile_images_honour_the_variant(self):
+        storage = use_local_storage(self)
+        storage.ensure_container('imagenes')
+        crear_perfil(
+            foto_perfil_url=self.subir(storage, 'foto.jpg', b'original'),
+            imagenes_derivadas={'foto_perfil_url': {'print': self.subir(storage, 'foto-print.jpg', b'impresion')}},
+        )
+        url = self.BASE_URL.rstrip('/') + reverse('ver_foto_perfil')
+
+        result = self.fetcher(url + '?variante=print')
+        self.assertEqual(result['string'], b'impresion')
+        self.assertEqual(result['mime_type'], 'image/jpeg')
+        self.assertEqual(result['redirected_url'], url + '?variante=print')
+        self.assertEqual(self.fetcher(url)['string'], b'original')
+        self.default_fetcher.assert_not_called()
+
+    def test_path_traversal_is_refused(self):
+        for path in ('static/../config/settings.py', 'static/%2e%2e/config/settings.py'):
+            with self.subTest(path=path), self.assertRaises(ValueError):
+                self.fetcher(self.BASE_URL + path)
+        self.default_fetcher.assert_not_called()
+
+    def test_other_hosts_go_to_the_default_fetcher(self):
+        url = 'https://fonts.example.com/static/admin/css/base.css'
+        self.assertEqual(self.fetcher(url, timeout=5), {'string': b'remoto'})
+        self.default_fetcher.assert_called_once_with(url, timeout=5)
+
+
+def crear_experiencia(perfil, empresa, inicio, cargo='', **extra):
+    return ExperienciaLaboral.objects.create(
+        idperfilconqueestaactivo=perfil,
+        nombrempresa=empresa,
+        fechainiciogestion=inicio,
+        cargodesempenado=cargo or f'{empresa} {inicio.year}',
+        **extra,
+    )
+
+
+@override_settings(CV_PRERENDER_ON_SAVE=False)
+class ExperienceGroupsTests(TestCase):
+    def setUp(self):
+        self.perfil = crear_perfil()
+        crear_experiencia(self.perfil, 'Acme', date(2015, 1, 1))
+        crear_experiencia(self.perfil, 'Acme', date(2022, 3, 1))
+        crear_experiencia(self.perfil, 'Globex', date(2019, 6, 1))
+        crear_experiencia(self.perfil, 'Initech', date(2019, 6, 1))
+        crear_experiencia(self.perfil, 'Initech', date(2010, 2, 1))
+
+    def grupos(self, queryset):
+        with self.assertNumQueries(1):
+            return [
+                (grupo.empresa, [experiencia.cargodesempenado for experiencia in grupo.experiencias])
+                for grupo in group_by_company(company_ordered(queryset))
+            ]
+
+    def test_companies_by_latest_experience_then_name(self):
+        self.assertEqual(self.grupos(ExperienciaLaboral.objects.filter(idperfilconqueestaactivo=self.perfil)), [
+            ('Acme', ['Acme 2022', 'Acme 2015']),
+            ('Globex', ['Globex 2019']),
+            ('Initech', ['Initech 2019', 'Initech 2010']),
+        ])
+
+    def test_hidden_experiences_do_not_move_visible_ones(self):
+        crear_experiencia(self.perfil, 'Initech', date(2024, 1, 1), activarparaqueseveaenfront=False)
+        todas = ExperienciaLaboral.objects.filter(idperfilconqueestaactivo=self.perfil)
+        visibles = [
+            (empresa, cargos) for empresa, cargos in self.grupos(todas)
+            if cargos != ['Initech 2024']
+        ]
+        self.assertEqual(visibles, self.grupos(todas.filter(activarparaqueseveaenfront=True)))
+        self.assertEqual(visibles[0][0], 'Acme')
+
+    def test_groups_are_immutable(self):
+        grupos = group_by_company(company_ordered(ExperienciaLaboral.objects.all()))
+        self.assertIsInstance(grupos, tuple)
+        self.assertIsInstance(grupos[0].experiencias, tuple)
+        self.assertEqual(group_by_company([]), ())
+
+
+@override_settings(
+    CV_PRERENDER_ON_SAVE=False,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'snapshot-tests'},
+        'pdf': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'snapshot-tests-pdf'},
+    },
+)
+class CVSnapshotTests(TestCase):
+    def setUp(self):
+        cv_snapshot._snapshots.clear()
+        self.perfil = crear_perfil()
+        VisibilidadCV.objects.create(perfil=self.perfil, mostrar_cursos=False)
+        crear_experiencia(self.perfil, 'Acme', date(2022, 3, 1), rutacertificado='https://cuenta.blob.core.windows.net/c/e.pdf')
+        crear_experiencia(self.perfil, 'Globex', date(2019, 6, 1), activarparaqueseveaenfront=False)
+        CursoRealizado.objects.create(idperfilconqueestaactivo=self.perfil, nombrecurso='Oculto',
+                                      activarparaqueseveaenfront=False,
+                                      rutacertificado='https://cuenta.blob.core.windows.net/c/c.pdf')
+        CursoRealizado.objects.create(idperfilconqueestaactivo=self.perfil, nombrecurso='Django')
+        Reconocimiento.objects.create(idperfilconqueestaactivo=self.perfil, descripcionreconocimiento='Premio')
+        ProductoLaboral.objects.create(idperfilconqueestaactivo=self.perfil, nombreproducto='API')
+        self.perfil.refresh_from_db()
+
+    def test_load_runs_seven_queries_however_many_rows(self):
+        with self.assertNumQueries(7):
+            snapshot = cv_snapshot.load_cv_snapshot(self.perfil.pk)
+        for year in range(2000, 2010):
+            crear_experiencia(self.perfil, f'Empresa {year}', date(year, 1, 1))
+            CursoRealizado.objects.create(idperfilconqueestaactivo=self.perfil, nombrecurso=f'Curso {year}')
+        with self.assertNumQueries(7):
+            cv_snapshot.load_cv_snapshot(self.perfil.pk)
+
+        self.assertEqual(snapshot.version, self.perfil.version_datos)
+        self.assertFalse(snapshot.visibilidad.mostrar_cursos)
+        self.assertEqual([grupo.empresa for grupo in snapshot.empresas], ['Acme'])
+        self.assertEqual([curso.nombrecurso for curso in snapshot.cursos], ['Django'])
+        self.assertEqual(len(snapshot.reconocimientos), 1)
+        self.assertEqual(len(snapshot.productos_laborales), 1)
+        # Certificates of hidden records are attached to the full PDF too
+        self.assertEqual([certificado.tipo for certificado in snapshot.certificados], ['curso', 'experiencia'])
+
+    def test_snapshots_are_memoized_per_data_version(self):
+        snapshot = cv_snapshot.get_cv_snapshot(self.perfil)
+        with self.assertNumQueries(0):
+            self.assertIs(cv_snapshot.get_cv_snapshot(self.perfil), snapshot)
+
+        CursoRealizado.objects.create(idperfilconqueestaactivo=self.perfil, nombrecurso='Nuevo')
+        self.perfil.refresh_from_db(fields=['version_datos'])
+        nuevo = cv_snapshot.get_cv_snapshot(self.perfil)
+        self.assertEqual(nuevo.version, snapshot.version + 1)
+        self.assertEqual(len(nuevo.cursos), 2)
+
+    def test_secciones(self):
+        snapshot = cv_snapshot.get_cv_snapshot(self.perfil)
+        contexto = cv_snapshot.secciones(snapshot, cursos=False)
+        self.assertEqual(contexto['cursos'], ())
+        self.assertEqual(contexto['experiencias'], snapshot.empresas)
+        self.assertEqual(contexto['experiencias_qs'], snapshot.experiencias)
+        with self.assertRaises(TypeError):
+            cv_snapshot.secciones(snapshot, educacion=True)
+
+    def test_cv_pages_run_one_query_once_the_snapshot_is_memoized(self):
+        for url_name in ('hoja_vida_publica', 'selector_cv'):
+            with self.subTest(url_name=url_name):
+                self.client.get(reverse(url_name))
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse(url_name))
+                self.assertEqual(response.status_code, 200)
+
+
+def imagen(size, mode='RGB', fmt='PNG'):
+    buffer = BytesIO()
+    Image.new(mode, size, (30, 90, 160, 128)[:len(mode)]).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@override_settings(CV_PRERENDER_ON_SAVE=False, AZURE_STORAGE_CONTAINER='imagenes')
+class ImagenesPerfilTests(BlobEmulatorMixin, TestCase):
+    FOTO = imagen((1600, 1200))
+
+    def setUp(self):
+        super().setUp()
+        cv_snapshot._snapshots.clear()
+        self.subida = azure_storage.upload_profile_image(SimpleUploadedFile('foto.png', self.FOTO, content_type='image/png'))
+        self.perfil = crear_perfil(
+            foto_perfil_url=self.subida.url,
+            imagenes_derivadas={'foto_perfil_url': self.subida.variantes},
+        )
+
+    def leer(self, blob_url):
+        data, properties = get_storage().download(blob_url)
+        return Image.open(BytesIO(data)), properties
+
+    def get(self, url_name, query='', **headers):
+        response = self.client.get(reverse(url_name) + query, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_photo_upload_creates_print_and_web_versions(self):
+        self.assertEqual(set(self.subida.variantes), {'print', 'web'})
+        base = self.subida.url.rpartition('.')[0]
+        self.assertEqual(self.subida.variantes['print'], f'{base}_print.jpg')
+        self.assertEqual(self.subida.variantes['web'], f'{base}_web.jpg')
+
+        # 50 mm at 300 DPI, and the web box, keeping the 4:3 aspect ratio
+        impresion, properties = self.leer(self.subida.variantes['print'])
+        self.assertEqual((impresion.format, impresion.size), ('JPEG', (591, 443)))
+        self.assertEqual(properties.content_type, 'image/jpeg')
+        web, _ = self.leer(self.subida.variantes['web'])
+        self.assertEqual((web.format, web.size), ('JPEG', (400, 300)))
+        # The original is kept untouched
+        self.assertEqual(get_storage().download(self.subida.url)[0], self.FOTO)
+
+    def test_background_versions_fit_the_page(self):
+        subida = azure_storage.upload_template_image(SimpleUploadedFile('fondo.jpg', imagen((2480, 3508), fmt='JPEG')))
+        impresion, _ = self.leer(subida.variantes['print'])
+        web, _ = self.leer(subida.variantes['web'])
+        # A4 at 150 DPI and the web box
+        self.assertEqual(impresion.size, (1240, 1754))
+        self.assertEqual(web.size, (640, 905))
+
+    def test_transparent_images_stay_png(self):
+        subida = azure_storage.upload_profile_image(SimpleUploadedFile('logo.png', imagen((800, 800), 'RGBA'), content_type='image/png'))
+        impresion, properties = self.leer(subida.variantes['print'])
+        self.assertEqual((impresion.format, impresion.mode), ('PNG', 'RGBA'))
+        self.assertEqual(properties.content_type, 'image/png')
+
+    def test_small_images_are_not_upscaled(self):
+        subida = azure_storage.upload_profile_image(SimpleUploadedFile('mini.png', imagen((120, 80)), content_type='image/png'))
+        for variant in image_variants.VARIANTS:
+            self.assertEqual(self.leer(subida.variantes[variant])[0].size, (120, 80))
+
+    def test_reupload_keeps_the_known_versions(self):
+        etags = {variant: get_storage().stat(url).etag for variant, url in self.subida.variantes.items()}
+        subida = azure_storage.upload_profile_image(SimpleUploadedFile('otra.png', self.FOTO, content_type='image/png'))
+        self.assertEqual(subida, self.subida)
+        self.assertEqual({variant: get_storage().stat(url).etag for variant, url in subida.variantes.items()}, etags)
+
+    def test_unreadable_images_keep_only_the_original(self):
+        subida = azure_storage.upload_profile_image(SimpleUploadedFile('rota.png', b'no es png', content_type='image/png'))
+        self.assertEqual(subida.variantes, {})
+        self.assertEqual(image_variants.variant_blob_url(
+            mock.Mock(foto_perfil_url=subida.url, imagenes_derivadas={}), 'foto_perfil_url', 'print',
+        ), subida.url)
+
+    def test_variante_selects_the_version_in_the_proxy(self):
+        impresion = get_storage().download(self.subida.variantes['print'])[0]
+        web = get_storage().download(self.subida.variantes['web'])[0]
+        for query, expected, content_type in (
+            ('?variante=print', impresion, 'image/jpeg'),
+            ('?variante=web', web, 'image/jpeg'),
+            ('', self.FOTO, 'image/png'),
+            ('?variante=otra', self.FOTO, 'image/png'),
+        ):
+            with self.subTest(query=query):
+                response = self.get('ver_foto_perfil', query)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.body(response), expected)
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertEqual(response['Content-Length'], str(len(expected)))
+
+    def test_variant_validators_and_ranges(self):
+        impresion = get_storage().download(self.subida.variantes['print'])[0]
+        etag = self.get('ver_foto_perfil', '?variante=print')['ETag']
+        self.assertEqual(self.get('ver_foto_perfil', '?variante=print', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # The ETag of the print version does not validate the original
+        self.assertEqual(self.get('ver_foto_perfil', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        response = self.get('ver_foto_perfil', '?variante=print', HTTP_RANGE='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), impresion[:100])
+        self.assertEqual(response['Content-Range'], f'bytes 0-99/{len(impresion)}')
+
+        response = self.client.head(reverse('ver_foto_perfil') + '?variante=print')
+        self.assertEqual(response['Content-Length'], str(len(impresion)))
+
+    def test_fingerprinted_variant_url(self):
+        url = views._perfil_imagen_url(self.perfil, 'foto_perfil_url', 'ver_foto_perfil', 'print')
+        self.assertTrue(url.endswith('?variante=print'))
+        response = self.client.get(url)
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), get_storage().download(self.subida.variantes['print'])[0])
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_backgrounds_honour_the_variant(self):
+        subida = azure_storage.upload_template_image(SimpleUploadedFile('fondo.png', imagen((2000, 2800)), content_type='image/png'))
+        self.perfil.fondo_modern_url = subida.url
+        self.perfil.fondo_professional_url = subida.url
+        self.perfil.imagenes_derivadas = {'fondo_modern_url': subida.variantes}
+        self.perfil.save()
+        web = get_storage().download(subida.variantes['web'])[0]
+        self.assertEqual(self.body(self.get('fondo_modern', '?variante=web')), web)
+        # Uploaded before versions existed: the original is served
+        self.assertEqual(self.body(self.get('fondo_professional', '?variante=web')), get_storage().download(subida.url)[0])
+
+    def test_variant_outage_answers_503(self):
+        self.fail_requests()
+        for _ in range(3):
+            self.assertEqual(self.get('ver_foto_perfil', '?variante=print').status_code, 503)
+        self.emulator.faults = self.emulator.faults._replace(error_rate=0.0)
+        response = self.get('ver_foto_perfil', '?variante=print')
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(0 < int(response['Retry-After']) <= 30)
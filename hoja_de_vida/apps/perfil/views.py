@@ -1,23 +1,27 @@
 from django.shortcuts import render, get_object_or_404
 from apps.perfil.models import DatosPersonales
-from apps.trayectoria.models import (
-    ExperienciaLaboral,
-    CursoRealizado,
-    Reconocimiento,
-    ProductoAcademico,
-    ProductoLaboral,
-    VentaGarage,
+from apps.trayectoria.views import (
+    _blob_error_response,
+    _blob_shortcut_response,
+    _blob_streaming_response,
+    _download_blobs,
+    _stream_blob_from_url,
+    _versioned_blob_url,
 )
-from apps.trayectoria.views import _download_blob_from_url
+from apps.documentos.services import http_range, image_variants
+from apps.perfil.services import cv_snapshot, pdf_cache
+from apps.perfil.services.pdf_render import RenderBusy, render_pdf
+from apps.perfil.services.pdf_styles import PAGE_A4, CV_TEMPLATE_WEB
 
+from django.conf import settings
 from django.http import HttpResponse
 from django.template.loader import render_to_string
+from copy import copy
 from io import BytesIO
 import os
 import base64
 import mimetypes
 from django.urls import reverse
-from weasyprint import HTML, CSS
 from pypdf import PdfWriter, PdfReader
 
 
@@ -29,18 +33,64 @@ def _render_html_to_pdf(html: str, request) -> bytes:
     base_url = request.build_absolute_uri('/')
     try:
         # Force A4 and set reasonable margins (can be overridden by the template CSS)
-        pdf_bytes = HTML(string=html, base_url=base_url).write_pdf(
-            stylesheets=[CSS(string='@page { size: A4; margin: 15mm }')]
-        )
+        pdf_bytes = render_pdf(html, base_url, stylesheets=[PAGE_A4])
         return pdf_bytes
     except Exception as exc:
         # Provide a clear error so the developer can install WeasyPrint system deps if needed
         raise RuntimeError(f'WeasyPrint PDF generation failed: {exc}')
 
 
+def _pdf_error_response(exc):
+    """Response for a CV that could not be rendered.
+
+    503 with Retry-After while the render pool is saturated, 500 for anything else.
+    """
+    if isinstance(exc, RenderBusy):
+        resp = HttpResponse('El generador de PDF está ocupado, inténtalo de nuevo en unos segundos.', status=503)
+        resp['Retry-After'] = str(getattr(settings, 'PDF_RENDER_RETRY_AFTER', 10))
+        return resp
+    return HttpResponse(f'Error generating PDF: {str(exc)}', status=500)
+
+
+def _pdf_attachment_response(request, artifact):
+    """Serve a pdf_cache.CachedPDF as an attachment, honouring Range / If-Range."""
+    response = http_range.bytes_response(request, artifact.data, 'application/pdf', etag=artifact.etag)
+    if response.status_code != 416:
+        response['Content-Disposition'] = f'attachment; filename="{artifact.filename}"'
+    return response
+
+
+def _perfil_imagen_url(perfil, field: str, url_name: str, variant: str):
+    """Return the fingerprinted proxy URL of a profile image in a variant ('print' / 'web').
+
+    The variant travels as `?variante=`; profiles without generated versions
+    get the URL of the original upload.
+    """
+    blob_url = image_variants.variant_blob_url(perfil, field, variant)
+    url = _versioned_blob_url(url_name, blob_url)
+    if blob_url != getattr(perfil, field, None):
+        url = f'{url}?variante={variant}'
+    return url
+
+
+def _foto_perfil_pdf_url(perfil, request):
+    """Return the absolute fingerprinted URL of the print-sized photo for a PDF template.
+
+    CVUrlFetcher resolves it in-process from the shared blob cache, so the
+    photo no longer has to be base64-inlined into the HTML. Returns None when
+    the profile has no photo.
+    """
+    if not getattr(perfil, 'foto_perfil_url', None):
+        return None
+    return request.build_absolute_uri(_perfil_imagen_url(perfil, 'foto_perfil_url', 'ver_foto_perfil', 'print'))
+
+
 def _prepare_html_for_pdf(html: str, request=None) -> str:
     """Ensure relative asset URLs become absolute so WeasyPrint can fetch them.
 
+    Absolute URLs on the site origin are resolved in-process by CVUrlFetcher
+    (see services/url_fetcher.py), so rendering does not call back into the server.
+
     This function intentionally does NOT modify CSS variables or strip fonts so the original
     template CSS and design are preserved exactly.
     """
@@ -109,77 +159,24 @@ def hoja_vida_publica(request):
             sitioweb="https://example.com"
         )
 
-    # Obtain active experiences for the profile and group them by company (respetando control de visibilidad)
-    visibilidad = getattr(perfil, 'visibilidad_cv', None)
+    # All CV sections in one pass, shown according to the visibility controls
+    # (experiences are shown when the profile has none)
+    snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    visibilidad = snapshot.visibilidad
     mostrar_experiencias = visibilidad.mostrar_experiencias if visibilidad else True
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if mostrar_experiencias else ExperienciaLaboral.objects.none()
-
-    # Order each company's experiences by start date desc and order companies
-    # by the most recent experience date (desc).
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
+    secciones_cv = cv_snapshot.secciones(
+        snapshot,
+        experiencias=mostrar_experiencias,
+        cursos=bool(visibilidad and visibilidad.mostrar_cursos),
+        reconocimientos=bool(visibilidad and visibilidad.mostrar_reconocimientos),
+        productos_academicos=bool(visibilidad and visibilidad.mostrar_productos_academicos),
+        productos_laborales=bool(visibilidad and visibilidad.mostrar_productos_laborales),
     )
 
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio') if visibilidad and visibilidad.mostrar_cursos else CursoRealizado.objects.none()
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento') if visibilidad and visibilidad.mostrar_reconocimientos else Reconocimiento.objects.none()
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad and visibilidad.mostrar_productos_academicos else ProductoAcademico.objects.none()
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto') if visibilidad and visibilidad.mostrar_productos_laborales else ProductoLaboral.objects.none()
-
-    # Convert profile photo to base64 for PDF embedding
-    foto_base64 = None
+    # The page links the fingerprinted photo proxy so the browser can cache the image
     foto_perfil_proxy_url = None
-
     if getattr(perfil, 'foto_perfil_url', None):
-        try:
-            # Download the photo from Azure blob
-            data, filename = _download_blob_from_url(perfil.foto_perfil_url)
-            
-            # Convert to base64
-            foto_base64 = base64.b64encode(data).decode('utf-8')
-            
-            # Determine mime type
-            mime, _ = mimetypes.guess_type(filename or 'photo.jpg')
-            if not mime:
-                mime = 'image/jpeg'
-            
-            # Create data URI for embedding in PDF
-            foto_perfil_proxy_url = f"data:{mime};base64,{foto_base64}"
-        except Exception as e:
-            # Fallback: use proxy URL (works for web but not PDF)
-            foto_perfil_proxy_url = f"{request.scheme}://{request.get_host()}/foto-perfil/"
-            print(f"Error converting photo to base64: {e}")
+        foto_perfil_proxy_url = _perfil_imagen_url(perfil, 'foto_perfil_url', 'ver_foto_perfil', 'web')
 
     # Flags explícitos para visibilidad de secciones
     show_datos_personales = visibilidad.mostrar_datos_personales if visibilidad else True
@@ -193,12 +190,7 @@ def hoja_vida_publica(request):
         'perfil': perfil,
         'visibilidad': visibilidad,
         'datos_personales': perfil,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
+        **secciones_cv,
         'foto_perfil_proxy_url': foto_perfil_proxy_url,
         # Flags explícitos de visibilidad
         'show_datos_personales': show_datos_personales,
@@ -220,51 +212,8 @@ def cv_hacker_neon(request):
     if not perfil:
         return render(request, 'perfil/error.html', {'error': 'Perfil no encontrado'})
 
-    # Get all related data (same logic as hoja_vida_publica)
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    )
-
-    # Order each company's experiences by start date desc and order companies
-    # by the most recent experience date (desc).
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
-    )
-
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio')
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento')
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    )
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto')
+    # Get all related data (every section, regardless of the visibility controls)
+    secciones_cv = cv_snapshot.secciones(cv_snapshot.get_cv_snapshot(perfil))
 
     # Get skills and interests
     habilidades = perfil.habilidades.split(',') if perfil.habilidades else []
@@ -272,12 +221,7 @@ def cv_hacker_neon(request):
 
     context = {
         'perfil': perfil,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
+        **secciones_cv,
         'habilidades': habilidades,
         'intereses': intereses,
     }
@@ -285,7 +229,7 @@ def cv_hacker_neon(request):
     # Provide the same photo proxy URL used by the PDF path so browsers can fetch the image
     foto_perfil_proxy_url = None
     if getattr(perfil, 'foto_perfil_url', None):
-        foto_perfil_proxy_url = f"{request.scheme}://{request.get_host()}/foto-perfil/"
+        foto_perfil_proxy_url = request.build_absolute_uri(_perfil_imagen_url(perfil, 'foto_perfil_url', 'ver_foto_perfil', 'web'))
     context['foto_perfil_proxy_url'] = foto_perfil_proxy_url
 
     # Render with hacker neon template
@@ -296,7 +240,16 @@ def cv_hacker_neon(request):
 def seleccionar_plantilla(request):
     """Vista para seleccionar plantilla de CV."""
     perfil = DatosPersonales.objects.filter(perfilactivo=1).first()
-    return render(request, 'perfil/seleccionar_plantilla.html', {'perfil': perfil})
+    fondo_professional_src = fondo_modern_src = None
+    if perfil and perfil.fondo_professional_url:
+        fondo_professional_src = _perfil_imagen_url(perfil, 'fondo_professional_url', 'fondo_professional', 'web')
+    if perfil and perfil.fondo_modern_url:
+        fondo_modern_src = _perfil_imagen_url(perfil, 'fondo_modern_url', 'fondo_modern', 'web')
+    return render(request, 'perfil/seleccionar_plantilla.html', {
+        'perfil': perfil,
+        'fondo_professional_src': fondo_professional_src,
+        'fondo_modern_src': fondo_modern_src,
+    })
 
 
 def descargar_cv_pdf(request):
@@ -332,12 +285,13 @@ def descargar_cv_pdf(request):
         except Exception as e:
             return HttpResponse(f'Error creando perfil: {str(e)}', status=500)
 
-    # Obtener configuración de visibilidad del perfil
+    # Obtener configuración de visibilidad del perfil (una copia: los
+    # parámetros de la URL la modifican y el snapshot se comparte)
     from apps.perfil.models import VisibilidadCV
-    visibilidad = VisibilidadCV.objects.filter(perfil=perfil).first()
-    if not visibilidad:
+    snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    if not snapshot.visibilidad:
         # Si no existe, crear uno con todos los valores en True
-        visibilidad = VisibilidadCV.objects.create(
+        VisibilidadCV.objects.create(
             perfil=perfil,
             mostrar_datos_personales=True,
             mostrar_experiencias=True,
@@ -346,6 +300,11 @@ def descargar_cv_pdf(request):
             mostrar_productos_academicos=True,
             mostrar_productos_laborales=True,
         )
+        # La señal post_save incrementó version_datos: recargar para que el
+        # snapshot y la clave de la caché de PDFs usen la versión nueva
+        perfil.refresh_from_db(fields=['version_datos'])
+        snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    visibilidad = copy(snapshot.visibilidad)
 
     # Mapeo de parámetros URL (nombres de checkboxes en selector_cv.html) a campos del modelo
     param_to_field = {
@@ -361,86 +320,30 @@ def descargar_cv_pdf(request):
     has_preferences_params = any(key in request.GET for key in param_to_field.keys())
     
     if has_preferences_params:
-        print(f"\n{'='*60}")
-        print(f"🔍 PARÁMETROS RECIBIDOS EN URL:")
-        print(f"URL query string: {request.GET.urlencode()}")
-        print(f"{'='*60}\n")
-        
         # Si hay parámetros en la URL, usarlos para sobrescribir visibilidad
         for param, field in param_to_field.items():
             param_value = request.GET.get(param, 'false').lower() == 'true'
             setattr(visibilidad, field, param_value)
-            print(f"  - {param} ({field}): {param_value}")
-    else:
-        print(f"\n{'='*60}")
-        print(f"ℹ️ NO hay parámetros de preferencias - usando VisibilidadCV default")
-        print(f"{'='*60}\n")
+
+    # Servir desde la caché si este CV ya se generó con los mismos datos
+    secciones = [field for field in param_to_field.values() if getattr(visibilidad, field)]
+    cache_key = pdf_cache.build_cache_key(perfil, plantilla, secciones, certificados=['todos'])
+    cached = pdf_cache.get_pdf(cache_key)
+    if cached:
+        return _pdf_attachment_response(request, cached)
 
     # Respeta controles de visibilidad del admin (o parámetros de URL si existen)
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad.mostrar_experiencias else ExperienciaLaboral.objects.none()
-
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
+    secciones_cv = cv_snapshot.secciones(
+        snapshot,
+        experiencias=visibilidad.mostrar_experiencias,
+        cursos=visibilidad.mostrar_cursos,
+        reconocimientos=visibilidad.mostrar_reconocimientos,
+        productos_academicos=visibilidad.mostrar_productos_academicos,
+        productos_laborales=visibilidad.mostrar_productos_laborales,
     )
 
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio') if visibilidad.mostrar_cursos else CursoRealizado.objects.none()
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento') if visibilidad.mostrar_reconocimientos else Reconocimiento.objects.none()
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad.mostrar_productos_academicos else ProductoAcademico.objects.none()
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto') if visibilidad.mostrar_productos_laborales else ProductoLaboral.objects.none()
-
-    # Convert profile photo to base64 for PDF embedding
-    foto_perfil_proxy_url = None
-    if getattr(perfil, 'foto_perfil_url', None):
-        try:
-            # Download the photo from Azure blob
-            data, filename = _download_blob_from_url(perfil.foto_perfil_url)
-
-            # Convert to base64
-            foto_base64 = base64.b64encode(data).decode('utf-8')
-
-            # Determine mime type
-            mime, _ = mimetypes.guess_type(filename or 'photo.jpg')
-            if not mime:
-                mime = 'image/jpeg'
-
-            # Create data URI for embedding in PDF
-            foto_perfil_proxy_url = f"data:{mime};base64,{foto_base64}"
-        except Exception as e:
-            # Fallback: use proxy URL (works for web but not PDF)
-            foto_perfil_proxy_url = f"{request.scheme}://{request.get_host()}/foto-perfil/"
-            print(f"Error converting photo to base64: {e}")
+    # Fingerprinted photo URL, resolved in-process when rendering the PDF
+    foto_perfil_proxy_url = _foto_perfil_pdf_url(perfil, request)
 
     # Preparar intereses
     intereses_list = []
@@ -450,12 +353,7 @@ def descargar_cv_pdf(request):
     context = {
         'perfil': perfil,
         'datos_personales': perfil,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
+        **secciones_cv,
         'foto_perfil_proxy_url': foto_perfil_proxy_url,
         'certificates': [],
         'intereses_list': intereses_list,
@@ -466,7 +364,10 @@ def descargar_cv_pdf(request):
         template_name = 'perfil/pdf/cv_modern_clean.html'
         html = render_to_string(template_name, context, request=request)
         # No aplicar _prepare_html_for_pdf para mantener estilos inline
-        pdf_bytes = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf()
+        try:
+            pdf_bytes = render_pdf(html, request.build_absolute_uri('/'))
+        except Exception as e:
+            return _pdf_error_response(e)
     else:
         # Template professional por defecto
         template_name = 'perfil/pdf/cv_template_web.html'
@@ -474,18 +375,9 @@ def descargar_cv_pdf(request):
         html = _prepare_html_for_pdf(html, request)
 
         try:
-            # Leer el CSS
-            base_dir = os.path.dirname(__file__)
-            css_path = os.path.join(base_dir, 'static', 'perfil', 'css', 'pdf', 'cv_template_web.css')
-
-            with open(css_path, 'r', encoding='utf-8') as f:
-                css_text = f.read()
-
-            pdf_bytes = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf(
-                stylesheets=[CSS(string=css_text)]
-            )
+            pdf_bytes = render_pdf(html, request.build_absolute_uri('/'), stylesheets=[CV_TEMPLATE_WEB])
         except Exception as e:
-            return HttpResponse(f'Error generating PDF: {str(e)}', status=500)
+            return _pdf_error_response(e)
 
     # After generating the CV PDF, append any uploaded certificates (courses, experiences, recognitions)
     try:
@@ -494,10 +386,6 @@ def descargar_cv_pdf(request):
         merger = PdfMerger()
         merger.append(BytesIO(pdf_bytes))
 
-        cursos_with_cert = CursoRealizado.objects.filter(idperfilconqueestaactivo=perfil).exclude(rutacertificado__isnull=True).exclude(rutacertificado__exact='').order_by('pk')
-        experiencias_with_cert = ExperienciaLaboral.objects.filter(idperfilconqueestaactivo=perfil).exclude(rutacertificado__isnull=True).exclude(rutacertificado__exact='').order_by('pk')
-        reconocimientos_with_cert = Reconocimiento.objects.filter(idperfilconqueestaactivo=perfil).exclude(rutacertificado__isnull=True).exclude(rutacertificado__exact='').order_by('pk')
-
         def append_certificate(cert_bytes, filename='', titulo=''):
             lower = (filename or '').lower()
             try:
@@ -513,9 +401,7 @@ def descargar_cv_pdf(request):
                         'image_data_uri': data_uri,
                     })
                     cert_html = _prepare_html_for_pdf(cert_html, request)
-                    cert_pdf = HTML(string=cert_html, base_url=request.build_absolute_uri('/')).write_pdf(
-                        stylesheets=[CSS(string='@page { size: A4; margin: 15mm }')]
-                    )
+                    cert_pdf = render_pdf(cert_html, request.build_absolute_uri('/'), stylesheets=[PAGE_A4])
                     merger.append(BytesIO(cert_pdf))
                 else:
                     # For PDFs, try to overlay the title on the first certificate page.
@@ -525,9 +411,7 @@ def descargar_cv_pdf(request):
                             'image_data_uri': '__title_only__',
                         })
                         title_html = _prepare_html_for_pdf(title_html, request)
-                        title_pdf_bytes = HTML(string=title_html, base_url=request.build_absolute_uri('/')).write_pdf(
-                            stylesheets=[CSS(string='@page { size: A4; margin: 15mm }')]
-                        )
+                        title_pdf_bytes = render_pdf(title_html, request.build_absolute_uri('/'), stylesheets=[PAGE_A4])
 
                         cert_reader = PdfReader(BytesIO(cert_bytes))
                         title_reader = PdfReader(BytesIO(title_pdf_bytes))
@@ -562,49 +446,38 @@ def descargar_cv_pdf(request):
             except Exception:
                 return
 
-        for curso in cursos_with_cert:
-            try:
-                cert_url = getattr(curso, 'rutacertificado', None)
-                if cert_url:
-                    cert_bytes, filename = _download_blob_from_url(cert_url)
-                    title = f"Cursos realizados - {getattr(curso, 'nombrecurso', '')}"
-                    append_certificate(cert_bytes, filename or '', title)
-            except Exception:
-                continue
-
-        for exp in experiencias_with_cert:
-            try:
-                cert_url = getattr(exp, 'rutacertificado', None)
-                if cert_url:
-                    cert_bytes, filename = _download_blob_from_url(cert_url)
-                    title = f"Experiencia laboral - {getattr(exp, 'cargodesempenado', '')} en {getattr(exp, 'nombrempresa', '')}"
-                    append_certificate(cert_bytes, filename or '', title)
-            except Exception:
-                continue
-
-        for recon in reconocimientos_with_cert:
-            try:
-                cert_url = getattr(recon, 'rutacertificado', None)
-                if cert_url:
-                    cert_bytes, filename = _download_blob_from_url(cert_url)
-                    title = f"Reconocimiento - {getattr(recon, 'descripcionreconocimiento', '')}"
-                    append_certificate(cert_bytes, filename or '', title)
-            except Exception:
+        # Every uploaded certificate (visible or not): courses, experiences, recognitions
+        certificados = []
+        for certificado in snapshot.certificados:
+            registro = certificado.registro
+            if certificado.tipo == 'curso':
+                titulo = f"Cursos realizados - {getattr(registro, 'nombrecurso', '')}"
+            elif certificado.tipo == 'experiencia':
+                titulo = f"Experiencia laboral - {getattr(registro, 'cargodesempenado', '')} en {getattr(registro, 'nombrempresa', '')}"
+            else:
+                titulo = f"Reconocimiento - {getattr(registro, 'descripcionreconocimiento', '')}"
+            certificados.append((registro.rutacertificado, titulo))
+
+        # Download every certificate concurrently; results keep the original order
+        descargas = _download_blobs([url for url, _ in certificados])
+        for (_, title), descarga in zip(certificados, descargas):
+            if descarga is None:
                 continue
+            cert_bytes, filename = descarga
+            append_certificate(cert_bytes, filename or '', title)
 
         out = BytesIO()
         merger.write(out)
         merger.close()
         out.seek(0)
         merged_bytes = out.getvalue()
-        response = HttpResponse(merged_bytes, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="cv_{plantilla}_completo.pdf"'
-        return response
+        filename = f'cv_{plantilla}_completo.pdf'
     except Exception:
         # If merging fails for any reason, return the original CV PDF
-        response = HttpResponse(pdf_bytes, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="cv_{plantilla}.pdf"'
-        return response
+        merged_bytes = pdf_bytes
+        filename = f'cv_{plantilla}.pdf'
+
+    return _pdf_attachment_response(request, pdf_cache.store_pdf(cache_key, merged_bytes, filename))
 
 
 def descargar_cv_completo_pdf(request):
@@ -634,54 +507,42 @@ def descargar_cv_completo_pdf(request):
         except Exception as e:
             return HttpResponse(f'Error creando perfil: {str(e)}', status=500)
 
-    # Respeta controles de visibilidad del admin
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad.mostrar_experiencias else ExperienciaLaboral.objects.none()
-
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
+    snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    visibilidad = snapshot.visibilidad
+    mostrar_experiencias = visibilidad.mostrar_experiencias if visibilidad else True
+
+    # Servir desde la caché si este CV ya se generó con los mismos datos y certificados
+    requested = request.GET.getlist('certificados')
+    check_all = request.GET.get('check_all') or request.GET.get('select_all')
+    secciones = [
+        field for field in (
+            'mostrar_cursos',
+            'mostrar_reconocimientos',
+            'mostrar_productos_academicos',
+            'mostrar_productos_laborales',
+        ) if visibilidad and getattr(visibilidad, field)
+    ]
+    if mostrar_experiencias:
+        secciones.append('mostrar_experiencias')
+    cache_key = pdf_cache.build_cache_key(
+        perfil,
+        'completo',
+        secciones,
+        certificados=['todos'] if check_all else requested,
     )
+    cached = pdf_cache.get_pdf(cache_key)
+    if cached:
+        return _pdf_attachment_response(request, cached)
 
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio') if visibilidad and visibilidad.mostrar_cursos else CursoRealizado.objects.none()
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento') if visibilidad and visibilidad.mostrar_reconocimientos else Reconocimiento.objects.none()
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad and visibilidad.mostrar_productos_academicos else ProductoAcademico.objects.none()
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto') if visibilidad and visibilidad.mostrar_productos_laborales else ProductoLaboral.objects.none()
-
-    ventas_garage = VentaGarage.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('nombreproducto')
+    # Respeta controles de visibilidad del admin
+    secciones_cv = cv_snapshot.secciones(
+        snapshot,
+        experiencias=mostrar_experiencias,
+        cursos=bool(visibilidad and visibilidad.mostrar_cursos),
+        reconocimientos=bool(visibilidad and visibilidad.mostrar_reconocimientos),
+        productos_academicos=bool(visibilidad and visibilidad.mostrar_productos_academicos),
+        productos_laborales=bool(visibilidad and visibilidad.mostrar_productos_laborales),
+    )
     
     # ===============================
 # 1. Generar PDF base del CV
@@ -690,13 +551,8 @@ def descargar_cv_completo_pdf(request):
     # Generar HTML del CV base
     context = {
         'perfil': perfil,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
-        'ventas_garage': ventas_garage,
+        **secciones_cv,
+        'ventas_garage': snapshot.ventas_garage,
     }
 
     html = render_to_string(
@@ -707,31 +563,21 @@ def descargar_cv_completo_pdf(request):
 
     html = _prepare_html_for_pdf(html, request)
 
-    css_path = os.path.join(
-        os.path.dirname(__file__),
-        'static',
-        'perfil',
-        'css',
-        'pdf',
-        'cv_template_web.css'
-    )
-
-    with open(css_path, 'r', encoding='utf-8') as f:
-        css_text = f.read()
-
-    pdf_bytes = HTML(
-        string=html,
-        base_url=request.build_absolute_uri('/')
-    ).write_pdf(
-        stylesheets=[CSS(string=css_text)]
-    )
+    try:
+        pdf_bytes = render_pdf(
+            html,
+            request.build_absolute_uri('/'),
+            stylesheets=[CV_TEMPLATE_WEB]
+        )
+    except Exception as e:
+        return _pdf_error_response(e)
 
 
     # Collect all available certificates for selection
     certificados_meta = []
 
     # Add certificates from experiences
-    for exp in experiencias_qs:
+    for exp in secciones_cv['experiencias_qs']:
         if getattr(exp, 'rutacertificado', None):
             certificados_meta.append({
                 'model': exp,
@@ -740,7 +586,7 @@ def descargar_cv_completo_pdf(request):
             })
 
     # Add certificates from courses
-    for curso in cursos:
+    for curso in secciones_cv['cursos']:
         if getattr(curso, 'rutacertificado', None):
             certificados_meta.append({
                 'model': curso,
@@ -749,7 +595,7 @@ def descargar_cv_completo_pdf(request):
             })
 
     # Add certificates from recognitions
-    for recon in reconocimientos:
+    for recon in secciones_cv['reconocimientos']:
         if getattr(recon, 'rutacertificado', None):
             certificados_meta.append({
                 'model': recon,
@@ -758,9 +604,6 @@ def descargar_cv_completo_pdf(request):
             })
 
     # Determine which certificates to include based on GET params (supports individual selection)
-    requested = request.GET.getlist('certificados')
-    check_all = request.GET.get('check_all') or request.GET.get('select_all')
-
     if check_all:
         # CHECK ALL: Include ALL certificates from all three tables
         selected_meta = certificados_meta
@@ -796,17 +639,16 @@ def descargar_cv_completo_pdf(request):
         except Exception as e:
             return HttpResponse(f'Error processing CV PDF: {str(e)}', status=500)
 
+        # Download the selected certificates from Azure concurrently (order is kept)
+        descargas = _download_blobs([getattr(cm['model'], 'rutacertificado', None) for cm in selected_meta])
+
         # Add each selected certificate
-        for cert_meta in selected_meta:
+        for cert_meta, descarga in zip(selected_meta, descargas):
             try:
-                model = cert_meta['model']
                 titulo = cert_meta['titulo']
 
-                # Get the blob URL from the model
-                cert_url = getattr(model, 'rutacertificado', None)
-                if cert_url:
-                    # Download certificate from Azure
-                    cert_bytes, filename = _download_blob_from_url(cert_url)
+                if descarga:
+                    cert_bytes, filename = descarga
                     filename = filename or ''
                     lower = filename.lower()
 
@@ -824,9 +666,7 @@ def descargar_cv_completo_pdf(request):
                         })
                         cert_html = _prepare_html_for_pdf(cert_html, request)
                         try:
-                            cert_pdf_bytes = HTML(string=cert_html, base_url=request.build_absolute_uri('/')).write_pdf(
-                                stylesheets=[CSS(string='@page { size: A4; margin: 15mm }')]
-                            )
+                            cert_pdf_bytes = render_pdf(cert_html, request.build_absolute_uri('/'), stylesheets=[PAGE_A4])
                             cert_reader = PdfReader(BytesIO(cert_pdf_bytes))
                             for page in cert_reader.pages:
                                 writer.add_page(page)
@@ -840,9 +680,7 @@ def descargar_cv_completo_pdf(request):
                         })
                         title_html = _prepare_html_for_pdf(title_html, request)
                         try:
-                            title_pdf_bytes = HTML(string=title_html, base_url=request.build_absolute_uri('/')).write_pdf(
-                                stylesheets=[CSS(string='@page { size: A4; margin: 15mm }')]
-                            )
+                            title_pdf_bytes = render_pdf(title_html, request.build_absolute_uri('/'), stylesheets=[PAGE_A4])
                             title_reader = PdfReader(BytesIO(title_pdf_bytes))
                         except Exception:
                             title_reader = None
@@ -878,21 +716,18 @@ def descargar_cv_completo_pdf(request):
         # Write the final merged PDF
         out_buf = BytesIO()
         writer.write(out_buf)
-        response = HttpResponse(out_buf.getvalue(), content_type='application/pdf')
-    else:
-        # No certificates, just return CV
-        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        pdf_bytes = out_buf.getvalue()
 
-    response['Content-Disposition'] = 'attachment; filename="cv_completo.pdf"'
-    return response
+    return _pdf_attachment_response(request, pdf_cache.store_pdf(cache_key, pdf_bytes, 'cv_completo.pdf'))
 
 
 # --- Secure photo proxy view ---
-from apps.trayectoria.views import _download_blob_from_url
 
+def ver_foto_perfil(request, huella=None):
+    """Proxy view to serve the profile photo from Azure without exposing the blob URL.
 
-def ver_foto_perfil(request):
-    """Proxy view to serve the profile photo from Azure without exposing the blob URL."""
+    `?variante=print|web` serves the resized version when it exists.
+    """
     perfil = DatosPersonales.objects.filter(perfilactivo=1).first()
     if not perfil:
         # Create default profile if none exists with all required fields
@@ -918,91 +753,74 @@ def ver_foto_perfil(request):
             )
         except Exception as e:
             return HttpResponse(f'Error creando perfil: {str(e)}', status=500)
-    blob_url = getattr(perfil, 'foto_perfil_url', None)
+    blob_url = image_variants.variant_blob_url(perfil, 'foto_perfil_url', request.GET.get('variante'))
     if not blob_url:
         return HttpResponse('No profile photo available.', status=404)
 
-    # Primary attempt: use existing helper that downloads from Azure blobs.
-    try:
-        data, filename = _download_blob_from_url(blob_url)
-    except Exception:
-        # Fallback: try a direct HTTP fetch (works for public URLs or SAS URLs).
-        try:
-            from urllib.request import urlopen
-            from urllib.parse import urlparse
+    shortcut = _blob_shortcut_response(request, blob_url, 'inline', 'image/png', huella)
+    if shortcut is not None:
+        return shortcut
 
-            resp_fetch = urlopen(blob_url)
-            data = resp_fetch.read()
-            filename = os.path.basename(urlparse(blob_url).path) or 'profile.png'
-        except Exception as exc:
-            return HttpResponse(f'Error fetching profile photo: {exc}', status=500)
+    # Stream the blob from Azure, or the local blob cache while Azure is failing
+    try:
+        blob = _stream_blob_from_url(blob_url)
+    except Exception as exc:
+        return _blob_error_response(exc, 'Error fetching profile photo')
 
     # Guess mime type from filename; default to PNG to preserve previous behavior
-    mime, _ = mimetypes.guess_type(filename)
+    mime, _ = mimetypes.guess_type(blob.filename)
     if not mime:
         mime = 'image/png'
 
-    resp = HttpResponse(data, content_type=mime)
-    resp['Content-Disposition'] = f'inline; filename="{filename}"'
-    return resp
+    return _blob_streaming_response(blob, mime, 'inline', huella)
 
 
-def fondo_professional(request):
-    """Proxy to serve the professional template background image stored in Azure."""
+def fondo_professional(request, huella=None):
+    """Proxy to serve the professional template background image stored in Azure (`?variante=print|web`)."""
     perfil = DatosPersonales.objects.filter(perfilactivo=1).first()
     if not perfil:
         return HttpResponse('No profile found.', status=404)
-    blob_url = getattr(perfil, 'fondo_professional_url', None)
+    blob_url = image_variants.variant_blob_url(perfil, 'fondo_professional_url', request.GET.get('variante'))
     if not blob_url:
         return HttpResponse('No background uploaded.', status=404)
 
+    shortcut = _blob_shortcut_response(request, blob_url, 'inline', 'image/png', huella)
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(blob_url)
-    except Exception:
-        try:
-            from urllib.request import urlopen
-            from urllib.parse import urlparse
-            resp_fetch = urlopen(blob_url)
-            data = resp_fetch.read()
-            filename = os.path.basename(urlparse(blob_url).path) or 'background.png'
-        except Exception as exc:
-            return HttpResponse(f'Error fetching background: {exc}', status=500)
-
-    mime, _ = mimetypes.guess_type(filename)
+        blob = _stream_blob_from_url(blob_url)
+    except Exception as exc:
+        return _blob_error_response(exc, 'Error fetching background')
+
+    mime, _ = mimetypes.guess_type(blob.filename)
     if not mime:
         mime = 'image/png'
-    resp = HttpResponse(data, content_type=mime)
-    resp['Content-Disposition'] = f'inline; filename="{filename}"'
-    return resp
+    return _blob_streaming_response(blob, mime, 'inline', huella)
 
 
-def fondo_modern(request):
-    """Proxy to serve the modern template background image stored in Azure."""
+def fondo_modern(request, huella=None):
+    """Proxy to serve the modern template background image stored in Azure (`?variante=print|web`)."""
     perfil = DatosPersonales.objects.filter(perfilactivo=1).first()
     if not perfil:
         return HttpResponse('No profile found.', status=404)
-    blob_url = getattr(perfil, 'fondo_modern_url', None)
+    blob_url = image_variants.variant_blob_url(perfil, 'fondo_modern_url', request.GET.get('variante'))
     if not blob_url:
         return HttpResponse('No background uploaded.', status=404)
 
+    shortcut = _blob_shortcut_response(request, blob_url, 'inline', 'image/png', huella)
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(blob_url)
-    except Exception:
-        try:
-            from urllib.request import urlopen
-            from urllib.parse import urlparse
-            resp_fetch = urlopen(blob_url)
-            data = resp_fetch.read()
-            filename = os.path.basename(urlparse(blob_url).path) or 'background.png'
-        except Exception as exc:
-            return HttpResponse(f'Error fetching background: {exc}', status=500)
-
-    mime, _ = mimetypes.guess_type(filename)
+        blob = _stream_blob_from_url(blob_url)
+    except Exception as exc:
+        return _blob_error_response(exc, 'Error fetching background')
+
+    mime, _ = mimetypes.guess_type(blob.filename)
     if not mime:
         mime = 'image/png'
-    resp = HttpResponse(data, content_type=mime)
-    resp['Content-Disposition'] = f'inline; filename="{filename}"'
-    return resp
+    return _blob_streaming_response(blob, mime, 'inline', huella)
 
 
 # ========================================
@@ -1036,73 +854,33 @@ def selector_cv(request):
             sitioweb="https://example.com"
         )
 
-    # Obtener controles de visibilidad
-    visibilidad = getattr(perfil, 'visibilidad_cv', None)
-
     # Obtener todas las secciones de datos (respeta controles de admin)
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad and visibilidad.mostrar_experiencias else ExperienciaLaboral.objects.none()
-
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
+    snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    visibilidad = snapshot.visibilidad
+    secciones_cv = cv_snapshot.secciones(
+        snapshot,
+        experiencias=bool(visibilidad and visibilidad.mostrar_experiencias),
+        cursos=bool(visibilidad and visibilidad.mostrar_cursos),
+        reconocimientos=bool(visibilidad and visibilidad.mostrar_reconocimientos),
+        productos_academicos=bool(visibilidad and visibilidad.mostrar_productos_academicos),
+        productos_laborales=bool(visibilidad and visibilidad.mostrar_productos_laborales),
     )
 
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio') if visibilidad and visibilidad.mostrar_cursos else CursoRealizado.objects.none()
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento') if visibilidad and visibilidad.mostrar_reconocimientos else Reconocimiento.objects.none()
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if visibilidad and visibilidad.mostrar_productos_academicos else ProductoAcademico.objects.none()
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto') if visibilidad and visibilidad.mostrar_productos_laborales else ProductoLaboral.objects.none()
-
     # Preparar foto para mostrar
     foto_perfil_proxy_url = None
     if getattr(perfil, 'foto_perfil_url', None):
-        foto_perfil_proxy_url = f"{request.scheme}://{request.get_host()}/foto-perfil/"
+        foto_perfil_proxy_url = request.build_absolute_uri(_perfil_imagen_url(perfil, 'foto_perfil_url', 'ver_foto_perfil', 'web'))
 
     context = {
         'perfil': perfil,
         'foto_perfil_proxy_url': foto_perfil_proxy_url,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
+        **secciones_cv,
         # Información sobre qué secciones tienen datos
-        'tiene_experiencias': len(experiencias) > 0,
-        'tiene_cursos': len(cursos) > 0,
-        'tiene_reconocimientos': len(reconocimientos) > 0,
-        'tiene_productos_academicos': len(productos_academicos) > 0,
-        'tiene_productos_laborales': len(productos_laborales) > 0,
+        'tiene_experiencias': len(secciones_cv['experiencias']) > 0,
+        'tiene_cursos': len(secciones_cv['cursos']) > 0,
+        'tiene_reconocimientos': len(secciones_cv['reconocimientos']) > 0,
+        'tiene_productos_academicos': len(secciones_cv['productos_academicos']) > 0,
+        'tiene_productos_laborales': len(secciones_cv['productos_laborales']) > 0,
     }
 
     return render(request, 'perfil/selector_cv.html', context)
@@ -1151,72 +929,39 @@ def descargar_cv_personalizado(request):
     incluir_productos_academicos = request.GET.get('productos_academicos') == 'on'
     incluir_productos_laborales = request.GET.get('productos_laborales') == 'on'
 
+    secciones = [
+        name for name, incluir in (
+            ('datos_personales', incluir_datos_personales),
+            ('experiencias_laborales', incluir_experiencias),
+            ('cursos', incluir_cursos),
+            ('reconocimientos', incluir_reconocimientos),
+            ('productos_academicos', incluir_productos_academicos),
+            ('productos_laborales', incluir_productos_laborales),
+        ) if incluir
+    ]
+    cache_key = pdf_cache.build_cache_key(perfil, 'personalizado', secciones)
+    cached = pdf_cache.get_pdf(cache_key)
+    if cached:
+        return _pdf_attachment_response(request, cached)
+
     # Obtener todas las secciones
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if incluir_experiencias else ExperienciaLaboral.objects.none()
-
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
+    snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    secciones_cv = cv_snapshot.secciones(
+        snapshot,
+        experiencias=incluir_experiencias,
+        cursos=incluir_cursos,
+        reconocimientos=incluir_reconocimientos,
+        productos_academicos=incluir_productos_academicos,
+        productos_laborales=incluir_productos_laborales,
     )
 
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio') if incluir_cursos else CursoRealizado.objects.none()
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento') if incluir_reconocimientos else Reconocimiento.objects.none()
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if incluir_productos_academicos else ProductoAcademico.objects.none()
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto') if incluir_productos_laborales else ProductoLaboral.objects.none()
-
     # Preparar foto
-    foto_perfil_proxy_url = None
-    if getattr(perfil, 'foto_perfil_url', None):
-        try:
-            data, filename = _download_blob_from_url(perfil.foto_perfil_url)
-            foto_base64 = base64.b64encode(data).decode('utf-8')
-            mime, _ = mimetypes.guess_type(filename or 'photo.jpg')
-            if not mime:
-                mime = 'image/jpeg'
-            foto_perfil_proxy_url = f"data:{mime};base64,{foto_base64}"
-        except Exception:
-            foto_perfil_proxy_url = f"{request.scheme}://{request.get_host()}/foto-perfil/"
+    foto_perfil_proxy_url = _foto_perfil_pdf_url(perfil, request)
 
     context = {
         'perfil': perfil,
         'datos_personales': perfil if incluir_datos_personales else None,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
+        **secciones_cv,
         'foto_perfil_proxy_url': foto_perfil_proxy_url,
     }
 
@@ -1225,21 +970,11 @@ def descargar_cv_personalizado(request):
     html = _prepare_html_for_pdf(html, request)
 
     try:
-        base_dir = os.path.dirname(__file__)
-        css_path = os.path.join(base_dir, 'static', 'perfil', 'css', 'pdf', 'cv_template_web.css')
-
-        with open(css_path, 'r', encoding='utf-8') as f:
-            css_text = f.read()
-
-        pdf_bytes = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf(
-            stylesheets=[CSS(string=css_text)]
-        )
+        pdf_bytes = render_pdf(html, request.build_absolute_uri('/'), stylesheets=[CV_TEMPLATE_WEB])
     except Exception as e:
-        return HttpResponse(f'Error generating PDF: {str(e)}', status=500)
+        return _pdf_error_response(e)
 
-    response = HttpResponse(pdf_bytes, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="cv_personalizado.pdf"'
-    return response
+    return _pdf_attachment_response(request, pdf_cache.store_pdf(cache_key, pdf_bytes, 'cv_personalizado.pdf'))
 
 
 def descargar_cv_personalizado_plantilla(request):
@@ -1282,10 +1017,10 @@ def descargar_cv_personalizado_plantilla(request):
 
     # Obtener configuración de visibilidad del perfil
     from apps.perfil.models import VisibilidadCV
-    visibilidad = VisibilidadCV.objects.filter(perfil=perfil).first()
-    if not visibilidad:
+    snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    if not snapshot.visibilidad:
         # Si no existe, crear uno con todos los valores en True
-        visibilidad = VisibilidadCV.objects.create(
+        VisibilidadCV.objects.create(
             perfil=perfil,
             mostrar_datos_personales=True,
             mostrar_experiencias=True,
@@ -1294,6 +1029,10 @@ def descargar_cv_personalizado_plantilla(request):
             mostrar_productos_academicos=True,
             mostrar_productos_laborales=True,
         )
+        # La señal post_save incrementó version_datos (ver descargar_cv_pdf)
+        perfil.refresh_from_db(fields=['version_datos'])
+        snapshot = cv_snapshot.get_cv_snapshot(perfil)
+    visibilidad = snapshot.visibilidad
 
     # Obtener secciones seleccionadas desde GET
     incluir_datos_personales = request.GET.get('datos_personales') == 'on'
@@ -1312,62 +1051,33 @@ def descargar_cv_personalizado_plantilla(request):
     incluir_productos_laborales = incluir_productos_laborales and visibilidad.mostrar_productos_laborales
     incluir_datos_personales = incluir_datos_personales and visibilidad.mostrar_datos_personales
 
+    secciones = [
+        name for name, incluir in (
+            ('datos_personales', incluir_datos_personales),
+            ('experiencias_laborales', incluir_experiencias),
+            ('cursos', incluir_cursos),
+            ('reconocimientos', incluir_reconocimientos),
+            ('productos_academicos', incluir_productos_academicos),
+            ('productos_laborales', incluir_productos_laborales),
+        ) if incluir
+    ]
+    cache_key = pdf_cache.build_cache_key(perfil, f'personalizado_{plantilla}', secciones)
+    cached = pdf_cache.get_pdf(cache_key)
+    if cached:
+        return _pdf_attachment_response(request, cached)
+
     # Obtener todas las secciones basadas en las selecciones
-    experiencias_qs = ExperienciaLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if incluir_experiencias else ExperienciaLaboral.objects.none()
-
-    from django.db.models import Max
-
-    companies = (
-        experiencias_qs
-        .values('nombrempresa')
-        .annotate(latest=Max('fechainiciogestion'))
-        .order_by('-latest')
+    secciones_cv = cv_snapshot.secciones(
+        snapshot,
+        experiencias=incluir_experiencias,
+        cursos=incluir_cursos,
+        reconocimientos=incluir_reconocimientos,
+        productos_academicos=incluir_productos_academicos,
+        productos_laborales=incluir_productos_laborales,
     )
 
-    experiencias = []
-    for c in companies:
-        company_name = c['nombrempresa']
-        company_experiences = (
-            experiencias_qs.filter(nombrempresa=company_name)
-            .order_by('-fechainiciogestion')
-        )
-        experiencias.append({'empresa': company_name, 'experiencias': company_experiences})
-
-    cursos = CursoRealizado.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechainicio') if incluir_cursos else CursoRealizado.objects.none()
-
-    reconocimientos = Reconocimiento.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechareconocimiento') if incluir_reconocimientos else Reconocimiento.objects.none()
-
-    productos_academicos = ProductoAcademico.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ) if incluir_productos_academicos else ProductoAcademico.objects.none()
-
-    productos_laborales = ProductoLaboral.objects.filter(
-        idperfilconqueestaactivo=perfil,
-        activarparaqueseveaenfront=True,
-    ).order_by('-fechaproducto') if incluir_productos_laborales else ProductoLaboral.objects.none()
-
     # Preparar foto
-    foto_perfil_proxy_url = None
-    if getattr(perfil, 'foto_perfil_url', None):
-        try:
-            data, filename = _download_blob_from_url(perfil.foto_perfil_url)
-            foto_base64 = base64.b64encode(data).decode('utf-8')
-            mime, _ = mimetypes.guess_type(filename or 'photo.jpg')
-            if not mime:
-                mime = 'image/jpeg'
-            foto_perfil_proxy_url = f"data:{mime};base64,{foto_base64}"
-        except Exception:
-            foto_perfil_proxy_url = f"{request.scheme}://{request.get_host()}/foto-perfil/"
+    foto_perfil_proxy_url = _foto_perfil_pdf_url(perfil, request)
 
     # Preparar intereses
     intereses_list = []
@@ -1377,12 +1087,7 @@ def descargar_cv_personalizado_plantilla(request):
     context = {
         'perfil': perfil,
         'datos_personales': perfil if incluir_datos_personales else None,
-        'experiencias': experiencias,
-        'experiencias_qs': experiencias_qs,
-        'cursos': cursos,
-        'reconocimientos': reconocimientos,
-        'productos_academicos': productos_academicos,
-        'productos_laborales': productos_laborales,
+        **secciones_cv,
         'foto_perfil_proxy_url': foto_perfil_proxy_url,
         'certificates': [],
         'intereses_list': intereses_list,
@@ -1393,7 +1098,10 @@ def descargar_cv_personalizado_plantilla(request):
         template_name = 'perfil/pdf/cv_modern_clean.html'
         html = render_to_string(template_name, context, request=request)
         # No aplicar _prepare_html_for_pdf para mantener estilos inline
-        pdf_bytes = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf()
+        try:
+            pdf_bytes = render_pdf(html, request.build_absolute_uri('/'))
+        except Exception as e:
+            return _pdf_error_response(e)
         filename = 'cv_modern_personalizado.pdf'
     else:
         # Template professional por defecto
@@ -1402,23 +1110,13 @@ def descargar_cv_personalizado_plantilla(request):
         html = _prepare_html_for_pdf(html, request)
 
         try:
-            base_dir = os.path.dirname(__file__)
-            css_path = os.path.join(base_dir, 'static', 'perfil', 'css', 'pdf', 'cv_template_web.css')
-
-            with open(css_path, 'r', encoding='utf-8') as f:
-                css_text = f.read()
-
-            pdf_bytes = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf(
-                stylesheets=[CSS(string=css_text)]
-            )
+            pdf_bytes = render_pdf(html, request.build_absolute_uri('/'), stylesheets=[CV_TEMPLATE_WEB])
         except Exception as e:
-            return HttpResponse(f'Error generating PDF: {str(e)}', status=500)
+            return _pdf_error_response(e)
         
         filename = 'cv_professional_personalizado.pdf'
 
-    response = HttpResponse(pdf_bytes, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    return _pdf_attachment_response(request, pdf_cache.store_pdf(cache_key, pdf_bytes, filename))
 
 
 
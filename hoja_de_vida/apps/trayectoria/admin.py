@@ -10,6 +10,7 @@ from .models import (
 )
 from .forms_admin import CursoRealizadoAdminForm, ReconocimientoAdminForm, VentaGarageAdminForm, ExperienciaLaboralAdminForm
 from .services.azure_storage import upload_pdf
+from .services.image_derivatives import upload_derivatives
 
 
 @admin.register(ExperienciaLaboral)
@@ -176,7 +177,15 @@ class VentaGarageAdmin(admin.ModelAdmin):
                 # Usar servicios de Azure para subir imagen
                 url = upload_pdf(uploaded, filename=uploaded.name)  # Este servicio acepta cualquier archivo
                 obj.rutaimagen = url
+                obj.imagenes_derivadas = {}
                 messages.success(request, 'Imagen subida correctamente a Azure')
             except Exception as exc:
                 messages.error(request, f'Error al subir imagen a Azure: {exc}')
+            else:
+                # Versiones reducidas (WebP/JPEG) para el catálogo; si fallan se sirve el original
+                try:
+                    uploaded.seek(0)
+                    obj.imagenes_derivadas = upload_derivatives(url, uploaded.read())
+                except Exception as exc:
+                    messages.warning(request, f'No se pudieron generar las miniaturas de la imagen: {exc}')
         super().save_model(request, obj, form, change)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trayectoria', '0005_alter_ventagarage_fecha_publicacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventagarage',
+            name='imagenes_derivadas',
+            field=models.JSONField(blank=True, db_column='imagenes_derivadas', default=dict),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trayectoria', '0006_ventagarage_imagenes_derivadas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cursorealizado',
+            name='rutacertificado',
+            field=models.CharField(blank=True, db_column='rutacertificado', max_length=500, null=True),
+        ),
+        migrations.AlterField(
+            model_name='experiencialaboral',
+            name='rutacertificado',
+            field=models.CharField(blank=True, db_column='rutacertificado', max_length=500, null=True),
+        ),
+        migrations.AlterField(
+            model_name='reconocimiento',
+            name='rutacertificado',
+            field=models.CharField(blank=True, db_column='rutacertificado', max_length=500, null=True),
+        ),
+        migrations.AlterField(
+            model_name='ventagarage',
+            name='rutaimagen',
+            field=models.CharField(blank=True, db_column='rutaimagen', help_text='URL o ruta de la imagen PNG/JPG del producto', max_length=500, null=True),
+        ),
+    ]
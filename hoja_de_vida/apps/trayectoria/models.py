@@ -55,7 +55,7 @@ class ExperienciaLaboral(models.Model):
     )
     descripcionfunciones = models.CharField(max_length=100, db_column='descripcionfunciones', null=True, blank=True)
     activarparaqueseveaenfront = models.BooleanField(default=True, db_column='activarparaqueseveaenfront')
-    rutacertificado = models.CharField(max_length=100, db_column='rutacertificado', null=True, blank=True)
+    rutacertificado = models.CharField(max_length=500, db_column='rutacertificado', null=True, blank=True)
 
     class Meta:
         db_table = 'EXPERIENCIALABORAL'
@@ -82,7 +82,7 @@ class Reconocimiento(models.Model):
     nombrecontactoauspicia = models.CharField(max_length=100, db_column='nombrecontactoauspicia', null=True, blank=True)
     telefonocontactoauspicia = models.CharField(max_length=60, db_column='telefonocontactoauspicia', null=True, blank=True)
     activarparaqueseveaenfront = models.BooleanField(default=True, db_column='activarparaqueseveaenfront')
-    rutacertificado = models.CharField(max_length=100, db_column='rutacertificado', null=True, blank=True)
+    rutacertificado = models.CharField(max_length=500, db_column='rutacertificado', null=True, blank=True)
 
     class Meta:
         db_table = 'RECONOCIMIENTOS'
@@ -117,7 +117,7 @@ class CursoRealizado(models.Model):
     telefonocontactoauspicia = models.CharField(max_length=60, db_column='telefonocontactoauspicia', null=True, blank=True)
     emailempresapatrocinadora = models.CharField(max_length=60, db_column='emailempresapatrocinadora', null=True, blank=True)
     activarparaqueseveaenfront = models.BooleanField(default=True, db_column='activarparaqueseveaenfront')
-    rutacertificado = models.CharField(max_length=100, db_column='rutacertificado', null=True, blank=True)
+    rutacertificado = models.CharField(max_length=500, db_column='rutacertificado', null=True, blank=True)
 
     class Meta:
         db_table = 'CURSOSREALIZADOS'
@@ -174,7 +174,10 @@ class VentaGarage(models.Model):
     )
     activarparaqueseveaenfront = models.BooleanField(default=True, db_column='activarparaqueseveaenfront')
     
-    rutaimagen = models.CharField(max_length=200, db_column='rutaimagen', null=True, blank=True, help_text='URL o ruta de la imagen PNG/JPG del producto')
+    rutaimagen = models.CharField(max_length=500, db_column='rutaimagen', null=True, blank=True, help_text='URL o ruta de la imagen PNG/JPG del producto')
+    # Versiones reducidas de la imagen generadas al subirla:
+    # {"320": {"webp": url, "jpeg": url}, "640": {...}, ...}
+    imagenes_derivadas = models.JSONField(default=dict, blank=True, db_column='imagenes_derivadas')
     
     ESTADO_DISPONIBILIDAD_CHOICES = [
         ('Disponible', 'Disponible'),
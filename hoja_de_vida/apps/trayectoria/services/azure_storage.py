@@ -1,50 +1,62 @@
+import hashlib
 import os
-import uuid
-from azure.storage.blob import BlobServiceClient
 
+from apps.documentos.services import blob_assets
+from apps.documentos.services.block_upload import upload_content_addressed, upload_stream
+from apps.documentos.services.blob_clients import get_blob_service_client
+from apps.documentos.services.storage import get_storage
 
-def _get_container_client():
-    # Prefer AZURE_STORAGE_CONNECTION_STRING; fall back to legacy AZURE_CONNECTION_STRING
-    conn_str = os.environ.get('AZURE_STORAGE_CONNECTION_STRING') or os.environ.get('AZURE_CONNECTION_STRING')
+
+def _container_name():
     # Prefer AZURE_STORAGE_CONTAINER; fall back to AZURE_CONTAINER
-    container = os.environ.get('AZURE_STORAGE_CONTAINER') or os.environ.get('AZURE_CONTAINER', 'certificados')
-    if not conn_str:
-        raise RuntimeError('AZURE_STORAGE_CONNECTION_STRING is not set. Set AZURE_STORAGE_CONNECTION_STRING in the environment.')
-    blob_service_client = BlobServiceClient.from_connection_string(conn_str)
-    return blob_service_client.get_container_client(container)
+    return os.environ.get('AZURE_STORAGE_CONTAINER') or os.environ.get('AZURE_CONTAINER', 'certificados')
+
+
+def _get_container_client():
+    # Shared, pooled client (connection string from AZURE_STORAGE_CONNECTION_STRING)
+    blob_service_client = get_blob_service_client()
+    return blob_service_client.get_container_client(_container_name())
 
 
 def upload_pdf(file_obj, filename=None):
-    """Upload a file-like object to Azure Blob Storage and return the blob URL.
+    """Upload a file-like object to blob storage and return the blob URL.
 
     - file_obj: file-like object (e.g., Django UploadedFile or BytesIO)
-    - filename: optional desired filename (if None, use uuid + original name)
+    - filename: optional original filename; only its extension is kept, the blob
+      is named after the SHA-256 of the content
 
     Returns the public URL to the uploaded blob (container must allow public access).
     Raises RuntimeError on configuration errors or upload failures.
     """
-    container_client = _get_container_client()
-
     if filename:
         base_name = filename
     else:
         base_name = getattr(file_obj, 'name', None) or 'file'
 
     ext = os.path.splitext(base_name)[1] or '.pdf'
-    blob_name = f"{uuid.uuid4().hex}{ext}"
-
-    blob_client = container_client.get_blob_client(blob_name)
 
-    # upload
+    # Content-addressed name; identical files share one blob (see apps/documentos/services/block_upload.py)
     try:
-        # If file_obj has chunks() (UploadedFile), read it accordingly
-        if hasattr(file_obj, 'chunks'):
-            data = b''.join(chunk for chunk in file_obj.chunks())
-        else:
-            data = file_obj.read()
-        blob_client.upload_blob(data, overwrite=True, content_type='application/pdf')
+        url = upload_content_addressed(_container_name(), file_obj, ext, 'application/pdf')
     except Exception as exc:
         raise RuntimeError(f'Failed to upload blob: {exc}')
 
-    # Construct URL
-    return blob_client.url
+    return url
+
+
+def upload_bytes(data: bytes, blob_name: str, content_type: str):
+    """Upload in-memory bytes under an exact blob name and return the blob URL.
+
+    Used for files derived from an upload (e.g. resized images) that must live
+    next to the original. Skips the upload when BlobAsset already records these
+    exact bytes under that name. Raises RuntimeError on upload failures.
+    """
+    url = get_storage().url(_container_name(), blob_name)
+    asset = blob_assets.get_fresh(url)
+    if asset is not None and asset.sha256 == hashlib.sha256(data).hexdigest():
+        return url
+    try:
+        upload_stream(url, [data], content_type)
+    except Exception as exc:
+        raise RuntimeError(f'Failed to upload blob: {exc}')
+    return url
@@ -0,0 +1,97 @@
+"""Resized WebP/JPEG versions of garage product images, generated at upload time.
+
+The catalog shows products in cards a few hundred pixels wide, while uploads can
+be up to 10 MB. Each upload gets one derivative per width in WIDTHS (never
+upscaled) and per format in FORMATS, stored next to the original blob as
+`<original>_w<width>.<ext>`. The URLs are kept in VentaGarage.imagenes_derivadas.
+"""
+import os
+from io import BytesIO
+from urllib.parse import urlparse
+
+from PIL import Image, ImageOps
+
+from apps.trayectoria.services.azure_storage import upload_bytes
+
+
+WIDTHS = (320, 640, 1280)
+
+# format key -> (Pillow format, content type, extension, save options)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', '.webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _target_widths(original_width: int):
+    widths = [w for w in WIDTHS if w < original_width]
+    # Small originals still get one re-encoded (lighter) version at their own size
+    return widths or [original_width]
+
+
+def _encode(image, fmt: str) -> bytes:
+    pil_format, _content_type, _ext, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha channel: flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_derivatives(data: bytes):
+    """Return [(width, format_key, bytes)] for an uploaded image.
+
+    Raises RuntimeError when the data is not an image Pillow can read.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        image = ImageOps.exif_transpose(image)
+    except Exception as exc:
+        raise RuntimeError(f'Cannot read image for derivatives: {exc}')
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    derivatives = []
+    for width in _target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            derivatives.append((width, fmt, _encode(resized, fmt)))
+    return derivatives
+
+
+def upload_derivatives(original_url: str, data: bytes):
+    """Generate and upload the derivatives of an uploaded image.
+
+    Returns the mapping to store in VentaGarage.imagenes_derivadas:
+    {"<width>": {"webp": url, "jpeg": url}}.
+    """
+    base, _ext = os.path.splitext(os.path.basename(urlparse(original_url).path))
+    derivadas = {}
+    for width, fmt, payload in build_derivatives(data):
+        _pil_format, content_type, ext, _options = FORMATS[fmt]
+        url = upload_bytes(payload, f'{base}_w{width}{ext}', content_type)
+        derivadas.setdefault(str(width), {})[fmt] = url
+    return derivadas
+
+
+def pick_derivative(derivadas, width, fmt: str = 'jpeg'):
+    """Return the URL of the smallest derivative at least `width` px wide in `fmt`.
+
+    Falls back to the widest available one, and returns None when there are no
+    derivatives in that format (callers then serve the original).
+    """
+    available = sorted(
+        (int(w), urls[fmt]) for w, urls in (derivadas or {}).items() if urls.get(fmt)
+    )
+    if not available:
+        return None
+    for candidate_width, url in available:
+        if candidate_width >= width:
+            return url
+    return available[-1][1]
+
@@ -1,3 +1,332 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import urlopen
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from PIL import Image
+
+from apps.documentos.services import blob_assets, blob_emulator, blob_sas
+from apps.documentos.services.storage import get_storage
+from apps.documentos.tests import BlobEmulatorMixin, use_local_storage
+from apps.perfil.tests import crear_perfil
+from apps.trayectoria import views
+from apps.trayectoria.models import CursoRealizado, VentaGarage
+from apps.trayectoria.services import image_derivatives
+from apps.trayectoria.services.azure_storage import upload_pdf
+
+
+class CertificadoProxyTests(BlobEmulatorMixin, TestCase):
+    PDF = b'%PDF-1.4 certificado ' + bytes(range(256)) * 400
+
+    def setUp(self):
+        super().setUp()
+        get_storage().ensure_container('certificados')
+        self.blob_url = upload_pdf(SimpleUploadedFile('curso.pdf', self.PDF, content_type='application/pdf'))
+        self.curso = CursoRealizado.objects.create(
+            idperfilconqueestaactivo=crear_perfil(),
+            nombrecurso='Django',
+            rutacertificado=self.blob_url,
+        )
+        self.url = reverse('ver_certificado_curso', args=[self.curso.pk])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_upload_round_trip(self):
+        self.assertTrue(self.blob_url.startswith(self.emulator.endpoint))
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.PDF)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Length'], str(len(self.PDF)))
+        self.assertTrue(response['ETag'])
+
+    def test_current_copy_gets_304(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"0xOTRA"').status_code, 200)
+
+    def test_range_requests(self):
+        response = self.get(HTTP_RANGE='bytes=10-109')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.PDF[10:110])
+        self.assertEqual(response['Content-Range'], f'bytes 10-109/{len(self.PDF)}')
+
+        response = self.get(HTTP_RANGE=f'bytes={len(self.PDF)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.PDF)}')
+
+    def test_head_is_answered_without_a_body(self):
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.PDF)))
+        self.assertEqual(response.content, b'')
+
+    def test_missing_blob_is_404(self):
+        self.curso.rutacertificado = get_storage().url('certificados', 'no-existe.pdf')
+        self.curso.save()
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_open_circuit_answers_503(self):
+        self.fail_requests()
+        for _ in range(3):
+            self.assertEqual(self.get().status_code, 503)
+
+        # The circuit is open: no request reaches the emulator, even once it has recovered
+        self.emulator.faults = self.emulator.faults._replace(error_rate=0.0)
+        response = self.get()
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(0 < int(response['Retry-After']) <= 30)
+
+    def test_cached_copy_is_served_during_an_outage(self):
+        with self.settings(BLOB_CACHE_FRESH_SECONDS=0):
+            self.assertEqual(self.body(self.get()), self.PDF)
+            self.fail_requests()
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.PDF)
+
+
+class CertificadoSasTests(BlobEmulatorMixin, TestCase):
+    PDF = b'%PDF-1.4 certificado firmado'
+    # 100 s into a 300 s window
+    NOW = 1_700_000_100
+    WINDOW_END = 1_700_000_100 // 300 * 300 + 300
+
+    def setUp(self):
+        super().setUp()
+        get_storage().ensure_container('certificados')
+        self.blob_url = upload_pdf(SimpleUploadedFile('curso.pdf', self.PDF, content_type='application/pdf'))
+        self.curso = CursoRealizado.objects.create(
+            idperfilconqueestaactivo=crear_perfil(),
+            nombrecurso='Django',
+            rutacertificado=self.blob_url,
+        )
+        self.url = reverse('ver_certificado_curso', args=[self.curso.pk])
+        settings = self.settings(BLOB_DELIVERY_MODE='sas', BLOB_SAS_TTL_SECONDS=300)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, now=NOW, query=''):
+        with mock.patch.object(blob_sas, 'time') as clock:
+            clock.time.return_value = now
+            return self.client.get(self.url + query)
+
+    def test_redirects_to_a_signed_url(self):
+        response = self.get(query='?download=1')
+        self.assertEqual(response.status_code, 302)
+        location = response['Location']
+        self.assertEqual(location.partition('?')[0], self.blob_url)
+
+        params = {name: values[0] for name, values in parse_qs(urlsplit(location).query).items()}
+        filename = self.blob_url.rpartition('/')[2]
+        self.assertEqual(params['sp'], 'r')
+        self.assertEqual(params['rscd'], f'attachment; filename="{filename}"')
+        self.assertEqual(params['rsct'], 'application/pdf')
+
+        # Azure (here the emulator) applies the overrides to the download
+        with urlopen(location) as signed:
+            self.assertEqual(signed.read(), self.PDF)
+            self.assertEqual(signed.headers['Content-Disposition'], params['rscd'])
+            self.assertEqual(signed.headers['Content-Type'], 'application/pdf')
+
+    def test_expiry_is_aligned_to_the_ttl_window(self):
+        response = self.get()
+        params = parse_qs(urlsplit(response['Location']).query)
+        # Valid for a full TTL after the end of the window it was issued in
+        expiry = datetime.fromtimestamp(self.WINDOW_END + 300, tz=timezone.utc)
+        self.assertEqual(params['se'], [expiry.strftime('%Y-%m-%dT%H:%M:%SZ')])
+        self.assertEqual(params['rscd'], [f'inline; filename="{self.blob_url.rpartition("/")[2]}"'])
+        # Reusable until the window ends
+        self.assertIn(f'max-age={self.WINDOW_END - self.NOW}', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        self.assertEqual(self.get(now=self.WINDOW_END - 1)['Location'], response['Location'])
+        self.assertNotEqual(self.get(now=self.WINDOW_END)['Location'], response['Location'])
+
+    def test_proxies_without_an_account_key(self):
+        keyless = (
+            f'DefaultEndpointsProtocol=http;AccountName={blob_emulator.ACCOUNT_NAME};'
+            f'BlobEndpoint={self.emulator.endpoint}/{blob_emulator.ACCOUNT_NAME};'
+        )
+        with self.settings(AZURE_STORAGE_CONNECTION_STRING=keyless):
+            response = self.get()
+            self.addCleanup(response.close)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), self.PDF)
+
+
+class VersionedBlobUrlTests(BlobEmulatorMixin, TestCase):
+    PNG = b'\x89PNG\r\n\x1a\n foto'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        storage = get_storage()
+        storage.ensure_container('imagenes')
+        self.blob_url = storage.url('imagenes', 'foto.png')
+        self.properties = storage.upload(self.blob_url, [self.PNG], 'image/png')
+        crear_perfil(foto_perfil_url=self.blob_url)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.addCleanup(response.close)
+        return response
+
+    def test_current_fingerprint_is_immutable(self):
+        url = views._versioned_blob_url('ver_foto_perfil', self.blob_url)
+        huella = views._blob_fingerprint(self.properties.etag)
+        self.assertEqual(url, reverse('ver_foto_perfil_version', args=[huella]))
+
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.PNG)
+        cache_control = response['Cache-Control']
+        self.assertIn(f'max-age={views.IMMUTABLE_MAX_AGE}', cache_control)
+        self.assertIn('immutable', cache_control)
+        self.assertIn('public', cache_control)
+
+    def test_outdated_fingerprint_redirects_to_the_current_one(self):
+        old_url = views._versioned_blob_url('ver_foto_perfil', self.blob_url)
+        self.assertEqual(self.get(old_url).status_code, 200)
+
+        # A new upload, recorded the way the application records its uploads
+        nuevo = b'\x89PNG\r\n\x1a\n foto nueva'
+        properties = get_storage().upload(self.blob_url, [nuevo], 'image/png')
+        blob_assets.record_properties(self.blob_url, properties)
+        new_url = reverse('ver_foto_perfil_version', args=[views._blob_fingerprint(properties.etag)])
+
+        with self.settings(BLOB_CACHE_FRESH_SECONDS=0):
+            response = self.get(old_url + '?variante=web')
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response['Location'], new_url + '?variante=web')
+            self.assertIn('no-cache', response['Cache-Control'])
+
+            response = self.get(new_url)
+            self.assertEqual(b''.join(response.streaming_content), nuevo)
+            self.assertIn('immutable', response['Cache-Control'])
+
+    def test_fingerprints_come_from_blob_assets_without_a_stat(self):
+        blob_assets.record(self.blob_url, '"0xREGISTRADO"', len(self.PNG), 'image/png')
+        with mock.patch.object(views, '_fetch_blob_properties') as fetch, self.assertNumQueries(1):
+            url = views._versioned_blob_url('ver_foto_perfil', self.blob_url)
+        fetch.assert_not_called()
+        self.assertEqual(url, reverse('ver_foto_perfil_version', args=[views._blob_fingerprint('"0xREGISTRADO"')]))
+
+        # Memoized afterwards: neither the database nor the storage is asked again
+        with mock.patch.object(views, '_fetch_blob_properties') as fetch, self.assertNumQueries(0):
+            self.assertEqual(views._versioned_blob_url('ver_foto_perfil', self.blob_url), url)
+        fetch.assert_not_called()
+
+    def test_unknown_blobs_get_the_plain_url(self):
+        self.fail_requests()
+        self.assertEqual(views._versioned_blob_url('ver_foto_perfil', self.blob_url), reverse('ver_foto_perfil'))
+
+
+def imagen(size, mode='RGB', color=(200, 30, 30), fmt='PNG', **options):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+class ImageDerivativesTests(SimpleTestCase):
+    def derivadas(self, data):
+        return {(width, fmt): Image.open(BytesIO(payload)) for width, fmt, payload in image_derivatives.build_derivatives(data)}
+
+    def test_widths_below_the_original(self):
+        derivadas = self.derivadas(imagen((1000, 500)))
+        self.assertEqual(sorted(derivadas), [(320, 'jpeg'), (320, 'webp'), (640, 'jpeg'), (640, 'webp')])
+        self.assertEqual(derivadas[(320, 'jpeg')].size, (320, 160))
+        self.assertEqual(derivadas[(640, 'webp')].format, 'WEBP')
+
+    def test_small_originals_are_not_upscaled(self):
+        derivadas = self.derivadas(imagen((200, 100)))
+        self.assertEqual(sorted(derivadas), [(200, 'jpeg'), (200, 'webp')])
+        self.assertEqual(derivadas[(200, 'jpeg')].size, (200, 100))
+
+    def test_alpha_is_flattened_to_white_for_jpeg(self):
+        derivadas = self.derivadas(imagen((400, 200), 'RGBA', (0, 0, 0, 0)))
+        jpeg = derivadas[(320, 'jpeg')]
+        self.assertEqual(jpeg.mode, 'RGB')
+        self.assertTrue(all(channel >= 250 for channel in jpeg.getpixel((10, 10))))
+        # WebP keeps the transparency
+        self.assertEqual(derivadas[(320, 'webp')].convert('RGBA').getpixel((10, 10))[3], 0)
+
+    def test_exif_orientation_is_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        derivadas = self.derivadas(imagen((800, 400), fmt='JPEG', exif=exif.tobytes()))
+        # Portrait once rotated: 400 px wide, so only the 320 px width applies
+        self.assertEqual(derivadas[(320, 'jpeg')].size, (320, 640))
+        self.assertNotIn((640, 'jpeg'), derivadas)
+
+    def test_unreadable_data(self):
+        with self.assertRaises(RuntimeError):
+            image_derivatives.build_derivatives(b'no es una imagen')
+
+    def test_pick_derivative(self):
+        derivadas = {
+            '320': {'webp': 'w320.webp', 'jpeg': 'w320.jpg'},
+            '640': {'jpeg': 'w640.jpg'},
+            '1280': {'webp': 'w1280.webp', 'jpeg': 'w1280.jpg'},
+        }
+        pick = image_derivatives.pick_derivative
+        self.assertEqual(pick(derivadas, 320), 'w320.jpg')
+        self.assertEqual(pick(derivadas, 321), 'w640.jpg')
+        self.assertEqual(pick(derivadas, 500, 'webp'), 'w1280.webp')
+        # Wider than every derivative: the widest one
+        self.assertEqual(pick(derivadas, 4000), 'w1280.jpg')
+        self.assertIsNone(pick({'320': {'jpeg': 'w320.jpg'}}, 320, 'webp'))
+        self.assertIsNone(pick({}, 320))
+
+
+class ImagenProductoTests(TestCase):
+    def setUp(self):
+        self.storage = use_local_storage(self)
+        self.storage.ensure_container('imagenes')
+        self.original = self.subir('producto.png', b'original')
+        self.producto = VentaGarage.objects.create(
+            idperfilconqueestaactivo=crear_perfil(),
+            nombreproducto='Bicicleta',
+            rutaimagen=self.original,
+        )
+        self.url = reverse('ver_imagen_producto', args=[self.producto.pk])
+
+    def subir(self, name, data):
+        blob_url = self.storage.url('imagenes', name)
+        self.storage.upload(blob_url, [data], 'image/png')
+        return blob_url
+
+    def get(self, query=''):
+        response = self.client.get(self.url + query)
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_width_and_format_select_a_derivative(self):
+        self.producto.imagenes_derivadas = {
+            '320': {'webp': self.subir('producto_w320.webp', b'320 webp'), 'jpeg': self.subir('producto_w320.jpg', b'320 jpeg')},
+            '640': {'webp': self.subir('producto_w640.webp', b'640 webp'), 'jpeg': self.subir('producto_w640.jpg', b'640 jpeg')},
+        }
+        self.producto.save()
+        self.assertEqual(self.get('?w=300&f=webp'), b'320 webp')
+        self.assertEqual(self.get('?w=600'), b'640 jpeg')
+        self.assertEqual(self.get('?w=2000&f=gif'), b'640 jpeg')
+        self.assertEqual(self.get(), b'original')
+
+    def test_products_without_derivatives_serve_the_original(self):
+        self.assertEqual(self.producto.imagenes_derivadas, {})
+        self.assertEqual(self.get('?w=320&f=webp'), b'original')
+        self.assertEqual(self.get('?w=abc'), b'original')
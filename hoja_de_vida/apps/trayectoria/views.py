@@ -1,10 +1,21 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, Http404, HttpResponseServerError
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, Http404, HttpResponseServerError, StreamingHttpResponse
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+import hashlib
 import os
 from urllib.parse import urlparse
 import mimetypes
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-from azure.storage.blob import BlobServiceClient
+from django.conf import settings
+
+from apps.documentos.services import blob_assets, blob_cache, blob_resilience, blob_sas, http_range
+from apps.documentos.services.storage import BlobNotFound, BlobNotModified, get_storage, is_outage
+from apps.trayectoria.services import image_derivatives
 
 from .models import CursoRealizado, Reconocimiento, ExperienciaLaboral, VentaGarage
 from apps.perfil.models import DatosPersonales
@@ -12,37 +23,438 @@ from apps.perfil.models import DatosPersonales
 
 # Create your views here.
 
-def _download_blob_from_url(blob_url: str):
-    """Download blob bytes and return (bytes, filename).
+# Metadata of a blob: etag as returned by the storage backend, last_modified
+# as a Unix timestamp and size in bytes
+BlobStat = namedtuple('BlobStat', ['etag', 'last_modified', 'size'])
+
+# Lifetime of responses served under a fingerprinted (versioned) URL
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Blob body ready to relay: an iterator of byte chunks (or an open file, for the
+# local storage backend), its length in bytes, the file name and the BlobStat
+# of the version being served
+BlobStream = namedtuple('BlobStream', ['chunks', 'size', 'filename', 'stat'])
+
+
+def _split_blob_url(blob_url: str):
+    """Return (container, blob_path) for a blob URL."""
+    return get_storage().split_url(blob_url)
+
+
+def _properties_stat(properties):
+    """BlobStat of a storage.BlobProperties."""
+    last_modified = properties.last_modified
+    return BlobStat(properties.etag, last_modified.timestamp() if last_modified else None, properties.size)
+
 
-    Expects blob_url like: https://<account>.blob.core.windows.net/<container>/<blob_path>
+def _open_cached_stream(blob_url: str, cached):
+    opened = blob_cache.open_body(blob_url)
+    if opened is None:
+        return None
+    chunks, size = opened
+    return BlobStream(chunks, size, cached.filename, BlobStat(cached.etag, cached.last_modified, size))
+
+
+def _stream_blob_from_url(blob_url: str):
+    """Open a blob for streaming and return a BlobStream.
+
+    Same cache policy as blob_cache.fetch(), but the body is never held in
+    memory: a cached copy is read from disk in chunks, and a download is
+    relayed chunk by chunk while it is written to the cache. Blobs of the local
+    backend are returned as an open file, served with FileResponse.
     """
-    conn_str = os.environ.get('AZURE_STORAGE_CONNECTION_STRING') or os.environ.get('AZURE_CONNECTION_STRING')
-    if not conn_str:
-        raise RuntimeError('AZURE_STORAGE_CONNECTION_STRING is not set in environment')
+    storage = get_storage()
+    filename = os.path.basename(storage.split_url(blob_url)[1])
+    opened = storage.open_local(blob_url)
+    if opened is not None:
+        fh, properties = opened
+        return BlobStream(fh, properties.size, filename, _properties_stat(properties))
+
+    cached = blob_cache.get(blob_url, with_data=False)
+    if cached and cached.fresh:
+        stream = _open_cached_stream(blob_url, cached)
+        if stream is not None:
+            return stream
 
-    parsed = urlparse(blob_url)
-    path = parsed.path.lstrip('/')
-    if '/' not in path:
-        raise ValueError('Invalid blob URL')
-    container, blob_path = path.split('/', 1)
+    download = None
+    try:
+        download = storage.stream(blob_url, if_none_match=cached.etag if cached and cached.etag else None)
+    except BlobNotModified:
+        blob_cache.mark_validated(blob_url)
+    except Exception:
+        if not cached:
+            raise
+
+    if download is None:
+        # 304, or the backend failed and there is a cached copy to fall back on
+        stream = _open_cached_stream(blob_url, cached)
+        if stream is not None:
+            return stream
+        # The entry was evicted in the meantime
+        download = storage.stream(blob_url)
 
-    blob_service_client = BlobServiceClient.from_connection_string(conn_str)
-    blob_client = blob_service_client.get_blob_client(container=container, blob=blob_path)
+    stat = _properties_stat(download.properties)
+    chunks = blob_cache.tee(blob_url, download.chunks, filename, stat.etag, stat.last_modified, size=download.size)
+    return BlobStream(chunks, download.size, filename, stat)
 
-    downloader = blob_client.download_blob()
-    data = downloader.readall()
-    filename = os.path.basename(blob_path)
-    return data, filename
 
+def _blob_streaming_response(blob, content_type: str, disposition: str = 'inline', huella=None):
+    """Relay a BlobStream to the client with its length and validators.
+
+    Open files (local storage backend) go through FileResponse, which lets the
+    WSGI server send them with sendfile (wsgi.file_wrapper).
+    """
+    if hasattr(blob.chunks, 'read'):
+        resp = FileResponse(blob.chunks, content_type=content_type)
+    else:
+        resp = StreamingHttpResponse(blob.chunks, content_type=content_type)
+    resp['Content-Length'] = str(blob.size)
+    resp['Accept-Ranges'] = 'bytes'
+    resp['Content-Disposition'] = f'{disposition}; filename="{blob.filename}"'
+    return _apply_blob_validators(resp, blob.stat, huella)
 
-def _serve_pdf_response(data: bytes, filename: str, inline: bool = True):
-    resp = HttpResponse(data, content_type='application/pdf')
-    disposition = 'inline' if inline else 'attachment'
+
+def _open_blob_range(blob_url: str, stat, offset: int, length: int):
+    """Return an iterator over `length` bytes of the blob version `stat`, from `offset`.
+
+    Reads the cached copy when it is fresh and of the same version, otherwise
+    reads only the requested range from the backend (If-Match on the ETag, so a
+    blob replaced in the meantime fails instead of mixing versions).
+    """
+    cached = blob_cache.get(blob_url, with_data=False)
+    if cached and cached.fresh and cached.etag == stat.etag:
+        opened = blob_cache.open_body(blob_url, offset=offset, length=length)
+        if opened is not None:
+            return opened[0]
+
+    return get_storage().stream(blob_url, offset=offset, length=length, if_match=stat.etag).chunks
+
+
+def _blob_range_response(request, blob_url: str, disposition: str = 'inline', default_type='application/octet-stream',
+                         huella=None):
+    """Answer a Range request on a blob with 206 Partial Content (or 416).
+
+    Returns None when the request has no usable Range header, If-Range does not
+    match the current version, or the blob cannot be read; the view then serves
+    the whole body.
+    """
+    if not request.META.get('HTTP_RANGE'):
+        return None
+    try:
+        stat = _stat_blob_from_url(blob_url)
+        byte_range = http_range.requested_range(request, stat.size, stat.etag, stat.last_modified)
+    except http_range.RangeNotSatisfiable:
+        return http_range.not_satisfiable_response(stat.size)
+    except Exception:
+        return None
+    if byte_range is None:
+        return None
+
+    start, end = byte_range
+    try:
+        chunks = _open_blob_range(blob_url, stat, start, end - start + 1)
+    except Exception:
+        return None
+
+    filename = os.path.basename(_split_blob_url(blob_url)[1])
+    content_type, _ = mimetypes.guess_type(filename)
+    resp = StreamingHttpResponse(chunks, content_type=content_type or default_type)
     resp['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    http_range.make_partial(resp, start, end, stat.size)
+    return _apply_blob_validators(resp, stat, huella)
+
+
+def _fetch_blob_properties(blob_url: str):
+    """Fetch the BlobProperties of a blob from the storage backend (no body, no database access)."""
+    return get_storage().stat(blob_url)
+
+
+def _asset_stat(asset):
+    last_modified = asset.ultima_modificacion
+    return BlobStat(asset.etag, last_modified.timestamp() if last_modified else None, asset.tamano)
+
+
+def _stat_blob_from_url(blob_url: str):
+    """Return the BlobStat of a blob without downloading its body.
+
+    Answered, in order, from a fresh local cache entry, from a recently
+    verified BlobAsset row, or from the blob properties in the backend (which
+    also refresh the BlobAsset row). When the backend confirms the ETag of the
+    cached copy, that copy is marked validated so the following download is
+    served locally. Local-disk blobs are simply stat'ed.
+    """
+    storage = get_storage()
+    if not storage.cacheable:
+        return _properties_stat(storage.stat(blob_url))
+
+    cached = blob_cache.get(blob_url, with_data=False)
+    if cached and cached.fresh and cached.etag:
+        return BlobStat(cached.etag, cached.last_modified, cached.size)
+
+    asset = blob_assets.get_fresh(blob_url)
+    if asset is not None:
+        return _asset_stat(asset)
+
+    try:
+        properties = _fetch_blob_properties(blob_url)
+    except Exception:
+        if cached and cached.etag:
+            return BlobStat(cached.etag, cached.last_modified, cached.size)
+        asset = blob_assets.get(blob_url)
+        if asset is not None:
+            return _asset_stat(asset)
+        raise
+
+    blob_assets.record_properties(blob_url, properties)
+    if cached and cached.etag == properties.etag:
+        blob_cache.mark_validated(blob_url)
+    return _properties_stat(properties)
+
+
+def _blob_fingerprint(etag) -> str:
+    """Short fingerprint of a blob version, used in versioned URLs."""
+    return hashlib.sha256(str(etag).encode('utf-8')).hexdigest()[:16]
+
+
+def _fingerprint_cache_key(blob_url: str):
+    return 'blob:huella:' + hashlib.sha256(blob_url.encode('utf-8')).hexdigest()
+
+
+def _current_blob_fingerprints(blob_urls):
+    """Return {blob_url: fingerprint of its current version, or None if unknown}.
+
+    Memoized for BLOB_PROXY_MAX_AGE; a stale value is harmless because the
+    versioned view checks the fingerprint and redirects outdated URLs. Misses
+    are answered from BlobAsset in one query, and the rest by fetching the blob
+    properties from the storage backend concurrently.
+    """
+    keys = {blob_url: _fingerprint_cache_key(blob_url) for blob_url in set(blob_urls)}
+    memo = cache.get_many(list(keys.values()))
+    result = {blob_url: memo.get(key) for blob_url, key in keys.items()}
+
+    missing = [blob_url for blob_url, huella in result.items() if huella is None]
+    if not missing:
+        return result
+    for blob_url, asset in blob_assets.get_fresh_many(missing).items():
+        result[blob_url] = _blob_fingerprint(asset.etag)
+
+    unknown = [blob_url for blob_url in missing if result[blob_url] is None]
+    if unknown:
+        def _safe_properties(blob_url):
+            try:
+                return _fetch_blob_properties(blob_url)
+            except Exception:
+                return None
+
+        workers = min(getattr(settings, 'BLOB_DOWNLOAD_CONCURRENCY', 8), len(unknown))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fetched = list(executor.map(_safe_properties, unknown))
+        # Database writes stay in this thread
+        for blob_url, properties in zip(unknown, fetched):
+            if properties is not None and properties.etag:
+                blob_assets.record_properties(blob_url, properties)
+                result[blob_url] = _blob_fingerprint(properties.etag)
+
+    cache.set_many(
+        {keys[blob_url]: result[blob_url] for blob_url in missing if result[blob_url]},
+        getattr(settings, 'BLOB_PROXY_MAX_AGE', 300),
+    )
+    return result
+
+
+def _versioned_blob_urls(url_name: str, items):
+    """Reverse the fingerprinted variant `<url_name>_version` of several proxy URLs.
+
+    - items: iterable of (blob_url, args) where args are the URL arguments
+      before the fingerprint.
+
+    Returns a list aligned with `items`. Blobs whose version is unknown get the
+    plain (revalidated) URL.
+    """
+    items = list(items)
+    fingerprints = _current_blob_fingerprints(blob_url for blob_url, _args in items if blob_url)
+    urls = []
+    for blob_url, args in items:
+        huella = fingerprints.get(blob_url) if blob_url else None
+        if huella is None:
+            urls.append(reverse(url_name, args=args))
+        else:
+            urls.append(reverse(f'{url_name}_version', args=[*args, huella]))
+    return urls
+
+
+def _versioned_blob_url(url_name: str, blob_url: str, *args):
+    """Single-URL form of _versioned_blob_urls."""
+    return _versioned_blob_urls(url_name, [(blob_url, args)])[0]
+
+
+def _blob_fingerprint_redirect(request, blob_url: str, huella: str):
+    """Redirect a fingerprinted URL whose blob version has changed to the current one."""
+    try:
+        current = _blob_fingerprint(_stat_blob_from_url(blob_url).etag)
+    except Exception:
+        return None
+    if current == huella:
+        return None
+    match = request.resolver_match
+    location = reverse(match.url_name, kwargs={**match.kwargs, 'huella': current})
+    if request.GET:
+        location = f'{location}?{request.GET.urlencode()}'
+    resp = HttpResponseRedirect(location)
+    patch_cache_control(resp, no_cache=True)
+    return resp
+
+
+def _apply_blob_validators(response, stat, huella=None):
+    """Add ETag, Last-Modified and Cache-Control for a blob to a response.
+
+    When the response is served under the fingerprint `huella` of this very
+    version, it is cacheable for a year and marked immutable.
+    """
+    if stat is None:
+        return response
+    if stat.etag:
+        response['ETag'] = quote_etag(stat.etag)
+    if stat.last_modified:
+        response['Last-Modified'] = http_date(stat.last_modified)
+    if huella and stat.etag and _blob_fingerprint(stat.etag) == huella:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'BLOB_PROXY_MAX_AGE', 300))
+    return response
+
+
+def _blob_conditional_response(request, blob_url: str, huella=None):
+    """Answer If-None-Match / If-Modified-Since for a blob proxy view.
+
+    Returns a 304 (or 412) response when the client copy is current, otherwise
+    None and the view serves the body. Requests without validators, and blobs
+    whose metadata cannot be read, also return None.
+    """
+    if not (request.META.get('HTTP_IF_NONE_MATCH') or request.META.get('HTTP_IF_MODIFIED_SINCE')
+            or request.META.get('HTTP_IF_MATCH') or request.META.get('HTTP_IF_UNMODIFIED_SINCE')):
+        return None
+    try:
+        stat = _stat_blob_from_url(blob_url)
+    except Exception:
+        return None
+
+    response = get_conditional_response(
+        request,
+        etag=quote_etag(stat.etag) if stat.etag else None,
+        last_modified=int(stat.last_modified) if stat.last_modified else None,
+    )
+    if response is not None:
+        _apply_blob_validators(response, stat, huella)
+    return response
+
+
+def _blob_sas_redirect(blob_url: str, disposition: str = 'inline', default_type='application/octet-stream'):
+    """Redirect to a short-lived read-only SAS URL when BLOB_DELIVERY_MODE is "sas".
+
+    Returns None (and the view proxies the blob) in proxy mode, when the
+    connection string cannot sign URLs or when signing fails.
+    """
+    if not blob_sas.sas_enabled():
+        return None
+    try:
+        container, blob_path = _split_blob_url(blob_url)
+        filename = os.path.basename(blob_path)
+        content_type, _ = mimetypes.guess_type(filename)
+        signed = blob_sas.generate_read_url(
+            container, blob_path,
+            content_disposition=f'{disposition}; filename="{filename}"',
+            content_type=content_type or default_type,
+        )
+    except Exception:
+        return None
+    if signed is None:
+        return None
+
+    url, reusable_seconds = signed
+    resp = HttpResponseRedirect(url)
+    patch_cache_control(resp, private=True, max_age=reusable_seconds)
     return resp
 
 
+def _blob_head_response(blob_url: str, disposition: str = 'inline', default_type='application/octet-stream',
+                        huella=None):
+    """Answer HEAD from the blob metadata (cache, BlobAsset or properties), without a body."""
+    try:
+        stat = _stat_blob_from_url(blob_url)
+    except Exception:
+        return None
+    filename = os.path.basename(_split_blob_url(blob_url)[1])
+    content_type, _ = mimetypes.guess_type(filename)
+    resp = HttpResponse(content_type=content_type or default_type)
+    resp['Content-Length'] = str(stat.size)
+    resp['Accept-Ranges'] = 'bytes'
+    resp['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+    return _apply_blob_validators(resp, stat, huella)
+
+
+def _blob_shortcut_response(request, blob_url: str, disposition: str = 'inline', default_type='application/octet-stream',
+                            huella=None):
+    """Return a response that avoids relaying the whole blob, or None.
+
+    In order: a redirect from an outdated fingerprinted URL, a SAS redirect
+    (opt-in), a 304 for a current client copy, a HEAD answered from metadata,
+    a 206 for a Range request. None means the view streams the full body.
+    """
+    response = _blob_fingerprint_redirect(request, blob_url, huella) if huella else None
+    if response is None:
+        response = _blob_sas_redirect(blob_url, disposition, default_type)
+    if response is None:
+        response = _blob_conditional_response(request, blob_url, huella)
+    if response is None and request.method == 'HEAD':
+        response = _blob_head_response(blob_url, disposition, default_type, huella)
+    if response is None:
+        response = _blob_range_response(request, blob_url, disposition, default_type, huella)
+    return response
+
+
+def _download_blobs(blob_urls, max_workers=None):
+    """Download several blobs concurrently.
+
+    Returns a list aligned with `blob_urls`: (bytes, filename) for each blob, or
+    None when the URL is empty or the download failed.
+    """
+    def _safe_download(blob_url):
+        if not blob_url:
+            return None
+        try:
+            return blob_cache.fetch(blob_url)
+        except Exception:
+            return None
+
+    blob_urls = list(blob_urls)
+    if not blob_urls:
+        return []
+    workers = max_workers or getattr(settings, 'BLOB_DOWNLOAD_CONCURRENCY', 8)
+    with ThreadPoolExecutor(max_workers=min(workers, len(blob_urls))) as executor:
+        return list(executor.map(_safe_download, blob_urls))
+
+
+def _blob_error_response(exc, message: str):
+    """Response for a blob that could not be read (and had no cached copy).
+
+    404 when the blob does not exist, 503 with Retry-After while the storage
+    backend is down or the circuit breaker is open, 500 for anything else.
+    """
+    if isinstance(exc, BlobNotFound):
+        return HttpResponse(f'{message}: el archivo no existe.', status=404)
+    if is_outage(exc):
+        resp = HttpResponse(f'{message}: el almacenamiento no está disponible.', status=503)
+        resp['Retry-After'] = str(blob_resilience.get_breaker().retry_after()
+                                  or getattr(settings, 'BLOB_BREAKER_COOLDOWN_SECONDS', 30))
+        return resp
+    return HttpResponseServerError(f'{message}: {exc}')
+
+
+def _serve_pdf_response(blob, inline: bool = True):
+    return _blob_streaming_response(blob, 'application/pdf', 'inline' if inline else 'attachment')
+
+
 def ver_certificado_curso(request, curso_id):
     curso = get_object_or_404(CursoRealizado, pk=curso_id)
     if not curso.rutacertificado:
@@ -50,11 +462,17 @@ def ver_certificado_curso(request, curso_id):
 
     download = request.GET.get('download', '0') in ('1', 'true', 'True', 'yes')
 
+    shortcut = _blob_shortcut_response(
+        request, curso.rutacertificado, 'attachment' if download else 'inline', 'application/pdf',
+    )
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(curso.rutacertificado)
-        return _serve_pdf_response(data, filename, inline=not download)
+        blob = _stream_blob_from_url(curso.rutacertificado)
+        return _serve_pdf_response(blob, inline=not download)
     except Exception as exc:
-        return HttpResponseServerError(f'Error al descargar el certificado: {exc}')
+        return _blob_error_response(exc, 'Error al descargar el certificado')
 
 
 def ver_certificado_reconocimiento(request, reconocimiento_id):
@@ -64,11 +482,17 @@ def ver_certificado_reconocimiento(request, reconocimiento_id):
 
     download = request.GET.get('download', '0') in ('1', 'true', 'True', 'yes')
 
+    shortcut = _blob_shortcut_response(
+        request, reconocimiento.rutacertificado, 'attachment' if download else 'inline', 'application/pdf',
+    )
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(reconocimiento.rutacertificado)
-        return _serve_pdf_response(data, filename, inline=not download)
+        blob = _stream_blob_from_url(reconocimiento.rutacertificado)
+        return _serve_pdf_response(blob, inline=not download)
     except Exception as exc:
-        return HttpResponseServerError(f'Error al descargar el certificado: {exc}')
+        return _blob_error_response(exc, 'Error al descargar el certificado')
 
 
 def ver_certificado_experiencia(request, experiencia_id):
@@ -78,17 +502,83 @@ def ver_certificado_experiencia(request, experiencia_id):
 
     download = request.GET.get('download', '0') in ('1', 'true', 'True', 'yes')
 
+    shortcut = _blob_shortcut_response(
+        request, experiencia.rutacertificado, 'attachment' if download else 'inline', 'application/pdf',
+    )
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(experiencia.rutacertificado)
-        return _serve_pdf_response(data, filename, inline=not download)
+        blob = _stream_blob_from_url(experiencia.rutacertificado)
+        return _serve_pdf_response(blob, inline=not download)
     except Exception as exc:
-        return HttpResponseServerError(f'Error al descargar el certificado: {exc}')
+        return _blob_error_response(exc, 'Error al descargar el certificado')
 
 
 # ========================================
 # NUEVAS VISTAS: VENTA DE GARAJE
 # ========================================
 
+# Ancho de la imagen usada como src por navegadores sin srcset
+CATALOGO_ANCHO_SRC = 640
+
+
+def _imagenes_catalogo(productos):
+    """Return {producto_id: {'src', 'webp', 'jpeg'}} with versioned image URLs.
+
+    `webp` / `jpeg` are srcset values built from the derivatives of each
+    product (see services/image_derivatives.py); `src` is a mid-size JPEG
+    derivative, or the original image when the product has no derivatives.
+    """
+    # (producto_id, width, format, blob_url); width None = original
+    items = []
+    for producto in productos:
+        if not producto.rutaimagen:
+            continue
+        items.append((producto.idventagarage, None, None, producto.rutaimagen))
+        for width, urls in (producto.imagenes_derivadas or {}).items():
+            for fmt, blob_url in urls.items():
+                items.append((producto.idventagarage, int(width), fmt, blob_url))
+
+    urls = _versioned_blob_urls('ver_imagen_producto', ((blob_url, [pid]) for pid, _w, _f, blob_url in items))
+    variantes = {}
+    originales = {}
+    for (pid, width, fmt, _blob_url), url in zip(items, urls):
+        if width is None:
+            originales[pid] = url
+        else:
+            variantes.setdefault(pid, {}).setdefault(fmt, []).append((width, f'{url}?w={width}&f={fmt}'))
+
+    imagenes = {}
+    for pid, original in originales.items():
+        formatos = {fmt: sorted(entries) for fmt, entries in variantes.get(pid, {}).items()}
+        jpeg = formatos.get('jpeg', [])
+        src = next((url for width, url in jpeg if width >= CATALOGO_ANCHO_SRC), jpeg[-1][1] if jpeg else original)
+        imagenes[pid] = {
+            'src': src,
+            'webp': ', '.join(f'{url} {width}w' for width, url in formatos.get('webp', [])),
+            'jpeg': ', '.join(f'{url} {width}w' for width, url in jpeg),
+        }
+    return imagenes
+
+
+def _imagen_producto_blob_url(producto, request):
+    """Blob to serve for ver_imagen_producto.
+
+    `?w=<px>` selects the smallest derivative at least that wide and `&f=webp`
+    its WebP version (JPEG by default). Without `w`, or for products without
+    derivatives, the original upload is served.
+    """
+    try:
+        width = int(request.GET.get('w', ''))
+    except ValueError:
+        return producto.rutaimagen
+    fmt = request.GET.get('f', 'jpeg')
+    if fmt not in image_derivatives.FORMATS:
+        fmt = 'jpeg'
+    return image_derivatives.pick_derivative(producto.imagenes_derivadas, width, fmt) or producto.rutaimagen
+
+
 def venta_garage(request):
     """
     Vista para mostrar todos los productos de venta de garaje.
@@ -108,6 +598,8 @@ def venta_garage(request):
         activarparaqueseveaenfront=True
     ).order_by('nombreproducto')
     
+    imagenes = _imagenes_catalogo(productos)
+
     # Preparar datos para el template
     productos_data = []
     for producto in productos:
@@ -123,6 +615,9 @@ def venta_garage(request):
             'valor': producto.valordelbien,
             'tiene_imagen': tiene_img,
             'imagen_url': img_url,
+            'imagen_proxy_url': imagenes.get(producto.idventagarage, {}).get('src', ''),
+            'imagen_srcset_webp': imagenes.get(producto.idventagarage, {}).get('webp', ''),
+            'imagen_srcset_jpeg': imagenes.get(producto.idventagarage, {}).get('jpeg', ''),
             'fecha_publicacion': producto.fecha_publicacion,  # Añadido: fecha de publicación
         })
     
@@ -136,10 +631,11 @@ def venta_garage(request):
     return render(request, 'trayectoria/venta_garage.html', context)
 
 
-def ver_imagen_producto(request, producto_id):
+def ver_imagen_producto(request, producto_id, huella=None):
     """
     Vista proxy para servir la imagen del producto de venta de garaje.
     Similar a ver_foto_perfil, redirige desde Azure.
+    Con ?w=<px>[&f=webp] sirve una versión reducida (ver _imagen_producto_blob_url).
     """
     producto = get_object_or_404(VentaGarage, pk=producto_id)
     
@@ -149,19 +645,22 @@ def ver_imagen_producto(request, producto_id):
     if not producto.activarparaqueseveaenfront:
         return HttpResponse('Este producto no está disponible.', status=404)
     
+    blob_url = _imagen_producto_blob_url(producto, request)
+    shortcut = _blob_shortcut_response(request, blob_url, 'inline', 'image/png', huella)
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(producto.rutaimagen)
+        blob = _stream_blob_from_url(blob_url)
     except Exception as exc:
-        return HttpResponseServerError(f'Error al descargar la imagen: {exc}')
+        return _blob_error_response(exc, 'Error al descargar la imagen')
     
     # Determinar MIME type
-    mime, _ = mimetypes.guess_type(filename)
+    mime, _ = mimetypes.guess_type(blob.filename)
     if not mime:
         mime = 'image/png'
     
-    resp = HttpResponse(data, content_type=mime)
-    resp['Content-Disposition'] = f'inline; filename="{filename}"'
-    return resp
+    return _blob_streaming_response(blob, mime, 'inline', huella)
 
 
 def descargar_imagen_producto(request, producto_id):
@@ -176,19 +675,21 @@ def descargar_imagen_producto(request, producto_id):
     if not producto.activarparaqueseveaenfront:
         return HttpResponse('Este producto no está disponible.', status=404)
     
+    shortcut = _blob_shortcut_response(request, producto.rutaimagen, 'attachment', 'image/png')
+    if shortcut is not None:
+        return shortcut
+
     try:
-        data, filename = _download_blob_from_url(producto.rutaimagen)
+        blob = _stream_blob_from_url(producto.rutaimagen)
     except Exception as exc:
-        return HttpResponseServerError(f'Error al descargar la imagen: {exc}')
+        return _blob_error_response(exc, 'Error al descargar la imagen')
     
     # Determinar MIME type
-    mime, _ = mimetypes.guess_type(filename)
+    mime, _ = mimetypes.guess_type(blob.filename)
     if not mime:
         mime = 'image/png'
     
-    resp = HttpResponse(data, content_type=mime)
-    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return resp
+    return _blob_streaming_response(blob, mime, 'attachment')
 
 def ver_todos_los_productos(request):
     """
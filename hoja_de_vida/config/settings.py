@@ -150,6 +150,108 @@ AZURE_STORAGE_CONTAINER = os.environ.get("AZURE_STORAGE_CONTAINER", "certificado
 
 # Azure es opcional - la app funciona sin él
 
+# Backend de almacenamiento de blobs (certificados e imágenes):
+#   "azure": Azure Blob Storage (o un emulador compatible).
+#   "local": archivos en BLOB_LOCAL_ROOT, servidos por las vistas proxy con
+#            FileResponse (sendfile). Sus URLs comienzan con BLOB_LOCAL_BASE_URL
+#            y solo identifican el archivo; nunca se sirven directamente.
+BLOB_STORAGE_BACKEND = os.environ.get("BLOB_STORAGE_BACKEND", "azure")
+BLOB_LOCAL_ROOT = os.environ.get("BLOB_LOCAL_ROOT", str(MEDIA_ROOT / "blobs"))
+BLOB_LOCAL_BASE_URL = os.environ.get("BLOB_LOCAL_BASE_URL", "http://blobs.local")
+
+# Conexiones HTTP keep-alive por proceso hacia Azure Blob Storage
+AZURE_BLOB_POOL_SIZE = int(os.environ.get("AZURE_BLOB_POOL_SIZE", "20"))
+
+# Descargas simultáneas de blobs al armar el PDF con certificados
+BLOB_DOWNLOAD_CONCURRENCY = int(os.environ.get("BLOB_DOWNLOAD_CONCURRENCY", "8"))
+
+# Subidas por bloques desde el admin: tamaño de bloque y bloques subidos en
+# paralelo. Memoria máxima por subida = tamaño x (concurrencia + 1)
+BLOB_UPLOAD_BLOCK_SIZE = int(os.environ.get("BLOB_UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024)))
+BLOB_UPLOAD_CONCURRENCY = int(os.environ.get("BLOB_UPLOAD_CONCURRENCY", "4"))
+
+# Las descargas se leen en rangos de este tamaño: el primero se transmite sin
+# esperar al resto del blob (el SDK, por defecto, lee 32 MB de una vez)
+BLOB_DOWNLOAD_CHUNK_SIZE = int(os.environ.get("BLOB_DOWNLOAD_CHUNK_SIZE", str(4 * 1024 * 1024)))
+
+# Caché local (LRU en disco) de blobs descargados; 0 bytes la desactiva
+BLOB_CACHE_DIR = os.environ.get("BLOB_CACHE_DIR", str(BASE_DIR / "cache" / "blobs"))
+BLOB_CACHE_MAX_BYTES = int(os.environ.get("BLOB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Segundos durante los que una copia se sirve sin revalidar su ETag con Azure
+BLOB_CACHE_FRESH_SECONDS = int(os.environ.get("BLOB_CACHE_FRESH_SECONDS", "60"))
+
+# Segundos que navegadores y proxies pueden reutilizar imágenes y certificados
+# servidos por las vistas proxy antes de revalidar con ETag / Last-Modified
+BLOB_PROXY_MAX_AGE = int(os.environ.get("BLOB_PROXY_MAX_AGE", "300"))
+
+# Segundos durante los que los metadatos guardados en BlobAsset (tamaño, ETag)
+# se usan sin volver a consultar las propiedades del blob en Azure
+BLOB_ASSET_REFRESH_SECONDS = int(os.environ.get("BLOB_ASSET_REFRESH_SECONDS", "3600"))
+
+# Entrega de imágenes y certificados: "proxy" (Django transmite los bytes) o
+# "sas" (redirección 302 a una URL SAS de solo lectura y corta duración; si la
+# cadena de conexión no tiene AccountKey se sigue usando el proxy)
+BLOB_DELIVERY_MODE = os.environ.get("BLOB_DELIVERY_MODE", "proxy")
+BLOB_SAS_TTL_SECONDS = int(os.environ.get("BLOB_SAS_TTL_SECONDS", "300"))
+
+# Llamadas a Azure Blob Storage: timeouts en segundos y reintentos rápidos en
+# lugar de los del SDK (el reintento n espera al azar entre 0 y BACKOFF x 2^n s)
+BLOB_CONNECT_TIMEOUT = float(os.environ.get("BLOB_CONNECT_TIMEOUT", "3"))
+BLOB_READ_TIMEOUT = float(os.environ.get("BLOB_READ_TIMEOUT", "10"))
+BLOB_RETRY_TOTAL = int(os.environ.get("BLOB_RETRY_TOTAL", "2"))
+BLOB_RETRY_BACKOFF_SECONDS = float(os.environ.get("BLOB_RETRY_BACKOFF_SECONDS", "0.5"))
+
+# Circuit breaker: tras N fallos seguidos de Azure (timeouts, errores 5xx) las
+# lecturas fallan al instante durante COOLDOWN segundos y se sirve la copia de
+# la caché local o un 503; 0 fallos lo desactiva. Los blobs inexistentes se
+# recuerdan MISSING_TTL segundos para no consultarlos en cada petición; la caché
+# "blobs" se comparte entre los workers de un host, no entre hosts
+BLOB_BREAKER_FAILURES = int(os.environ.get("BLOB_BREAKER_FAILURES", "5"))
+BLOB_BREAKER_COOLDOWN_SECONDS = int(os.environ.get("BLOB_BREAKER_COOLDOWN_SECONDS", "30"))
+BLOB_MISSING_TTL_SECONDS = int(os.environ.get("BLOB_MISSING_TTL_SECONDS", "60"))
+
+# =========================================================
+# CACHE
+# =========================================================
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # PDFs generados del CV; en disco para compartirlos entre workers de gunicorn
+    "pdf": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("PDF_CACHE_DIR", str(BASE_DIR / "cache" / "pdf")),
+        "TIMEOUT": 60 * 60 * 24 * 7,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
+    # Blobs inexistentes recordados (ver apps/documentos/services/blob_resilience.py);
+    # en disco para que una subida los olvide en todos los workers
+    "blobs": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("BLOB_STATE_CACHE_DIR", str(BASE_DIR / "cache" / "blob-estado")),
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+# Pre-renderizado de PDFs: activar solo donde corre `python manage.py
+# prerender_cv_worker` con el mismo PDF_CACHE_DIR que los workers web (render.yaml
+# no lo despliega); sin worker, las tareas encoladas nunca se procesarían
+CV_PRERENDER_ON_SAVE = os.environ.get("CV_PRERENDER_ON_SAVE", "false").lower() == "true"
+# Host con el que el worker construye las URLs absolutas de los recursos del PDF
+CV_PRERENDER_HOST = os.environ.get("CV_PRERENDER_HOST", "localhost:8000")
+# Segundos tras los que una tarea 'procesando' se da por abandonada (worker caído)
+# y se vuelve a encolar; debe superar lo que tarda en renderizar todas las combinaciones
+CV_PRERENDER_STALE_SECONDS = int(os.environ.get("CV_PRERENDER_STALE_SECONDS", "1800"))
+
+# Procesos dedicados a WeasyPrint (0 = renderizar dentro del worker web)
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", "2"))
+# Renders que pueden esperar un proceso libre antes de rechazar la petición
+PDF_RENDER_QUEUE_SIZE = int(os.environ.get("PDF_RENDER_QUEUE_SIZE", "8"))
+PDF_RENDER_TIMEOUT = int(os.environ.get("PDF_RENDER_TIMEOUT", "120"))
+# Retry-After (segundos) de la respuesta 503 cuando no hay capacidad para renderizar
+PDF_RENDER_RETRY_AFTER = int(os.environ.get("PDF_RENDER_RETRY_AFTER", "10"))
+
 # =========================================================
 # DEFAULT PRIMARY KEY
 # =========================================================
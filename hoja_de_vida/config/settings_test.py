@@ -0,0 +1,29 @@
+"""Ajustes para pruebas y benchmarks contra el emulador local de blobs.
+
+Uso:
+    python manage.py blob_emulator --latency-ms 80 --jitter-ms 40 --bandwidth-kbps 2048 --error-rate 0.02
+    DJANGO_SETTINGS_MODULE=config.settings_test python manage.py runserver
+
+El emulador (apps/documentos/services/blob_emulator.py) implementa el
+subconjunto de la API REST de Blob Storage que usa la aplicación y mantiene
+los blobs en memoria.
+
+Las pruebas (python manage.py test --settings=config.settings_test) levantan
+su propio emulador en un puerto libre y aplican estos mismos ajustes sobre
+él (ver BlobEmulatorMixin en apps/documentos/tests.py).
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, os
+
+from apps.documentos.services.blob_emulator import connection_string
+
+# =========================================================
+# BLOBS CONTRA EL EMULADOR LOCAL
+# =========================================================
+
+BLOB_EMULATOR_ENDPOINT = os.environ.get("BLOB_EMULATOR_ENDPOINT", "http://127.0.0.1:10000")
+AZURE_STORAGE_CONNECTION_STRING = connection_string(BLOB_EMULATOR_ENDPOINT)
+BLOB_STORAGE_BACKEND = "azure"
+
+# Caché de blobs separada de la de desarrollo, para medir con la caché fría o caliente
+BLOB_CACHE_DIR = os.environ.get("BLOB_CACHE_DIR", str(BASE_DIR / "cache" / "blobs-test"))
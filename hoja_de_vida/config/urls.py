@@ -32,6 +32,7 @@ urlpatterns = [
     path('venta-garage/', venta_garage, name='venta_garage'),
     path('todos-los-productos/', ver_todos_los_productos, name='ver_todos_los_productos'),
     path('producto/<int:producto_id>/imagen/', ver_imagen_producto, name='ver_imagen_producto'),
+    path('producto/<int:producto_id>/imagen/<slug:huella>/', ver_imagen_producto, name='ver_imagen_producto_version'),
     path('producto/<int:producto_id>/descargar-imagen/', descargar_imagen_producto, name='descargar_imagen_producto'),
 
     # Certificate proxy endpoints
@@ -43,6 +44,11 @@ urlpatterns = [
     path('foto-perfil/', ver_foto_perfil, name='ver_foto_perfil'),
     path('fondo-professional/', fondo_professional, name='fondo_professional'),
     path('fondo-modern/', fondo_modern, name='fondo_modern'),
+
+    # Versioned (fingerprinted) media URLs, cacheable forever
+    path('foto-perfil/<slug:huella>/', ver_foto_perfil, name='ver_foto_perfil_version'),
+    path('fondo-professional/<slug:huella>/', fondo_professional, name='fondo_professional_version'),
+    path('fondo-modern/<slug:huella>/', fondo_modern, name='fondo_modern_version'),
     path('seleccionar-plantilla/', seleccionar_plantilla, name='seleccionar_plantilla'),
     path('admin/', admin.site.urls),
 ]